@@ -0,0 +1,92 @@
+from pathlib import Path
+from typing import Callable
+
+import streamlit as st
+
+from lib.cache import ArtifactCache
+from lib.jobs import DONE, FAILED, QUEUED, Job, JobQueue, JobStore, plan_job_workers
+from lib.pipeline import job_handlers
+from lib.workspace import (
+    DEFAULT_WORKSPACE_ROOT,
+    WorkspaceManager,
+    job_paths,
+    workspace_budget,
+)
+
+JOB_POLL_SECONDS = 2
+
+
+@st.cache_resource
+def get_artifact_cache() -> ArtifactCache:
+    return ArtifactCache()
+
+
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    """One queue and worker pool per server, shared by every session.
+
+    Every job works in its own workspace; those of finished jobs are evicted
+    in the background once the workspaces outgrow their disk budget
+    (WORKSPACE_MAX_GB, see workspace_budget).
+    """
+    workers = plan_job_workers()
+    store = JobStore()
+    workspaces = WorkspaceManager(
+        max_bytes=workspace_budget(),
+        busy=lambda: [path for job in store.active() for path in job_paths(job.params)]
+    ).start()
+    return JobQueue(
+        store, job_handlers(get_artifact_cache(), workers, workspaces), workers
+    ).start()
+
+
+def job_work_dir(job_id: str) -> Path:
+    return workspace_dir(job_id)
+
+
+def workspace_dir(name: str) -> Path:
+    return Path(DEFAULT_WORKSPACE_ROOT) / name
+
+
+def render_job_status(
+    query_key: str,
+    render_result: Callable[[Job], None],
+    render_running: Callable[[Job], None] | None = None,
+) -> None:
+    """Poll the job whose ID is stored under query_key in the page URL.
+
+    Keeping the ID in the URL lets a refreshed page pick the job back up.
+    render_running, if given, adds to the progress bar of a running job.
+    """
+    job_id = st.query_params.get(query_key)
+    if not job_id:
+        return
+
+    @st.fragment(run_every=JOB_POLL_SECONDS)
+    def poll() -> None:
+        queue = get_job_queue()
+        job = queue.get(job_id)
+
+        if job is None:
+            st.warning(f"Job {job_id} was not found.")
+        elif job.status == QUEUED:
+            st.info(
+                f"⏳ Job {job_id} is queued "
+                f"({queue.position(job_id)} ahead of it)."
+            )
+        elif job.status == FAILED:
+            st.error(f"❌ Job {job_id} failed: {job.error.splitlines()[0]}")
+            if hasattr(st, "code"):
+                st.code(job.error)
+        elif job.status == DONE:
+            render_result(job)
+        else:
+            st.progress(job.progress, text=job.message or "Running...")
+            if render_running is not None:
+                render_running(job)
+
+    poll()
+
+    if st.button("Clear job", key=f"{query_key}_clear"):
+        del st.query_params[query_key]
+        st.rerun()
@@ -1,14 +1,16 @@
-import asyncio
+import json
+import os
 from pathlib import Path
 import traceback
 
 import streamlit as st
 
-from lib.convert import convert_video_to_audio
-from lib.cut_video import cut_video_segments
-from lib.download import zip_and_download_files
-from lib.llm import process_transcription_with_llm
-from lib.transcribe import transcribe_audio
+from app_tabs.job_queue import get_job_queue, job_work_dir, render_job_status
+from lib.jobs import Job, QueueFullError, new_job_id
+from lib.output_formats import DEFAULT_FORMATS, OUTPUT_FORMATS
+from lib.render_plan import MERGE_GAP_SECONDS, PLAN_FILENAME
+from lib.render_profiles import RENDER_PROFILES
+from lib.upload import persist_upload
 
 file_path = Path(__file__).parent / "prompt.txt"
 
@@ -53,6 +55,101 @@ def render_process_tab() -> None:
     with col2:
         st.subheader("Actions")
 
+        cut_mode = st.selectbox(
+            "Export mode",
+            options=["smart", "fanout", "reencode"],
+            format_func=lambda mode: {
+                "smart": "Smart cut (re-encode only at cut points)",
+                "fanout": "Single decode (overlapping edits)",
+                "reencode": "Full re-encode",
+            }[mode],
+            help="Smart cut copies whole GOPs; use full re-encode if a source fails to cut",
+            key="process_video_cut_mode",
+        )
+
+        cpu_count = os.cpu_count() or 1
+        export_workers = st.number_input(
+            "Parallel exports",
+            min_value=1,
+            max_value=cpu_count,
+            value=cpu_count,
+            help="Segments rendered at once; encoder threads are split between them",
+            key="process_video_export_workers",
+        )
+
+        pipelined = st.checkbox(
+            "Pipelined",
+            value=False,
+            help=(
+                "Transcribe audio chunks as they are extracted and cut each "
+                "edit as soon as the LLM streams it back"
+            ),
+            key="process_video_pipelined",
+        )
+
+        snap = st.checkbox(
+            "Snap cuts to pauses",
+            value=True,
+            help=(
+                "Move each clip's start and end to the nearest quiet gap "
+                "instead of padding by 2 seconds"
+            ),
+            key="process_video_snap",
+        )
+
+        merge = st.checkbox(
+            "Merge overlapping clips",
+            value=True,
+            help=(
+                "Render edits that overlap after padding as one clip, so "
+                "shared footage is encoded once"
+            ),
+            key="process_video_merge",
+        )
+
+        merge_gap = st.number_input(
+            "Merge gap (seconds)",
+            min_value=0.0,
+            value=MERGE_GAP_SECONDS,
+            step=0.5,
+            disabled=not merge,
+            help=(
+                "Also merge clips this close together; the footage between "
+                "them is kept"
+            ),
+            key="process_video_merge_gap",
+        )
+
+        profile = st.selectbox(
+            "Render profile",
+            options=list(RENDER_PROFILES),
+            format_func=lambda name: {
+                "preview": "Preview (fast, low resolution)",
+                "final": "Final (full quality)",
+            }.get(name, name),
+            help=(
+                "Preview the LLM's picks quickly, then re-render only the "
+                "clips you approve at full quality"
+            ),
+            key="process_video_profile",
+        )
+
+        formats = st.multiselect(
+            "Output formats",
+            options=list(OUTPUT_FORMATS),
+            default=list(DEFAULT_FORMATS),
+            format_func=lambda name: {
+                "original": "Original",
+                "vertical": "Vertical 9:16",
+                "square": "Square 1:1",
+            }.get(name, name),
+            help=(
+                "Every clip is written in each format; reframed formats are "
+                "cropped to the centre in the same pass that cuts the clip"
+            ),
+            key="process_video_formats",
+        )
+
         run_disabled = uploaded_file is None
 
         if st.button(
@@ -66,95 +163,193 @@ def render_process_tab() -> None:
             key="process_video_run",
         ):
             if uploaded_file is not None:
-                asyncio.run(process_video(uploaded_file, user_prompt))
+                submit_process_job(
+                    uploaded_file,
+                    user_prompt,
+                    cut_mode,
+                    int(export_workers),
+                    pipelined,
+                    snap,
+                    profile,
+                    formats,
+                    merge,
+                    float(merge_gap),
+                )
             else:
                 st.error("Please select a file first!")
 
-
-async def process_video(uploaded_file, user_prompt: str):
-    """Process the uploaded video file."""
+    render_job_status("process_job", render_process_result, render_running_plan)
+    render_job_status("render_job", render_final_result)
+
+
+def submit_process_job(
+    uploaded_file,
+    user_prompt: str,
+    cut_mode: str = "smart",
+    export_workers: int = 1,
+    pipelined: bool = False,
+    snap: bool = True,
+    profile: str = "preview",
+    formats: list[str] | None = None,
+    merge: bool = True,
+    merge_gap: float = MERGE_GAP_SECONDS,
+) -> str | None:
+    """Save the upload and queue it for processing; return the job ID."""
     try:
-        temp_dir = Path("temp")
-        temp_dir.mkdir(exist_ok=True)
-
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-
-        status_text.text("Saving uploaded file...")
-        progress_bar.progress(0.1)
-
-        temp_video_path = temp_dir / f"video_{uploaded_file.name}"
-        with open(temp_video_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-
-        status_text.text("Converting video to audio...")
-        progress_bar.progress(0.2)
-
-        audio_file_path = temp_dir / "audio.wav"
-        convert_video_to_audio(temp_video_path, audio_file_path)
+        queue = get_job_queue()
+        # Checked before the upload is copied so a full queue costs nothing
+        if not queue.has_capacity():
+            raise QueueFullError("The server is busy; try again shortly.")
+
+        job_id = new_job_id()
+        work_dir = job_work_dir(job_id)
+
+        upload = persist_upload(uploaded_file, work_dir / f"video_{uploaded_file.name}")
+        if upload.peak_rss_bytes is not None:
+            st.caption(
+                f"Saved {upload.bytes_written / (1024*1024):.1f} MB in "
+                f"{upload.max_buffered_bytes / (1024*1024):.0f} MB chunks, "
+                f"peak memory {upload.peak_rss_bytes / (1024*1024):.0f} MB"
+            )
 
-        if audio_file_path.exists():
-            st.success(f"✅ Audio file created: {audio_file_path}")
-            st.write(f"Audio file size: {audio_file_path.stat().st_size / 1024:.2f} KB")
-        else:
-            st.error("❌ Audio file was not created")
+        queue.submit(
+            "process",
+            {
+                "video_path": str(upload.path),
+                "prompt": user_prompt,
+                "upload_hash": upload.sha256,
+                "work_dir": str(work_dir),
+                "cut_mode": cut_mode,
+                "export_workers": export_workers,
+                "pipelined": pipelined,
+                "snap": snap,
+                "profile": profile,
+                "formats": formats,
+                "merge": merge,
+                "merge_gap": merge_gap,
+            },
+            job_id,
+        )
+        st.query_params["process_job"] = job_id
+        return job_id
 
-        progress_bar.progress(0.1)
-        status_text.text("Transcribing audio...")
+    except QueueFullError as e:
+        st.error(f"❌ {e}")
+    except Exception as e:
+        st.error(f"❌ Error processing video: {str(e)}")
+        trace_lines = traceback.format_exception(type(e), e, e.__traceback__)
+        if hasattr(st, "code"):
+            st.code("".join(trace_lines[:6]))
 
-        transcription_file_path = transcribe_audio(audio_file_path)
 
-        if Path(transcription_file_path).exists():
-            st.success(f"✅ Transcription file created: {transcription_file_path}")
-            st.write(
-                f"Transcription file size: {Path(transcription_file_path).stat().st_size / 1024:.2f} KB"
+def render_running_plan(job: Job) -> None:
+    """Show the render plan of a running job once its segments are known."""
+    plan_path = Path(job.params["work_dir"]) / PLAN_FILENAME
+    if plan_path.exists():
+        render_plan = json.loads(plan_path.read_text())
+        with st.expander("Render plan"):
+            st.caption(
+                f"{len(render_plan['segments'])} segments, "
+                f"{render_plan['render_seconds']:.1f}s to encode"
             )
-        else:
-            st.error("❌ Transcription file was not created")
-
-        progress_bar.progress(0.4)
-        status_text.text("Processing transcription with LLM...")
+            st.dataframe(render_plan["segments"], hide_index=True)
 
-        processed_result_path = temp_dir / "processed_result.json"
 
-        await process_transcription_with_llm(
-            transcription_file_path, user_prompt, str(processed_result_path)
-        )
+def render_process_result(job: Job) -> None:
+    st.success("✅ Video processing completed successfully!")
+    st.subheader("📊 Processing Results")
 
-        status_text.text("Cutting video segments...")
-        progress_bar.progress(0.6)
+    for note in job.result.get("notes", []):
+        st.caption(note)
 
-        await cut_video_segments(str(temp_video_path), str(processed_result_path))
+    render_plan = job.result.get("render_plan")
+    if render_plan:
+        with st.expander("Render plan"):
+            st.dataframe(render_plan["segments"], hide_index=True)
 
-        progress_bar.progress(0.9)
-        status_text.text("Preparing files for download...")
+    render_stages(job)
 
-        zip_file_path = await zip_and_download_files("exports", str(temp_dir))
+    render_download(job)
 
-        st.session_state.zip_file_path = zip_file_path
+    if render_plan and job.result.get("profile") == "preview":
+        render_approval(job, render_plan)
 
-        status_text.text("Processing completed successfully!")
-        progress_bar.progress(1.0)
 
-        st.success("✅ Video processing completed successfully!")
-        st.subheader("📊 Processing Results")
+def render_approval(job: Job, render_plan: dict) -> None:
+    """Let the user pick preview segments to re-render with the final profile."""
+    names = {segment["n"]: segment["file"] for segment in render_plan["segments"]}
+    approved = st.multiselect(
+        "Approved clips",
+        options=list(names),
+        default=list(names),
+        format_func=names.get,
+        key=f"process_approved_{job.id}",
+    )
+    if st.button(
+        "🎬 Render final",
+        disabled=not approved,
+        help="Re-render the approved clips at full quality",
+        key=f"process_render_final_{job.id}",
+    ):
+        submit_render_job(job, render_plan, approved)
 
-        if "zip_file_path" in st.session_state and st.session_state.zip_file_path:
-            with open(st.session_state.zip_file_path, "rb") as zip_file:
-                zip_data = zip_file.read()
 
-            st.download_button(
-                label="Download Processed Files",
-                data=zip_data,
-                file_name="processed_files.zip",
-                mime="application/zip",
-                help="Click to download the processed video files",
-            )
-        else:
-            st.warning("No processed files available for download yet.")
-
-    except Exception as e:
-        st.error(f"❌ Error processing video: {str(e)}")
-        trace_lines = traceback.format_exception(type(e), e, e.__traceback__)
-        if hasattr(st, "code"):
-            st.code("".join(trace_lines[:6]))
+def submit_render_job(job: Job, render_plan: dict, approved: list[int]) -> None:
+    """Queue a final-profile render of the approved segments of a preview run."""
+    try:
+        queue = get_job_queue()
+        render_job_id = new_job_id()
+        queue.submit(
+            "render",
+            {
+                "video_path": job.params["video_path"],
+                "render_plan": render_plan,
+                "approved": approved,
+                "run_dir": job.result["run_dir"],
+                # Its own workspace, so the process job's run report and
+                # bundle are not overwritten; the exports still go to run_dir
+                "work_dir": str(job_work_dir(render_job_id)),
+                "cut_mode": job.params.get("cut_mode", "smart"),
+                "export_workers": job.params.get("export_workers", 1),
+                "profile": "final",
+                "formats": job.params.get("formats"),
+            },
+            render_job_id,
+        )
+        st.query_params["render_job"] = render_job_id
+        # The button sits in the polling fragment; rerun the page to show the job
+        st.rerun()
+
+    except QueueFullError as e:
+        st.error(f"❌ {e}")
+
+
+def render_final_result(job: Job) -> None:
+    st.success("✅ Final render completed!")
+    for note in job.result.get("notes", []):
+        st.caption(note)
+    render_stages(job)
+    render_download(job)
+
+
+def render_stages(job: Job) -> None:
+    stages = job.result.get("stages")
+    if stages:
+        with st.expander("Stage timings"):
+            st.dataframe(stages, hide_index=True)
+
+
+def render_download(job: Job) -> None:
+    zip_file_path = job.result.get("zip_file_path")
+    if zip_file_path and Path(zip_file_path).exists():
+        # Deferred: the bundle is only read when the button is clicked
+        st.download_button(
+            label="Download Processed Files",
+            data=Path(zip_file_path).read_bytes,
+            file_name="processed_files.zip",
+            mime="application/zip",
+            help="Click to download the processed video files",
+            key=f"process_download_{job.id}",
+        )
+    else:
+        st.warning("No processed files available for download yet.")
@@ -1,10 +1,21 @@
-import asyncio
-import time
 import traceback
 from pathlib import Path
 
 import streamlit as st
-from moviepy import VideoFileClip
+from PIL import Image
+
+from app_tabs.job_queue import (
+    JOB_POLL_SECONDS,
+    get_artifact_cache,
+    get_job_queue,
+    job_work_dir,
+    render_job_status,
+    workspace_dir,
+)
+from lib.jobs import DONE, FAILED, Job, QueueFullError, new_job_id
+from lib.proxy import Proxy, build_proxy
+from lib.render_profiles import DEFAULT_PROFILE, RENDER_PROFILES
+from lib.upload import persist_upload
 
 
 def render_split_tab() -> None:
@@ -17,9 +28,23 @@ def render_split_tab() -> None:
     )
 
     if split_file is not None:
-        st.caption("Preview: use the player timeline to pick timestamps.")
-        st.video(split_file)
-        split_file.seek(0)
+        video_path, upload_hash = persist_split_upload(split_file)
+        try:
+            # Only the keyframe thumbnails are rendered here; the low-bitrate
+            # preview is encoded by a queued job
+            with st.spinner("Preparing thumbnails..."):
+                proxy = build_proxy(
+                    str(video_path), upload_hash, get_artifact_cache(), preview=False
+                )
+        except Exception as e:
+            st.warning(f"Preview unavailable: {e}")
+        else:
+            st.caption(
+                "Preview: use the player timeline or the thumbnails to pick timestamps."
+            )
+            if not proxy.preview_ready:
+                render_proxy_status(submit_proxy_job(video_path, upload_hash))
+            render_preview(proxy)
 
     start_ts = st.text_input(
         "Start time (e.g., 00:01:30 or 90)",
@@ -32,6 +57,14 @@ def render_split_tab() -> None:
         help="When cutting by timestamps, this is the end position",
     )
 
+    profile = st.selectbox(
+        "Render profile",
+        options=list(RENDER_PROFILES),
+        index=list(RENDER_PROFILES).index(DEFAULT_PROFILE),
+        help="Preview renders quickly at low resolution; final keeps full quality",
+        key="split_profile",
+    )
+
     split_disabled = split_file is None
 
     if st.button(
@@ -55,7 +88,95 @@ def render_split_tab() -> None:
             st.error("End time must be greater than start time.")
             return
 
-        asyncio.run(cut_video_range(split_file, start_seconds, end_seconds))
+        submit_cut_job(split_file, start_seconds, end_seconds, profile)
+
+    render_job_status("cut_job", render_cut_result)
+
+
+def submit_proxy_job(video_path: Path, upload_hash: str) -> str | None:
+    """Queue the preview encode of an upload once; return the job ID, or None
+    when the queue is full and the source has to do as the preview."""
+    saved = st.session_state.get("split_proxy_job")
+    if saved and saved[0] == upload_hash:
+        return saved[1]
+
+    queue = get_job_queue()
+    if not queue.has_capacity():
+        return None
+    job_id = new_job_id()
+    try:
+        queue.submit(
+            "proxy", {"video_path": str(video_path), "upload_hash": upload_hash}, job_id
+        )
+    except QueueFullError:
+        return None
+    st.session_state.split_proxy_job = (upload_hash, job_id)
+    return job_id
+
+
+def render_proxy_status(job_id: str | None) -> None:
+    """Poll the preview job, rerunning the page to swap the proxy in once done."""
+    if job_id is None:
+        st.caption("Playing the original file; the server is too busy for a preview.")
+        return
+
+    @st.fragment(run_every=JOB_POLL_SECONDS)
+    def poll() -> None:
+        job = get_job_queue().get(job_id)
+        if job is None or job.status == FAILED:
+            st.caption("Playing the original file; the preview could not be encoded.")
+        elif job.status == DONE:
+            st.rerun()
+        else:
+            st.caption("Playing the original file until a lighter preview is ready...")
+
+    poll()
+
+
+def render_preview(proxy: Proxy) -> None:
+    """Low-bitrate player plus a keyframe thumbnail scrubber."""
+    times = proxy.grid.times()
+    picked = st.select_slider(
+        "Jump to",
+        options=times,
+        format_func=format_timestamp,
+        key="split_preview_time",
+    )
+    st.video(str(proxy.preview_path), start_time=int(picked))
+
+    thumb_col, start_col, end_col = st.columns([2, 1, 1])
+    with Image.open(proxy.sprite_path) as sheet:
+        thumb_col.image(
+            sheet.crop(proxy.grid.tile_box(times.index(picked))),
+            caption=format_timestamp(picked),
+        )
+    start_col.button(
+        "Set as start",
+        on_click=_set_timestamp,
+        args=("split_start_ts", picked),
+        key="split_set_start",
+    )
+    end_col.button(
+        "Set as end",
+        on_click=_set_timestamp,
+        args=("split_end_ts", picked),
+        key="split_set_end",
+    )
+
+    with st.expander("All thumbnails"):
+        st.image(
+            str(proxy.sprite_path),
+            caption=f"One thumbnail every {format_timestamp(proxy.grid.interval)}",
+        )
+
+
+def _set_timestamp(key: str, seconds: float) -> None:
+    st.session_state[key] = format_timestamp(seconds)
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
 
 
 def parse_timestamp_to_seconds(value: str) -> float:
@@ -90,107 +211,74 @@ def _looks_like_float(text: str) -> bool:
         return False
 
 
-async def cut_video_range(uploaded_file, start_seconds: float, end_seconds: float):
-    """Cut a single clip between start and end times and offer it for download."""
-    temp_dir = Path("temp")
-    temp_dir.mkdir(exist_ok=True)
+def persist_split_upload(uploaded_file) -> tuple[Path, str]:
+    """Save the selected upload to disk once; return its path and sha256."""
+    upload_id = getattr(uploaded_file, "file_id", uploaded_file.name)
+    saved = st.session_state.get("split_upload")
+    if saved and saved[0] == upload_id and Path(saved[1]).exists():
+        return Path(saved[1]), saved[2]
 
-    st.session_state.pop("cut_file_path", None)
-
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-
-    status_text.text("Saving uploaded file...")
-    progress_bar.progress(0.1)
+    upload = persist_upload(
+        uploaded_file,
+        workspace_dir(f"upload_{upload_id}") / f"cut_{uploaded_file.name}",
+    )
+    st.session_state.split_upload = (upload_id, str(upload.path), upload.sha256)
+    return upload.path, upload.sha256
 
-    temp_video_path = temp_dir / f"cut_{uploaded_file.name}"
-    with open(temp_video_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
 
-    video_clip = None
-    output_path = None
+def submit_cut_job(
+    uploaded_file,
+    start_seconds: float,
+    end_seconds: float,
+    profile: str = DEFAULT_PROFILE,
+) -> str | None:
+    """Queue a single clip cut between start and end times; return the job ID."""
+    st.session_state.pop("cut_file_path", None)
 
     try:
-        status_text.text("Loading video and preparing cut...")
-        progress_bar.progress(0.2)
-
-        video_clip = VideoFileClip(str(temp_video_path))
-        duration = video_clip.duration
-        if duration <= 0:
-            raise ValueError("The video has no duration.")
-
-        if start_seconds < 0 or end_seconds > duration:
-            raise ValueError("Start/end times must be within the video duration.")
-
-        clip = video_clip.subclipped(start_seconds, end_seconds)
-
-        exports_dir = Path("exports")
-        exports_dir.mkdir(exist_ok=True)
-        run_dir = exports_dir / f"cuts_{temp_video_path.stem}_{int(time.time())}"
-        run_dir.mkdir(parents=True, exist_ok=True)
-
-        output_path = (
-            run_dir
-            / f"{temp_video_path.stem}_{int(start_seconds)}-{int(end_seconds)}.mp4"
-        )
-
-        def _write_segment(with_audio: bool) -> None:
-            clip.write_videofile(
-                str(output_path),
-                codec="libx264",
-                audio=with_audio,
-                audio_codec="aac" if with_audio else None,
-                temp_audiofile=str(temp_dir / "temp-audio.m4a") if with_audio else None,
-                remove_temp=True,
-                logger=None,
-            )
-
-        try:
-            _write_segment(with_audio=True)
-        except AttributeError as attr_err:
-            if "stdout" in str(attr_err):
-                st.warning(
-                    "Audio track failed to process; exporting clip without audio."
-                )
-                _write_segment(with_audio=False)
-            else:
-                raise
-        except Exception as write_err:
-            if "stdout" in str(write_err):
-                st.warning(
-                    "Audio track failed to process; exporting clip without audio."
-                )
-                _write_segment(with_audio=False)
-            else:
-                raise
-        finally:
-            clip.close()
-
-        status_text.text("Preparing download...")
-        progress_bar.progress(0.9)
-
-        st.session_state.cut_file_path = str(output_path)
-        with open(output_path, "rb") as outf:
-            data = outf.read()
-
-        status_text.text("Cut completed successfully!")
-        progress_bar.progress(1.0)
-        st.success("✅ Clip exported successfully!")
-
-        st.download_button(
-            label="Download Cut Clip",
-            data=data,
-            file_name=output_path.name,
-            mime="video/mp4",
-            help="Click to download the cut clip",
+        queue = get_job_queue()
+        if not queue.has_capacity():
+            raise QueueFullError("The server is busy; try again shortly.")
+
+        job_id = new_job_id()
+        queue.submit(
+            "cut",
+            {
+                "video_path": str(persist_split_upload(uploaded_file)[0]),
+                "start_seconds": start_seconds,
+                "end_seconds": end_seconds,
+                "profile": profile,
+                "work_dir": str(job_work_dir(job_id)),
+            },
+            job_id,
         )
+        st.query_params["cut_job"] = job_id
+        return job_id
 
+    except QueueFullError as e:
+        st.error(f"❌ {e}")
     except Exception as e:
         st.error(f"❌ Error cutting video: {str(e)}")
         trace_lines = traceback.format_exception(type(e), e, e.__traceback__)
         if hasattr(st, "code"):
             st.code("".join(trace_lines[:6]))
 
-    finally:
-        if video_clip is not None:
-            video_clip.close()
+
+def render_cut_result(job: Job) -> None:
+    for warning in job.result.get("warnings", []):
+        st.warning(warning)
+    for note in job.result.get("notes", []):
+        st.caption(note)
+
+    output_path = Path(job.result["output_path"])
+    st.session_state.cut_file_path = str(output_path)
+    st.success("✅ Clip exported successfully!")
+
+    st.download_button(
+        label="Download Cut Clip",
+        data=output_path.read_bytes,
+        file_name=output_path.name,
+        mime="video/mp4",
+        help="Click to download the cut clip",
+        key=f"cut_download_{job.id}",
+    )
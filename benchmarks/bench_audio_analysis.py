@@ -0,0 +1,135 @@
+"""Time the audio energy analysis on an hour of audio.
+
+    python benchmarks/bench_audio_analysis.py [--decode]
+
+Without --decode the hour is synthesized straight into a NumPy array, which
+isolates the envelope and gap detection; with it, an hour-long m4a is
+generated first and the full analyze_audio path (ffmpeg decode included) is
+timed.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from moviepy.config import FFMPEG_BINARY  # noqa: E402
+
+from lib.audio_analysis import (  # noqa: E402
+    ANALYSIS_SAMPLE_RATE,
+    HOP_SECONDS,
+    AudioEnvelope,
+    analyze_audio,
+    compute_envelope,
+    find_gaps,
+)
+
+HOUR = 3600
+SNAPS = 1000
+
+
+def synthesize_speech_like(
+    seconds: int, rate: int = ANALYSIS_SAMPLE_RATE
+) -> np.ndarray:
+    """Noise bursts of 2-8s separated by 0.2-1.2s pauses, as int16."""
+    rng = np.random.default_rng(0)
+    samples = rng.normal(0, 300, seconds * rate).astype(np.int16)
+    t = 0.0
+    while t < seconds:
+        burst = rng.uniform(2, 8)
+        start, end = int(t * rate), int(min(t + burst, seconds) * rate)
+        samples[start:end] = rng.normal(0, 6000, end - start).astype(np.int16)
+        t += burst + rng.uniform(0.2, 1.2)
+    return samples
+
+
+def time_snaps(envelope: AudioEnvelope) -> float:
+    rng = np.random.default_rng(1)
+    points = rng.uniform(0, envelope.duration, SNAPS)
+    started = time.perf_counter()
+    for t in points:
+        envelope.snap_start(t)
+        envelope.snap_end(t)
+    return (time.perf_counter() - started) / SNAPS
+
+
+def bench_in_memory() -> dict:
+    samples = synthesize_speech_like(HOUR)
+
+    started = time.perf_counter()
+    rms_db = compute_envelope(samples)
+    envelope_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    envelope = AudioEnvelope(HOP_SECONDS, rms_db, *find_gaps(rms_db))
+    gaps_seconds = time.perf_counter() - started
+
+    return {
+        "audio_seconds": HOUR,
+        "envelope_seconds": envelope_seconds,
+        "gap_detection_seconds": gaps_seconds,
+        "gaps": len(envelope.gap_starts),
+        "snap_seconds_per_edit": time_snaps(envelope),
+    }
+
+
+def bench_decode() -> dict:
+    with tempfile.TemporaryDirectory() as work:
+        audio = Path(work) / "hour.m4a"
+        subprocess.run(
+            [
+                FFMPEG_BINARY,
+                "-y",
+                "-f",
+                "lavfi",
+                "-i",
+                f"aevalsrc='if(lt(mod(t,5),4),0.5*sin(2*PI*220*t),0)':s=16000:d={HOUR}",
+                "-c:a",
+                "aac",
+                "-b:a",
+                "32k",
+                str(audio),
+            ],
+            capture_output=True,
+            check=True,
+        )
+
+        started = time.perf_counter()
+        envelope = analyze_audio(str(audio))
+        cold_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        analyze_audio(str(audio))
+        cached_seconds = time.perf_counter() - started
+
+    return {
+        "audio_seconds": HOUR,
+        "analyze_seconds": cold_seconds,
+        "cached_lookup_seconds": cached_seconds,
+        "gaps": len(envelope.gap_starts),
+        "snap_seconds_per_edit": time_snaps(envelope),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--decode", action="store_true", help="include ffmpeg decoding of an m4a"
+    )
+    args = parser.parse_args()
+
+    results = {"in_memory": bench_in_memory()}
+    if args.decode:
+        results["decode"] = bench_decode()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
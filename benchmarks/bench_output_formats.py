@@ -0,0 +1,87 @@
+"""Time rendering several output formats in one pass against one at a time.
+
+    python benchmarks/bench_output_formats.py [--seconds 120] [--height 720]
+        [--profile final] [--edits 6]
+
+The same plan is rendered with the ffmpeg backend three ways: the original
+format alone, every format from a single decode per segment, and every
+format in a separate render.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bench_render_backends import make_source  # noqa: E402
+
+from lib.cut_video import cut_video_segments  # noqa: E402
+from lib.output_formats import OUTPUT_FORMATS  # noqa: E402
+from lib.render_plan import plan_render  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=int, default=120)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--profile", default="final")
+    parser.add_argument("--edits", type=int, default=6)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work:
+        work_dir = Path(work)
+        source = work_dir / "source.mp4"
+        make_source(source, args.seconds, args.height)
+
+        spacing = args.seconds / args.edits
+        edits = [
+            {"start": n * spacing + 2, "end": n * spacing + 6} for n in range(args.edits)
+        ]
+        plan = plan_render(edits, args.seconds)
+
+        def render(name: str, formats: list[str]) -> float:
+            started = time.perf_counter()
+            asyncio.run(
+                cut_video_segments(
+                    str(source),
+                    edits,
+                    mode="reencode",
+                    exports_dir=work_dir / name,
+                    temp_dir=work_dir / "temp",
+                    plan=plan,
+                    reel=False,
+                    profile=args.profile,
+                    backend="ffmpeg",
+                    formats=formats,
+                )
+            )
+            return time.perf_counter() - started
+
+        one = render("one", ["original"])
+        single_pass = render("single_pass", list(OUTPUT_FORMATS))
+        separate = sum(render(f"separate_{name}", [name]) for name in OUTPUT_FORMATS)
+
+    print(
+        json.dumps(
+            {
+                "source_seconds": args.seconds,
+                "height": args.height,
+                "profile": args.profile,
+                "formats": list(OUTPUT_FORMATS),
+                "one_format_seconds": one,
+                "single_pass_seconds": single_pass,
+                "separate_passes_seconds": separate,
+                "single_pass_vs_one": single_pass / one,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
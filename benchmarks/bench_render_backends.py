@@ -0,0 +1,102 @@
+"""Compare the moviepy and ffmpeg render backends on the same render plan.
+
+    python benchmarks/bench_render_backends.py [--seconds 120] [--height 720]
+        [--profile final] [--edits 6]
+
+A synthetic source is generated locally, one plan is built for it, and
+every backend renders that plan in full re-encode mode, one segment at a
+time, so only the backend differs between runs.
+"""
+
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from moviepy.config import FFMPEG_BINARY  # noqa: E402
+
+from lib.cut_video import cut_video_segments  # noqa: E402
+from lib.render_backend import RENDER_BACKENDS  # noqa: E402
+from lib.render_plan import plan_render  # noqa: E402
+
+FPS = 30
+
+
+def make_source(path: Path, seconds: int, height: int) -> None:
+    width = height * 16 // 9
+    subprocess.run(
+        [
+            FFMPEG_BINARY,
+            "-y",
+            "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={FPS}",
+            "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=48000",
+            "-t", str(seconds),
+            "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+            "-c:a", "aac",
+            "-shortest",
+            str(path),
+        ],
+        capture_output=True,
+        check=True,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=int, default=120)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--profile", default="final")
+    parser.add_argument("--edits", type=int, default=6)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work:
+        work_dir = Path(work)
+        source = work_dir / "source.mp4"
+        make_source(source, args.seconds, args.height)
+
+        spacing = args.seconds / args.edits
+        edits = [
+            {"start": n * spacing + 2, "end": n * spacing + 6} for n in range(args.edits)
+        ]
+        plan = plan_render(edits, args.seconds)
+
+        results = {
+            "source_seconds": args.seconds,
+            "height": args.height,
+            "profile": args.profile,
+            "segments": len(plan.segments),
+            "render_seconds": plan.render_seconds,
+            "backends": {},
+        }
+        for name in RENDER_BACKENDS:
+            started = time.perf_counter()
+            asyncio.run(
+                cut_video_segments(
+                    str(source),
+                    edits,
+                    mode="reencode",
+                    exports_dir=work_dir / name,
+                    temp_dir=work_dir / "temp",
+                    plan=plan,
+                    reel=False,
+                    profile=args.profile,
+                    backend=name,
+                )
+            )
+            wall = time.perf_counter() - started
+            results["backends"][name] = {
+                "wall_seconds": wall,
+                "fps": plan.render_seconds * FPS / wall,
+            }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
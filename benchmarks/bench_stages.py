@@ -0,0 +1,327 @@
+"""Time every pipeline stage on synthetic media and compare with a baseline.
+
+    python benchmarks/bench_stages.py [--media 30x360,60x480] [--repeat 3]
+        [--baseline benchmarks/baselines/stages.json] [--save-baseline]
+        [--output results.json]
+
+Sources of each length and height are generated locally. The transcription
+and LLM endpoints are served by a stand-in HTTP server, so their stages time
+only the client side. Each stage keeps the median of --repeat runs.
+
+With --save-baseline the results are written to the baseline file. Otherwise
+they are compared with it, and the exit status is 1 when a stage is slower
+than its baseline by more than its threshold. Save a baseline before
+changing lib/, then run again after the change.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from agents import set_tracing_disabled  # noqa: E402
+from bench_render_backends import make_source  # noqa: E402
+from moviepy.config import FFMPEG_BINARY  # noqa: E402
+
+from lib import openai_client  # noqa: E402
+from lib.convert import convert_video_to_audio  # noqa: E402
+from lib.cut_video import cut_video_segments  # noqa: E402
+from lib.download import zip_and_download_files  # noqa: E402
+from lib.llm import VideoEdit, align_edit, process_transcription_with_llm  # noqa: E402
+from lib.render_plan import plan_render  # noqa: E402
+from lib.transcribe import transcribe_audio_chunked  # noqa: E402
+from lib.transcript_index import TranscriptIndex  # noqa: E402
+
+BASELINE_PATH = Path(__file__).parent / "baselines" / "stages.json"
+
+# Allowed slowdown over the baseline, as a fraction of the baseline time.
+# Stages behind the stand-in server include local HTTP round trips and vary
+# more between runs.
+THRESHOLDS = {
+    "audio_extraction": 0.25,
+    "transcription": 0.5,
+    "llm": 0.5,
+    "transcript_index": 0.25,
+    "cut_smart": 0.25,
+    "cut_reencode": 0.25,
+    "bundling": 0.5,
+}
+# Slowdowns smaller than this are timer noise, whatever the percentage
+MIN_REGRESSION_SECONDS = 0.05
+
+WORD_SECONDS = 0.4
+EDIT_EVERY_SECONDS = 20
+EDIT_SECONDS = 8
+# Alignment lookups timed by the transcript_index stage, per source
+INDEX_LOOKUPS = 2000
+
+
+def stub_words(seconds: float) -> list[dict]:
+    count = int(seconds / WORD_SECONDS)
+    return [
+        {
+            "word": f"word{n}." if n % 12 == 11 else f"word{n}",
+            "start": n * WORD_SECONDS,
+            "end": n * WORD_SECONDS + WORD_SECONDS * 0.8,
+        }
+        for n in range(count)
+    ]
+
+
+def stub_edits(seconds: float) -> list[dict]:
+    edits = []
+    for start in range(2, int(seconds) - EDIT_SECONDS, EDIT_EVERY_SECONDS):
+        first = int(start / WORD_SECONDS)
+        last = int((start + EDIT_SECONDS) / WORD_SECONDS)
+        edits.append(
+            {
+                "start": float(start),
+                "end": float(start + EDIT_SECONDS),
+                "targeted_script_snippet": " ".join(
+                    f"word{n}" for n in range(first, last)
+                ),
+            }
+        )
+    return edits
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Answers transcription and Responses API requests for one source."""
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.seconds = 0.0
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server: StandInServer
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers["Content-Length"]))
+        seconds = self.server.seconds
+        if self.path.endswith("/audio/transcriptions"):
+            words = stub_words(seconds)
+            body = {
+                "task": "transcribe",
+                "language": "english",
+                "duration": seconds,
+                "text": " ".join(w["word"] for w in words),
+                "words": words,
+            }
+        else:
+            body = {
+                "id": "resp_stub",
+                "object": "response",
+                "created_at": 0,
+                "model": "stub",
+                "status": "completed",
+                "parallel_tool_calls": False,
+                "tool_choice": "auto",
+                "tools": [],
+                "output": [
+                    {
+                        "type": "message",
+                        "id": "msg_stub",
+                        "role": "assistant",
+                        "status": "completed",
+                        "content": [
+                            {
+                                "type": "output_text",
+                                "annotations": [],
+                                "text": json.dumps({"response": stub_edits(seconds)}),
+                            }
+                        ],
+                    }
+                ],
+                "usage": {
+                    "input_tokens": 100,
+                    "output_tokens": 10,
+                    "total_tokens": 110,
+                    "input_tokens_details": {"cached_tokens": 0},
+                    "output_tokens_details": {"reasoning_tokens": 0},
+                },
+            }
+
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *_: object) -> None:
+        pass
+
+
+def timed(run, repeat: int, warmup: bool = False) -> float:
+    """Median wall seconds of run() over repeat calls, after one untimed call
+    with warmup."""
+    if warmup:
+        run()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def bench_source(work_dir: Path, seconds: int, height: int, repeat: int) -> dict:
+    source = work_dir / "source.mp4"
+    make_source(source, seconds, height)
+    audio = work_dir / "audio.mp3"
+    transcript = work_dir / "audio.json"
+    edits_path = work_dir / "edits.json"
+    words = stub_words(seconds)
+    edits = stub_edits(seconds)
+    plan = plan_render(edits, seconds)
+
+    def extract() -> None:
+        convert_video_to_audio(str(source), str(audio))
+
+    def transcribe() -> None:
+        asyncio.run(transcribe_audio_chunked(str(audio)))
+
+    def pick_edits() -> None:
+        metrics = asyncio.run(
+            process_transcription_with_llm(str(transcript), "PROMPT", str(edits_path))
+        )
+        if not metrics or metrics.edits != len(edits):
+            raise RuntimeError(f"The stand-in LLM edits were not all kept: {metrics}")
+
+    def index() -> None:
+        transcript_index = TranscriptIndex(words)
+        candidates = [VideoEdit(**edit) for edit in edits]
+        for n in range(INDEX_LOOKUPS):
+            align_edit(transcript_index, candidates[n % len(candidates)])
+
+    def cut(mode: str):
+        def run() -> None:
+            asyncio.run(
+                cut_video_segments(
+                    str(source),
+                    edits,
+                    mode=mode,
+                    exports_dir=work_dir / "exports",
+                    temp_dir=work_dir / "temp",
+                    plan=plan,
+                )
+            )
+
+        return run
+
+    def bundle() -> None:
+        asyncio.run(zip_and_download_files(str(work_dir / "exports"), str(work_dir)))
+
+    # Each stage reads what the previous one wrote, as in the pipeline
+    return {
+        "audio_extraction": timed(extract, repeat),
+        "transcription": timed(transcribe, repeat, warmup=True),
+        "llm": timed(pick_edits, repeat, warmup=True),
+        "transcript_index": timed(index, repeat),
+        "cut_smart": timed(cut("smart"), repeat),
+        "cut_reencode": timed(cut("reencode"), repeat),
+        "bundling": timed(bundle, repeat),
+    }
+
+
+def compare(results: dict, baseline: dict) -> list[str]:
+    """Stages slower than their baseline by more than the threshold."""
+    regressions = []
+    for media, stages in results.items():
+        for stage, seconds in stages.items():
+            base = baseline.get("results", {}).get(media, {}).get(stage)
+            if base is None:
+                continue
+            threshold = baseline.get("thresholds", THRESHOLDS).get(stage, 0.25)
+            if seconds > base * (1 + threshold) and (
+                seconds - base > MIN_REGRESSION_SECONDS
+            ):
+                regressions.append(
+                    f"{media} {stage}: {seconds:.3f}s vs {base:.3f}s baseline "
+                    f"(+{(seconds / base - 1) * 100:.0f}%, allowed "
+                    f"+{threshold * 100:.0f}%)"
+                )
+    return regressions
+
+
+def machine() -> dict:
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": FFMPEG_BINARY,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--media",
+        default="30x360,60x480",
+        help="comma-separated SECONDSxHEIGHT sources to generate",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    server = StandInServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ["OPENAI_API_KEY"] = "stand-in"
+    # Traces would be exported to the real API
+    set_tracing_disabled(True)
+    openai_client.reset_clients()
+
+    results = {}
+    try:
+        for media in args.media.split(","):
+            seconds, height = (int(part) for part in media.split("x"))
+            server.seconds = seconds
+            with tempfile.TemporaryDirectory() as work:
+                results[f"{seconds}s_{height}p"] = bench_source(
+                    Path(work), seconds, height, args.repeat
+                )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    report = {"machine": machine(), "thresholds": THRESHOLDS, "results": results}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Saved baseline to {args.baseline}", file=sys.stderr)
+        return
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+        return
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("machine") != report["machine"]:
+        print("Warning: the baseline was recorded on another machine", file=sys.stderr)
+    regressions = compare(results, baseline)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+    print("No stage regressed beyond its threshold", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+"""Process a directory or manifest of videos without the Streamlit UI.
+
+    python cli.py VIDEOS [--output batch] [--prompt-file PROMPT]
+        [--extract-workers 2] [--transcribe-workers 4] [--llm-workers 4]
+        [--cut-workers 1] [--bundle-workers 2] [--export-workers N]
+        [--cut-mode smart] [--profile final] [--formats original,vertical]
+        [--no-snap] [--restart]
+
+VIDEOS is a directory, whose video files are all processed, or a manifest
+listing one video path per line (relative to the manifest; blank lines and
+lines starting with # are skipped).
+
+Every video goes through the stages of a process job: audio extraction,
+transcription, picking edits with the LLM, cutting and bundling. Videos move
+through the stages independently, and each stage runs at most its number of
+workers at once, so one video can be cut while others are being transcribed.
+
+Each video works in its own directory under --output. After every stage its
+outputs are recorded in progress.json, so running the same command again
+resumes where the last run stopped (from the LLM stage on, if the prompt has
+changed); --restart starts over. The run ends with a throughput summary, also
+written to summary.json.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from lib.cache import hash_text
+from lib.convert import convert_video_to_audio
+from lib.cut_video import CUT_MODES, cut_video_segments
+from lib.download import zip_and_download_files
+from lib.instrumentation import RunRecorder
+from lib.llm import process_transcription_with_llm
+from lib.output_formats import OUTPUT_FORMATS
+from lib.pipeline import default_export_workers
+from lib.probe import probe_media
+from lib.render_profiles import RENDER_PROFILES
+from lib.transcribe import transcribe_audio_chunked
+
+STAGES = ("audio_extraction", "transcription", "llm", "cutting", "bundling")
+# Stages at most this many videos may be in at once, unless overridden
+DEFAULT_WORKERS = {
+    "audio_extraction": 2,
+    "transcription": 4,
+    "llm": 4,
+    "cutting": 1,
+    "bundling": 2,
+}
+# Stages that block on local work rather than awaiting the API
+THREAD_STAGES = ("audio_extraction", "cutting", "bundling")
+
+VIDEO_SUFFIXES = (".mp4", ".avi", ".mov", ".mkv", ".wmv", ".flv", ".webm")
+DEFAULT_PROMPT_FILE = Path(__file__).parent / "app_tabs" / "prompt.txt"
+PROGRESS_FILENAME = "progress.json"
+SUMMARY_FILENAME = "summary.json"
+
+
+def find_videos(source: str | Path) -> list[Path]:
+    """The videos in a directory, or those listed in a manifest file."""
+    source = Path(source)
+    if source.is_dir():
+        return sorted(
+            path.resolve()
+            for path in source.iterdir()
+            if path.is_file() and path.suffix.lower() in VIDEO_SUFFIXES
+        )
+
+    videos = []
+    for line in source.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            videos.append((source.parent / line).resolve())
+    return videos
+
+
+def video_work_name(video: Path) -> str:
+    """Directory name for one video's files, unique per source path."""
+    return f"{video.stem}_{hash_text(str(video))[:8]}"
+
+
+class BatchProgress:
+    """Outputs of every finished stage of every video, kept in a JSON file.
+
+    The file is rewritten after each stage, so a rerun skips the stages whose
+    outputs are still on disk. A stage may also record a fingerprint of its
+    other inputs (such as the prompt); it is only skipped while that matches.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        try:
+            self.videos: dict[str, dict] = json.loads(
+                self.path.read_text(encoding="utf-8")
+            )
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.videos = {}
+
+    def outputs(
+        self, video: str, stage: str, fingerprint: str | None = None
+    ) -> dict | None:
+        """The recorded outputs of a stage, if it finished with the same
+        fingerprint and they still exist."""
+        entry = self.videos.get(video, {}).get("stages", {}).get(stage)
+        if entry is None or entry.get("fingerprint") != fingerprint:
+            return None
+        outputs = entry["outputs"]
+        paths = [
+            path
+            for value in outputs.values()
+            for path in (value if isinstance(value, list) else [value])
+        ]
+        return outputs if all(Path(path).exists() for path in paths) else None
+
+    def record(
+        self,
+        video: str,
+        stage: str,
+        outputs: dict,
+        seconds: float,
+        fingerprint: str | None = None,
+    ) -> None:
+        entry = self.videos.setdefault(video, {"stages": {}})
+        entry["stages"][stage] = {"outputs": outputs, "seconds": seconds}
+        if fingerprint is not None:
+            entry["stages"][stage]["fingerprint"] = fingerprint
+        entry.pop("error", None)
+        self.save()
+
+    def fail(self, video: str, stage: str, error: str) -> None:
+        entry = self.videos.setdefault(video, {"stages": {}})
+        entry["error"] = f"{stage}: {error}"
+        self.save()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        partial = self.path.with_suffix(".json.part")
+        partial.write_text(json.dumps(self.videos, indent=2), encoding="utf-8")
+        os.replace(partial, self.path)
+
+
+async def process_video(
+    video: Path,
+    work_dir: Path,
+    prompt: str,
+    args: argparse.Namespace,
+    limits: dict[str, asyncio.Semaphore],
+    progress: BatchProgress,
+) -> dict:
+    """Run one video through every stage it has not finished yet.
+
+    Once one stage runs, every later stage runs again too, since its inputs
+    may have changed; the LLM stage also reruns when the prompt has changed.
+    Returns how the video went: its status ("done", "skipped" when every stage
+    had already finished, or "failed"), the seconds spent in each stage that
+    ran, and the source duration.
+    """
+    key = str(video)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    recorder = RunRecorder("batch")
+    ran: dict[str, float] = {}
+    current = "probe"
+
+    async def stage(name: str, run, fingerprint: str | None = None) -> dict:
+        nonlocal current
+        current = name
+        outputs = None if ran else progress.outputs(key, name, fingerprint)
+        if outputs is not None:
+            return outputs
+        async with limits[name]:
+            with recorder.stage(name) as metrics:
+                outputs = await run()
+        ran[name] = metrics.wall_seconds
+        progress.record(key, name, outputs, metrics.wall_seconds, fingerprint)
+        print(f"{video.name}: {name} took {metrics.wall_seconds:.1f}s")
+        return outputs
+
+    async def extract() -> dict:
+        audio_path = work_dir / "audio.mp3"
+        await asyncio.to_thread(convert_video_to_audio, str(video), str(audio_path))
+        return {"audio": str(audio_path)}
+
+    async def transcribe() -> dict:
+        return {"transcript": str(await transcribe_audio_chunked(audio["audio"]))}
+
+    async def pick_edits() -> dict:
+        edits_path = work_dir / "processed_result.json"
+        edits_path.unlink(missing_ok=True)
+        await process_transcription_with_llm(
+            transcript["transcript"], prompt, str(edits_path)
+        )
+        if not edits_path.exists():
+            raise ValueError("The LLM did not return any edits for this video.")
+        return {"edits": str(edits_path)}
+
+    async def cut() -> dict:
+        # Clips of an earlier attempt would otherwise end up in the bundle
+        shutil.rmtree(work_dir / "clips", ignore_errors=True)
+        # Rendering blocks its event loop, so it gets one of its own in a thread
+        exported_files = await asyncio.to_thread(
+            asyncio.run,
+            cut_video_segments(
+                str(video),
+                edits["edits"],
+                mode=args.cut_mode,
+                workers=args.export_workers,
+                exports_dir=work_dir / "clips",
+                temp_dir=work_dir,
+                snap=args.snap,
+                profile=args.profile,
+                formats=args.formats,
+            ),
+        )
+        return {"run_dir": str(work_dir / "clips"), "exported_files": exported_files}
+
+    async def bundle() -> dict:
+        zip_file_path = await asyncio.to_thread(
+            asyncio.run, zip_and_download_files(clips["run_dir"], str(work_dir))
+        )
+        return {"zip": zip_file_path}
+
+    duration = 0.0
+    try:
+        duration = probe_media(video).duration
+        audio = await stage("audio_extraction", extract)
+        transcript = await stage("transcription", transcribe)
+        edits = await stage("llm", pick_edits, hash_text(prompt))
+        clips = await stage("cutting", cut)
+        await stage("bundling", bundle)
+    except Exception as e:
+        print(f"Error processing {video}: {current}: {e}")
+        progress.fail(key, current, str(e))
+        return {"status": "failed", "stages": ran, "duration": duration}
+    finally:
+        if recorder.stages:
+            recorder.write(work_dir)
+
+    return {"status": "done" if ran else "skipped", "stages": ran, "duration": duration}
+
+
+def summarize(results: list[dict], wall_seconds: float) -> dict:
+    """Throughput of the videos processed in this run."""
+    processed = [result for result in results if result["status"] == "done"]
+    audio_minutes = sum(result["duration"] for result in processed) / 60
+    stage_seconds = {
+        name: sum(result["stages"].get(name, 0.0) for result in results)
+        for name in STAGES
+    }
+    return {
+        "videos": len(results),
+        "processed": len(processed),
+        "skipped": sum(result["status"] == "skipped" for result in results),
+        "failed": sum(result["status"] == "failed" for result in results),
+        "wall_seconds": wall_seconds,
+        "videos_per_hour": len(processed) * 3600 / max(wall_seconds, 1e-6),
+        "audio_minutes": audio_minutes,
+        "audio_minutes_per_second": audio_minutes / max(wall_seconds, 1e-6),
+        "stage_seconds": stage_seconds,
+    }
+
+
+async def run_batch(videos: list[Path], prompt: str, args: argparse.Namespace) -> dict:
+    output = Path(args.output)
+    progress_path = output / PROGRESS_FILENAME
+    if args.restart:
+        progress_path.unlink(missing_ok=True)
+    progress = BatchProgress(progress_path)
+
+    workers = {name: getattr(args, f"{name}_workers") for name in STAGES}
+    limits = {name: asyncio.Semaphore(count) for name, count in workers.items()}
+    # Enough threads for every blocking stage to run at its limit
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=sum(workers[name] for name in THREAD_STAGES))
+    )
+
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(
+            process_video(
+                video, output / video_work_name(video), prompt, args, limits, progress
+            )
+            for video in videos
+        )
+    )
+    return summarize(list(results), time.perf_counter() - started)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("videos", type=Path, help="directory or manifest of videos")
+    parser.add_argument("--output", type=Path, default=Path("batch"))
+    parser.add_argument("--prompt-file", type=Path, default=DEFAULT_PROMPT_FILE)
+    parser.add_argument(
+        "--extract-workers",
+        dest="audio_extraction_workers",
+        type=int,
+        default=DEFAULT_WORKERS["audio_extraction"],
+    )
+    parser.add_argument(
+        "--transcribe-workers",
+        dest="transcription_workers",
+        type=int,
+        default=DEFAULT_WORKERS["transcription"],
+    )
+    parser.add_argument("--llm-workers", type=int, default=DEFAULT_WORKERS["llm"])
+    parser.add_argument(
+        "--cut-workers",
+        dest="cutting_workers",
+        type=int,
+        default=DEFAULT_WORKERS["cutting"],
+    )
+    parser.add_argument(
+        "--bundle-workers",
+        dest="bundling_workers",
+        type=int,
+        default=DEFAULT_WORKERS["bundling"],
+    )
+    parser.add_argument(
+        "--export-workers",
+        type=int,
+        help="export processes per cut (default: cores split between cut workers)",
+    )
+    parser.add_argument("--cut-mode", choices=CUT_MODES, default="smart")
+    parser.add_argument("--profile", choices=list(RENDER_PROFILES), default="final")
+    parser.add_argument(
+        "--formats",
+        type=lambda value: value.split(","),
+        help=f"comma-separated output formats out of {', '.join(OUTPUT_FORMATS)}",
+    )
+    parser.add_argument(
+        "--snap",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="move clip ends to nearby pauses instead of padding by 2 seconds",
+    )
+    parser.add_argument(
+        "--restart", action="store_true", help="ignore the progress of earlier runs"
+    )
+    args = parser.parse_args(argv)
+    if not args.videos.exists():
+        parser.error(f"{args.videos} does not exist")
+    access = os.R_OK | os.X_OK if args.videos.is_dir() else os.R_OK
+    if not os.access(args.videos, access):
+        parser.error(f"{args.videos} cannot be read")
+    if not args.prompt_file.is_file():
+        parser.error(f"prompt file {args.prompt_file} does not exist")
+    unknown = [name for name in args.formats or () if name not in OUTPUT_FORMATS]
+    if unknown:
+        parser.error(f"unknown output formats: {', '.join(unknown)}")
+    if args.export_workers is None:
+        args.export_workers = default_export_workers(args.cutting_workers)
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    videos = find_videos(args.videos)
+    if not videos:
+        print(f"No videos found in {args.videos}")
+        return 1
+    prompt = args.prompt_file.read_text(encoding="utf-8")
+
+    summary = asyncio.run(run_batch(videos, prompt, args))
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    (args.output / SUMMARY_FILENAME).write_text(json.dumps(summary, indent=2))
+    print(
+        f"{summary['processed']} processed, {summary['skipped']} already done, "
+        f"{summary['failed']} failed in {summary['wall_seconds']:.1f}s: "
+        f"{summary['videos_per_hour']:.1f} videos/hour, "
+        f"{summary['audio_minutes_per_second']:.2f} audio minutes/second"
+    )
+    for name, seconds in summary["stage_seconds"].items():
+        print(f"  {name}: {seconds:.1f}s")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from moviepy.config import FFMPEG_BINARY
+
+# Energy is measured on 8 kHz mono; speech pauses don't need more.
+ANALYSIS_SAMPLE_RATE = 8000
+HOP_SECONDS = 0.02
+# Audio read from ffmpeg per step; only the envelope is kept afterwards.
+DECODE_BLOCK_SECONDS = 60
+
+# A window is quiet when it is within GAP_MARGIN_DB of the recording's noise
+# floor (its 5th percentile), and never louder than MAX_GAP_DB.
+GAP_MARGIN_DB = 10.0
+MAX_GAP_DB = -25.0
+MIN_GAP_SECONDS = 0.15
+# Cut this far inside a gap, so a breath of silence stays around the speech.
+GAP_LEAD_SECONDS = 0.1
+
+# Boundaries move at most SNAP_TOLERANCE outward and SNAP_INSET inward,
+# so snapping never drops more than a fraction of a word.
+SNAP_TOLERANCE = 2.0
+SNAP_INSET = 0.25
+
+_envelope_cache: dict[tuple[str, int, int], "AudioEnvelope"] = {}
+
+
+@dataclass(frozen=True)
+class AudioEnvelope:
+    """RMS level in dBFS of consecutive hop_seconds windows of one source."""
+
+    hop_seconds: float
+    rms_db: np.ndarray
+    gap_starts: np.ndarray
+    gap_ends: np.ndarray
+
+    @property
+    def duration(self) -> float:
+        return len(self.rms_db) * self.hop_seconds
+
+    def snap_start(
+        self, t: float, tolerance: float = SNAP_TOLERANCE, inset: float = SNAP_INSET
+    ) -> float | None:
+        """Cut point just before speech resumes at the gap nearest t, if any."""
+        cuts = np.maximum(self.gap_starts, self.gap_ends - GAP_LEAD_SECONDS)
+        return _nearest(cuts, t, t - tolerance, t + inset)
+
+    def snap_end(
+        self, t: float, tolerance: float = SNAP_TOLERANCE, inset: float = SNAP_INSET
+    ) -> float | None:
+        """Cut point just after speech stops at the gap nearest t, if any."""
+        cuts = np.minimum(self.gap_ends, self.gap_starts + GAP_LEAD_SECONDS)
+        return _nearest(cuts, t, t - inset, t + tolerance)
+
+
+def compute_envelope(
+    samples: np.ndarray,
+    sample_rate: int = ANALYSIS_SAMPLE_RATE,
+    hop_seconds: float = HOP_SECONDS,
+) -> np.ndarray:
+    """RMS level in dBFS of each full hop of int16 or float samples."""
+    hop = max(1, round(sample_rate * hop_seconds))
+    usable = len(samples) - len(samples) % hop
+    frames = samples[:usable].reshape(-1, hop).astype(np.float32)
+    if samples.dtype == np.int16:
+        frames /= 32768.0
+    rms = np.sqrt(np.mean(np.square(frames), axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-6))
+
+
+def find_gaps(
+    rms_db: np.ndarray,
+    hop_seconds: float = HOP_SECONDS,
+    min_gap: float = MIN_GAP_SECONDS,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return start and end times of every run of quiet windows."""
+    if not len(rms_db):
+        return np.empty(0), np.empty(0)
+
+    threshold = min(np.percentile(rms_db, 5) + GAP_MARGIN_DB, MAX_GAP_DB)
+    quiet = np.concatenate(([False], rms_db < threshold, [False]))
+    edges = np.flatnonzero(np.diff(quiet.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    keep = (ends - starts) * hop_seconds >= min_gap
+    return starts[keep] * hop_seconds, ends[keep] * hop_seconds
+
+
+def analyze_audio(video_path: str) -> AudioEnvelope | None:
+    """Decode the audio once and return its energy envelope and quiet gaps.
+
+    Results are cached per file, so every edit after the first is a lookup.
+    Returns None when the source has no audio.
+    """
+    path = Path(video_path).resolve()
+    stat = path.stat()
+    cache_key = (str(path), stat.st_size, stat.st_mtime_ns)
+    if cache_key in _envelope_cache:
+        return _envelope_cache[cache_key]
+
+    proc = subprocess.Popen(
+        [
+            FFMPEG_BINARY,
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-i",
+            str(path),
+            "-map",
+            "0:a:0",
+            "-vn",
+            "-ac",
+            "1",
+            "-ar",
+            str(ANALYSIS_SAMPLE_RATE),
+            "-f",
+            "s16le",
+            "-",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    # Whole hops per block so blocks can be analysed independently
+    hop_bytes = round(ANALYSIS_SAMPLE_RATE * HOP_SECONDS) * 2
+    block_bytes = DECODE_BLOCK_SECONDS * ANALYSIS_SAMPLE_RATE * 2
+    block_bytes -= block_bytes % hop_bytes
+
+    levels = []
+    while block := proc.stdout.read(block_bytes):
+        levels.append(compute_envelope(np.frombuffer(block, dtype=np.int16)))
+    stderr = proc.stderr.read().decode(errors="replace")
+    if proc.wait():
+        if "matches no streams" in stderr:
+            return None
+        raise IOError(stderr)
+
+    rms_db = np.concatenate(levels) if levels else np.empty(0, dtype=np.float32)
+    envelope = AudioEnvelope(HOP_SECONDS, rms_db, *find_gaps(rms_db))
+    _envelope_cache[cache_key] = envelope
+    return envelope
+
+
+def _nearest(cuts: np.ndarray, t: float, low: float, high: float) -> float | None:
+    candidates = cuts[(cuts >= low) & (cuts <= high)]
+    if not len(candidates):
+        return None
+    return float(candidates[np.argmin(np.abs(candidates - t))])
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = "cache"
+DEFAULT_MAX_BYTES = 2 * 1024**3
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Return the sha256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def llm_result_key(transcript_hash: str, prompt_hash: str, model: str) -> str:
+    return hash_text(f"{transcript_hash}:{prompt_hash}:{model}")
+
+
+class ArtifactCache:
+    """Content-addressed file cache with a size bound and LRU eviction.
+
+    Artifacts are stored as ``<root>/<kind>/<key><suffix>``; ``index.json``
+    tracks their size and last use so the least recently used entries are
+    evicted first once the total exceeds ``max_bytes``.
+    """
+
+    def __init__(
+        self, root: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits: dict[str, int] = {}
+        self.misses: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._index_path = self.root / "index.json"
+        self._index = self._load_index()
+
+    def get(self, kind: str, key: str) -> Path | None:
+        """Return the cached artifact path, or None on a miss."""
+        entry_id = f"{kind}/{key}"
+        with self._lock:
+            entry = self._index.get(entry_id)
+            path = self.root / entry["path"] if entry else None
+            if path is None or not path.exists():
+                self._index.pop(entry_id, None)
+                self.misses[kind] = self.misses.get(kind, 0) + 1
+                return None
+
+            entry["last_used"] = time.time()
+            self.hits[kind] = self.hits.get(kind, 0) + 1
+            self._save_index()
+            return path
+
+    def put(self, kind: str, key: str, source_path: str) -> Path:
+        """Copy an artifact into the cache and return its cached path."""
+        source = Path(source_path)
+        relative = Path(kind) / f"{key}{source.suffix}"
+        target = self.root / relative
+        target.parent.mkdir(parents=True, exist_ok=True)
+
+        partial = target.with_name(f".{target.name}.{os.getpid()}.part")
+        shutil.copyfile(source, partial)
+        os.replace(partial, target)
+
+        with self._lock:
+            self._index[f"{kind}/{key}"] = {
+                "path": str(relative),
+                "size": target.stat().st_size,
+                "last_used": time.time(),
+            }
+            self._evict(keep=f"{kind}/{key}")
+            self._save_index()
+        return target
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry["size"] for entry in self._index.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": dict(self.hits),
+                "misses": dict(self.misses),
+                "entries": len(self._index),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _evict(self, keep: str) -> None:
+        by_age = sorted(self._index.items(), key=lambda item: item[1]["last_used"])
+        total = self.total_bytes
+        for entry_id, entry in by_age:
+            if total <= self.max_bytes:
+                break
+            if entry_id == keep:
+                continue
+            (self.root / entry["path"]).unlink(missing_ok=True)
+            del self._index[entry_id]
+            total -= entry["size"]
+
+    def _load_index(self) -> dict:
+        try:
+            return json.loads(self._index_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_index(self) -> None:
+        partial = self._index_path.with_suffix(".json.part")
+        partial.write_text(json.dumps(self._index), encoding="utf-8")
+        os.replace(partial, self._index_path)
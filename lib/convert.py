@@ -1,18 +1,133 @@
-import moviepy as mp
+import asyncio
+from pathlib import Path
+from typing import AsyncIterator
 
+from moviepy.config import FFMPEG_BINARY
+from moviepy.tools import subprocess_call
 
-def convert_video_to_audio(video_file_path: str, output_audio_path: str) -> None:
-    """Convert video file to audio file using moviepy"""
-    video_clip = mp.VideoFileClip(video_file_path)
-    audio_clip = video_clip.audio
+from lib.probe import probe_media
 
-    if audio_clip is None:
+# Whisper rejects uploads above 25 MB
+WHISPER_MAX_BYTES = 25 * 1024 * 1024
+
+# Whisper resamples to 16 kHz mono, so nothing above that helps transcription.
+SPEECH_SAMPLE_RATE = 16000
+# Mono mp3 rates, best first. 16 kbps is the floor for speech-grade audio;
+# below about 32 kbps sibilants smear and Whisper starts dropping words.
+SPEECH_BITRATES_KBPS = (48, 32, 24, 16)
+
+# Container overhead and VBR drift allowance when estimating output size
+SIZE_MARGIN = 0.95
+
+
+def pick_speech_bitrate(duration: float, max_bytes: int = WHISPER_MAX_BYTES) -> int:
+    """Return the highest speech-grade bitrate (kbps) that fits under max_bytes.
+
+    The lowest rate would give the smallest upload, but any rate that fits is
+    already under the Whisper limit, and the extra MB cost less than the words
+    lost at lower rates. Longer recordings step down the ladder instead; past
+    about three hours even 16 kbps no longer fits and is returned anyway.
+    """
+    for kbps in SPEECH_BITRATES_KBPS:
+        if kbps * 1000 / 8 * duration <= max_bytes * SIZE_MARGIN:
+            return kbps
+    return SPEECH_BITRATES_KBPS[-1]
+
+
+def convert_video_to_audio(video_file_path: str, output_audio_path: str) -> int:
+    """Extract the audio stream to a speech-grade mp3 and return its size in bytes.
+
+    Only the audio stream is demuxed and decoded; video frames are never read.
+    """
+    media = probe_media(video_file_path)
+
+    if not media.has_audio:
         raise ValueError("The video file does not contain an audio track.")
 
     # Compress the audio to reduce file size for Whisper transcription
+    bitrate = pick_speech_bitrate(media.duration)
+
+    subprocess_call(
+        [
+            FFMPEG_BINARY,
+            "-y",
+            "-i",
+            str(video_file_path),
+            "-map",
+            "0:a:0",
+            "-vn",
+            "-ac",
+            "1",
+            "-ar",
+            str(SPEECH_SAMPLE_RATE),
+            "-c:a",
+            "libmp3lame",
+            "-b:a",
+            f"{bitrate}k",
+            str(output_audio_path),
+        ],
+        logger=None,
+    )
+
+    return Path(output_audio_path).stat().st_size
+
+
+async def extract_audio_chunks(
+    video_file_path: str, output_dir: str, chunk_seconds: float
+) -> AsyncIterator[tuple[Path, float, float]]:
+    """Extract speech audio as consecutive chunk files, yielding each one
+    (path, start, end) as soon as ffmpeg has finished writing it.
+
+    The chunks follow the encoder's frame boundaries, not silences, so this
+    trades the silence-aligned cuts of transcribe_audio_chunked for being able
+    to start on the first chunk while the rest is still being extracted.
+    """
+    if not probe_media(video_file_path).has_audio:
+        raise ValueError("The video file does not contain an audio track.")
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
 
-    audio_clip.write_audiofile(output_audio_path, bitrate="64k", fps=22050, codec="mp3")
+    proc = await asyncio.create_subprocess_exec(
+        FFMPEG_BINARY,
+        "-y",
+        "-loglevel",
+        "error",
+        "-i",
+        str(video_file_path),
+        "-map",
+        "0:a:0",
+        "-vn",
+        "-ac",
+        "1",
+        "-ar",
+        str(SPEECH_SAMPLE_RATE),
+        "-c:a",
+        "libmp3lame",
+        "-b:a",
+        f"{pick_speech_bitrate(chunk_seconds)}k",
+        "-f",
+        "segment",
+        "-segment_time",
+        str(chunk_seconds),
+        # One "name,start,end" line is written as each chunk is closed
+        "-segment_list",
+        "pipe:1",
+        "-segment_list_type",
+        "csv",
+        str(output_dir / "chunk_%03d.mp3"),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        async for line in proc.stdout:
+            name, start, end = line.decode().strip().rsplit(",", 2)
+            yield output_dir / name, float(start), float(end)
 
-    audio_clip.close()
-    video_clip.close()
-    return
+        stderr = await proc.stderr.read()
+        if await proc.wait():
+            raise IOError(stderr.decode(errors="replace"))
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
@@ -1,85 +1,418 @@
-from moviepy import VideoFileClip, concatenate_videoclips
+from moviepy import VideoFileClip
+import asyncio
 import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 from pathlib import Path
+from typing import Callable
 
+from lib.audio_analysis import analyze_audio
+from lib.fanout import fanout_export_segments
+from lib.output_formats import OutputFormat, get_formats, reframes
+from lib.probe import probe_media
+from lib.reel import REEL_FILENAME, concat_segments
+from lib.render_plan import (
+    MERGE_GAP_SECONDS,
+    PlannedSegment,
+    RenderPlan,
+    bound_edit,
+    plan_render,
+)
+from lib.render_backend import get_backend
+from lib.render_profiles import RenderProfile, get_profile
+from lib.smart_cut import KeyframeIndex, build_keyframe_index, smart_cut_segment
 
-async def cut_video_segments(video_path: str, processed_result_path: str) -> None:
-    with open(processed_result_path, "r") as f:
-        actual_edits = json.loads(f.read())
+# "smart" stream-copies whole GOPs and re-encodes only the partial GOPs at each
+# boundary; "fanout" decodes overlapping segments once and feeds every encoder
+# from that single pass; "reencode" renders every segment through moviepy.
+CUT_MODES = ("reencode", "smart", "fanout")
 
-    """Cut video segments based on the provided edits."""
+# progress(seconds_done, seconds_total) over the whole render plan
+CutProgress = Callable[[float, float], None]
+
+
+def _load_edits(edits) -> list[dict]:
+    """Accept a processed result path, a list of edits, or an agent result."""
+    if isinstance(edits, (str, Path)):
+        with open(edits, "r") as f:
+            return json.loads(f.read())
+
+    content = getattr(edits, "content", None) or getattr(edits, "final_output", None)
+    if content is not None:
+        edits = getattr(content, "edits", content)
+
+    return [
+        edit.model_dump() if hasattr(edit, "model_dump") else dict(edit)
+        for edit in edits
+    ]
+
+
+def plan_worker_threads(
+    workers: int | None, segment_count: int | None, cpu_count: int | None = None
+) -> tuple[int, int]:
+    """Split the CPU budget into (worker processes, encoder threads per worker).
+
+    There are never more workers than segments; segment_count is None when
+    segments arrive one at a time and their number is not known up front.
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    workers = workers or cpu_count
+    if segment_count is not None:
+        workers = min(workers, segment_count)
+    workers = max(1, min(workers, cpu_count))
+    return workers, max(1, cpu_count // workers)
 
-    try:
-        exports_dir = Path("exports")
-        exports_dir.mkdir(exist_ok=True)
 
-        video_clip = VideoFileClip(video_path)
+def _export_segment_worker(
+    video_path: str,
+    start_time: float,
+    end_time: float,
+    segment_path: Path,
+    temp_dir: str,
+    keyframe_index: KeyframeIndex | None,
+    threads: int,
+    profile: RenderProfile | None = None,
+    backend: str | None = None,
+    formats: list[OutputFormat] | None = None,
+) -> list[str]:
+    """Export one segment, in every format, in a worker with its own reader."""
+    profile = get_profile(profile)
+    if keyframe_index is not None and smart_cut_segment(
+        video_path,
+        start_time,
+        end_time,
+        str(segment_path),
+        keyframe_index,
+        profile.threads or threads,
+        profile,
+    ):
+        return [str(segment_path)]
 
-        print(actual_edits[0]["start"])
+    return get_backend(backend).render_segments(
+        video_path,
+        [(start_time, end_time, segment_path)],
+        profile,
+        threads,
+        temp_dir,
+        formats=formats,
+    )
 
-        sorted_edits = sorted(actual_edits, key=lambda x: x["start"])
 
-        clips_to_keep = []
-        exported_files = []
+async def _export_segments_parallel(
+    video_path: str,
+    segments: list[tuple[float, float, Path]],
+    keyframe_index: KeyframeIndex | None,
+    workers: int,
+    threads: int,
+    temp_dir: Path,
+    profile: RenderProfile,
+    backend: str | None,
+    formats: list[OutputFormat],
+    on_done: Callable[[float], None] | None = None,
+) -> list[str]:
+    loop = asyncio.get_running_loop()
+    # spawn, not fork: the Streamlit server process is multi-threaded
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        futures = [
+            loop.run_in_executor(
+                pool,
+                _export_segment_worker,
+                video_path,
+                start_time,
+                end_time,
+                segment_path,
+                str(temp_dir),
+                keyframe_index,
+                threads,
+                profile,
+                backend,
+                formats,
+            )
+            for start_time, end_time, segment_path in segments
+        ]
+        if on_done is not None:
+            for future, (start_time, end_time, _) in zip(futures, segments):
+                future.add_done_callback(
+                    lambda _, duration=end_time - start_time: on_done(duration)
+                )
+        # gather keeps submission order, so results line up with the edits
+        return [path for paths in await asyncio.gather(*futures) for path in paths]
+
+
+async def cut_video_segments(
+    video_path: str,
+    edits,
+    mode: str = "reencode",
+    workers: int | None = 1,
+    exports_dir: str | Path = "exports",
+    temp_dir: str | Path = "temp",
+    snap: bool = False,
+    plan: RenderPlan | None = None,
+    reel: bool = True,
+    profile: str | RenderProfile | None = None,
+    backend: str | None = None,
+    formats: list[str | OutputFormat] | None = None,
+    progress: CutProgress | None = None,
+    merge: bool = True,
+    merge_gap: float = MERGE_GAP_SECONDS,
+) -> list[str]:
+    """Cut video segments based on the provided edits into exports_dir.
+
+    The segments come from plan, or from plan_render over the edits when no
+    plan is given, so overlapping edits are encoded once; merge and merge_gap
+    are passed on to plan_render. With reel and more
+    than one segment, they are also joined in time order into REEL_FILENAME,
+    by stream copy where their streams agree; the reel is not part of the
+    returned list.
+    profile names the encoder settings (see RENDER_PROFILES). Profiles that
+    scale the video cannot copy source GOPs, so smart cutting is skipped.
+    Segments that are not smart cut are rendered by the named backend (see
+    RENDER_BACKENDS); fanout always decodes through moviepy.
+    formats names the frame shapes to write (see OUTPUT_FORMATS), each segment
+    in every format, segment by segment in the returned list. Formats other
+    than the source's are cropped or padded in the render pass itself, so they
+    rule out smart cutting and fanout too, and there is one reel per format.
+    With workers other than 1, segments render in a spawned process pool and
+    the CPU count is split evenly into encoder threads per worker; None uses
+    one worker per core. The fanout mode always renders from a single reader.
+    With snap, edit ends move to nearby pauses in the audio instead of being
+    padded by a fixed 2 seconds.
+    progress is called with the seconds of the plan encoded so far: as the
+    encoder reports them for the ffmpeg backend, otherwise as segments finish.
+    """
+    if mode not in CUT_MODES:
+        raise ValueError(f"Unknown cut mode: {mode}")
+    profile = get_profile(profile)
+    formats = get_formats(formats)
+    reframed = reframes(formats)
 
-        for i, edit in enumerate(sorted_edits):
-            start_time = edit["start"]
-            end_time = edit["end"]
+    try:
+        exports_dir = Path(exports_dir)
+        exports_dir.mkdir(parents=True, exist_ok=True)
+        temp_dir = Path(temp_dir)
+        temp_dir.mkdir(parents=True, exist_ok=True)
+
+        media = probe_media(video_path)
+        output_size = (
+            profile.output_size(media.video_size) if profile.max_height else None
+        )
+        keyframe_index = (
+            build_keyframe_index(video_path)
+            if mode == "smart" and output_size is None and not reframed
+            else None
+        )
 
-            # If start time is greater than 2, reduce it to 2 seconds otherwise set to 0
-            if start_time > 2:
-                start_time -= 2
-            else:
-                start_time = 0
+        if plan is None:
+            envelope = analyze_audio(video_path) if snap else None
+            plan = plan_render(
+                _load_edits(edits), media.duration, envelope, merge, merge_gap
+            )
 
-            # If end time is within 2 seconds of the video duration, set it to the video duration otherwise increase it by 2 seconds
-            if end_time < video_clip.duration - 2:
-                end_time += 2
-            else:
-                end_time = video_clip.duration
+        segments = [
+            (segment.start, segment.end, exports_dir / segment.filename)
+            for segment in plan.segments
+        ]
 
-            # Ensure times are within bounds
-            if start_time < 0:
-                start_time = 0
-            if end_time > video_clip.duration:
-                end_time = video_clip.duration
+        workers, threads = plan_worker_threads(workers, len(segments))
 
-            # Keep this segment
-            if start_time < end_time:
-                segment = video_clip.subclipped(start_time, end_time)
-                clips_to_keep.append(segment)
+        done_seconds = 0.0
 
-                # Export individual segment with audio
-                segment_filename = (
-                    f"segment_{i+1:03d}_{start_time:.1f}s-{end_time:.1f}s.mp4"
+        def advance(seconds: float) -> None:
+            nonlocal done_seconds
+            done_seconds += seconds
+            if progress is not None:
+                progress(done_seconds, plan.render_seconds)
+
+        if mode == "fanout" and not reframed:
+            video_clip = VideoFileClip(video_path)
+            try:
+                source = video_clip
+                if output_size is not None:
+                    source = video_clip.resized(new_size=output_size)
+                exported_files = fanout_export_segments(
+                    source, segments, str(temp_dir), profile=profile
                 )
-                segment_path = exports_dir / segment_filename
-                segment.write_videofile(
+            finally:
+                video_clip.close()
+            advance(plan.render_seconds)
+        elif workers > 1:
+            exported_files = await _export_segments_parallel(
+                video_path,
+                segments,
+                keyframe_index,
+                workers,
+                threads,
+                temp_dir,
+                profile,
+                backend,
+                formats,
+                advance,
+            )
+        else:
+            remaining = []
+            for start_time, end_time, segment_path in segments:
+                if keyframe_index is not None and smart_cut_segment(
+                    video_path,
+                    start_time,
+                    end_time,
                     str(segment_path),
-                    codec="libx264",
-                    audio_codec="aac",  # Ensure audio codec is specified
-                    temp_audiofile="temp/temp-audio.m4a",  # Temporary audio file
-                    remove_temp=True,  # Clean up temp files
+                    keyframe_index,
+                    profile.threads,
+                    profile,
+                ):
+                    advance(end_time - start_time)
+                else:
+                    remaining.append((start_time, end_time, segment_path))
+
+            smart_seconds = done_seconds
+            get_backend(backend).render_segments(
+                video_path,
+                remaining,
+                profile,
+                temp_dir=temp_dir,
+                formats=formats,
+                on_progress=lambda seconds: advance(
+                    smart_seconds + seconds - done_seconds
+                ),
+            )
+            exported_files = [
+                str(output_format.path(segment_path))
+                for _, _, segment_path in segments
+                for output_format in formats
+            ]
+
+        if reel and len(segments) > 1:
+            for n, output_format in enumerate(formats):
+                concat_segments(
+                    exported_files[n :: len(formats)],
+                    output_format.path(exports_dir / REEL_FILENAME),
+                    profile,
                 )
-                exported_files.append(str(segment_path))
-
-        # Concatenate the clips to keep for the main output
-        # if clips_to_keep:
-        #     final_clip = concatenate_videoclips(clips_to_keep)
-        # else:
-        #     final_clip = video_clip
-
-        # # Save the concatenated edited video
-        # output_path = str(video_path).replace(".mp4", "_edited.mp4")
-        # final_clip.write_videofile(
-        #     output_path,
-        #     codec="libx264",
-        #     audio_codec="aac",
-        #     temp_audiofile="temp/temp-audio.m4a",
-        #     remove_temp=True,
-        # )
+
+        return exported_files
 
     except Exception as e:
         print(f"Error cutting video segments: {e}")
         raise
+
+
+class IncrementalCutter:
+    """Export segments one at a time as edits arrive, while more are coming.
+
+    Up to ``workers`` exports run at once in threads (the encoding itself
+    happens in ffmpeg subprocesses). Fanout needs every segment up front, so
+    it is treated as smart cutting here. ``segments`` records what was
+    submitted, so the run can be re-rendered later with another profile.
+    Every segment is written in each of ``formats``. ``render_wall_seconds``
+    is the time from the first submit until the last export finished.
+    """
+
+    def __init__(
+        self,
+        video_path: str,
+        mode: str = "smart",
+        workers: int | None = 1,
+        exports_dir: str | Path = "exports",
+        temp_dir: str | Path = "temp",
+        started_at: float | None = None,
+        snap: bool = False,
+        profile: str | RenderProfile | None = None,
+        backend: str | None = None,
+        formats: list[str | OutputFormat] | None = None,
+    ):
+        if mode not in CUT_MODES:
+            raise ValueError(f"Unknown cut mode: {mode}")
+
+        self.video_path = str(video_path)
+        self.mode = mode
+        self.exports_dir = Path(exports_dir)
+        self.exports_dir.mkdir(parents=True, exist_ok=True)
+        self.temp_dir = Path(temp_dir)
+        self.temp_dir.mkdir(parents=True, exist_ok=True)
+        self.workers, self.threads = plan_worker_threads(workers, segment_count=None)
+        self.profile = get_profile(profile)
+        self.backend = backend
+        self.formats = get_formats(formats)
+        media = probe_media(self.video_path)
+        self.duration = media.duration
+        self.fps = media.fps
+        self.smart = (
+            mode in ("smart", "fanout")
+            and self.profile.output_size(media.video_size) is None
+            and not reframes(self.formats)
+        )
+        self.envelope = analyze_audio(self.video_path) if snap else None
+        # perf_counter() time that time-to-first-clip is measured from
+        self.started_at = started_at or time.perf_counter()
+        self.first_clip_seconds: float | None = None
+        self.render_wall_seconds = 0.0
+
+        self._first_submit_at: float | None = None
+        self._semaphore = asyncio.Semaphore(self.workers)
+        self._index_task: asyncio.Task | None = None
+        self._tasks: list[asyncio.Task] = []
+        self.segments: list[PlannedSegment] = []
+
+    def submit(self, edit: dict) -> None:
+        start_time, end_time = bound_edit(
+            edit["start"], edit["end"], self.duration, self.envelope
+        )
+        if start_time >= end_time:
+            return
+
+        if self._first_submit_at is None:
+            self._first_submit_at = time.perf_counter()
+        n = len(self._tasks) + 1
+        self.segments.append(
+            PlannedSegment(n, start_time, end_time, [len(self.segments)])
+        )
+        segment_path = self.exports_dir / self.segments[-1].filename
+        self._tasks.append(
+            asyncio.create_task(self._export(start_time, end_time, segment_path))
+        )
+
+    def plan(self) -> RenderPlan:
+        """The segments submitted so far, as a render plan."""
+        return RenderPlan(
+            self.segments, sum(segment.duration for segment in self.segments)
+        )
+
+    async def wait(self) -> list[str]:
+        """Wait for every submitted export; paths come back in submission order."""
+        return [path for paths in await asyncio.gather(*self._tasks) for path in paths]
+
+    async def _export(
+        self, start_time: float, end_time: float, segment_path: Path
+    ) -> list[str]:
+        keyframe_index = None
+        if self.smart:
+            if self._index_task is None:
+                self._index_task = asyncio.create_task(
+                    asyncio.to_thread(build_keyframe_index, self.video_path)
+                )
+            keyframe_index = await self._index_task
+
+        async with self._semaphore:
+            exported = await asyncio.to_thread(
+                _export_segment_worker,
+                self.video_path,
+                start_time,
+                end_time,
+                segment_path,
+                str(self.temp_dir),
+                keyframe_index,
+                self.threads,
+                self.profile,
+                self.backend,
+                self.formats,
+            )
+
+        if self.first_clip_seconds is None:
+            self.first_clip_seconds = time.perf_counter() - self.started_at
+        self.render_wall_seconds = time.perf_counter() - self._first_submit_at
+        return exported
@@ -1,20 +1,91 @@
+import io
 import zipfile
 import os
 from pathlib import Path
+from typing import Iterator
+
+# Already-compressed media gains nothing from deflate, so it is stored as is.
+STORED_SUFFIXES = frozenset(
+    ".mp4 .mov .mkv .webm .avi .m4a .mp3 .aac .jpg .jpeg .png .webp .zip".split()
+)
+ZIP_CHUNK_BYTES = 1024 * 1024
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Unseekable sink that holds zip output only until it is drained."""
+
+    def __init__(self):
+        self._pending = bytearray()
+        self._offset = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._pending += data
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def drain(self) -> bytes:
+        data = bytes(self._pending)
+        self._pending.clear()
+        return data
+
+
+def bundle_members(run_directory: str) -> list[tuple[Path, str]]:
+    """Return (path, name in archive) for every file under one run's directory."""
+    members = []
+    for root, _, files in os.walk(run_directory):
+        for file in sorted(files):
+            file_path = Path(root) / file
+            members.append((file_path, str(file_path.relative_to(run_directory))))
+    return sorted(members, key=lambda member: member[1])
+
+
+def iter_zip_stream(
+    run_directory: str, chunk_size: int = ZIP_CHUNK_BYTES
+) -> Iterator[bytes]:
+    """Yield a zip of one run's exports piece by piece.
+
+    Media is stored, anything else deflated. At most about one chunk of
+    output is buffered at a time, however large the bundle gets.
+    """
+    buffer = _StreamBuffer()
+
+    with zipfile.ZipFile(buffer, "w") as zipf:
+        for file_path, arcname in bundle_members(run_directory):
+            info = zipfile.ZipInfo.from_file(file_path, arcname)
+            info.compress_type = (
+                zipfile.ZIP_STORED
+                if file_path.suffix.lower() in STORED_SUFFIXES
+                else zipfile.ZIP_DEFLATED
+            )
+            with open(file_path, "rb") as src, zipf.open(
+                info, "w", force_zip64=True
+            ) as dst:
+                while chunk := src.read(chunk_size):
+                    dst.write(chunk)
+                    if data := buffer.drain():
+                        yield data
+            if data := buffer.drain():
+                yield data
+
+    if data := buffer.drain():
+        yield data
 
 
 async def zip_and_download_files(
     exports_directory: str, temp_directory: str = "temp"
 ) -> str:
-    """Zip the files in the directory and return the zip file path."""
+    """Zip one run's exports directory and return the zip file path."""
 
-    zip_file_path = Path(temp_directory) / "processed_files.zip"
+    zip_file_path = Path(temp_directory) / f"{Path(exports_directory).name}.zip"
 
-    # Create a zip file
-    with zipfile.ZipFile(zip_file_path, "w", zipfile.ZIP_DEFLATED) as zipf:
-        for root, _, files in os.walk(exports_directory):
-            for file in files:
-                file_path = Path(root) / file
-                zipf.write(file_path, file_path.relative_to(exports_directory))
+    with open(zip_file_path, "wb") as f:
+        for data in iter_zip_stream(exports_directory):
+            f.write(data)
 
     return str(zip_file_path)
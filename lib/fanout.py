@@ -0,0 +1,135 @@
+from pathlib import Path
+
+from moviepy.audio.io.ffmpeg_audiowriter import FFMPEG_AudioWriter
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+from lib.render_profiles import RenderProfile, get_profile
+
+AUDIO_FPS = 44100
+
+
+def group_overlapping(
+    segments: list[tuple[float, float, Path]],
+) -> list[list[tuple[float, float, Path]]]:
+    """Group segments into clusters whose intervals overlap or touch."""
+    clusters: list[list[tuple[float, float, Path]]] = []
+    cluster_end = float("-inf")
+    for segment in sorted(segments, key=lambda s: (s[0], s[1])):
+        if segment[0] <= cluster_end:
+            clusters[-1].append(segment)
+            cluster_end = max(cluster_end, segment[1])
+        else:
+            clusters.append([segment])
+            cluster_end = segment[1]
+    return clusters
+
+
+def fanout_export_segments(
+    video_clip,
+    segments: list[tuple[float, float, Path]],
+    temp_dir: str = "temp",
+    threads: int | None = None,
+    profile: RenderProfile | None = None,
+) -> list[str]:
+    """Export overlapping segments from a single decode of the source.
+
+    Each cluster of overlapping segments is read once in timestamp order; every
+    decoded audio chunk and video frame is written to all segment encoders whose
+    interval covers it.
+    """
+    profile = get_profile(profile)
+    Path(temp_dir).mkdir(exist_ok=True)
+    audio_paths = {
+        segment[2]: Path(temp_dir) / f"fanout-audio-{n:03d}.m4a"
+        for n, segment in enumerate(segments)
+    }
+
+    try:
+        for cluster in group_overlapping(segments):
+            if video_clip.audio is not None:
+                _fanout_audio(video_clip.audio, cluster, audio_paths, profile)
+            _fanout_video(video_clip, cluster, audio_paths, threads, profile)
+    finally:
+        for audio_path in audio_paths.values():
+            audio_path.unlink(missing_ok=True)
+
+    return [str(segment[2]) for segment in segments]
+
+
+def _fanout_audio(audio_clip, cluster, audio_paths, profile) -> None:
+    cluster_start = cluster[0][0]
+    cluster_end = max(end for _, end, _ in cluster)
+    bounds = [
+        (
+            round((start - cluster_start) * AUDIO_FPS),
+            round((end - cluster_start) * AUDIO_FPS),
+        )
+        for start, end, _ in cluster
+    ]
+    writers = [
+        FFMPEG_AudioWriter(
+            str(audio_paths[path]),
+            AUDIO_FPS,
+            nbytes=2,
+            nchannels=audio_clip.nchannels,
+            codec="aac",
+            bitrate=profile.audio_bitrate,
+        )
+        for _, _, path in cluster
+    ]
+
+    try:
+        position = 0
+        for chunk in audio_clip.subclipped(cluster_start, cluster_end).iter_chunks(
+            chunksize=AUDIO_FPS, fps=AUDIO_FPS, quantize=True, nbytes=2
+        ):
+            chunk_end = position + len(chunk)
+            for writer, (first, last) in zip(writers, bounds):
+                lo, hi = max(first, position), min(last, chunk_end)
+                if lo < hi:
+                    writer.write_frames(chunk[lo - position : hi - position])
+            position = chunk_end
+    finally:
+        for writer in writers:
+            writer.close()
+
+
+def _fanout_video(video_clip, cluster, audio_paths, threads, profile) -> None:
+    cluster_start = cluster[0][0]
+    cluster_end = max(end for _, end, _ in cluster)
+    open_writers: dict[Path, FFMPEG_VideoWriter] = {}
+    pending = list(cluster)
+
+    try:
+        source = video_clip.subclipped(cluster_start, cluster_end)
+        for t, frame in source.iter_frames(
+            fps=video_clip.fps, with_times=True, dtype="uint8"
+        ):
+            t += cluster_start
+
+            while pending and pending[0][0] <= t + 1e-6:
+                _, _, path = pending.pop(0)
+                audio_path = audio_paths[path]
+                open_writers[path] = FFMPEG_VideoWriter(
+                    str(path),
+                    video_clip.size,
+                    video_clip.fps,
+                    codec="libx264",
+                    audiofile=str(audio_path) if audio_path.exists() else None,
+                    preset=profile.preset,
+                    ffmpeg_params=profile.video_args(),
+                    threads=profile.threads or threads,
+                )
+
+            for _, end, path in cluster:
+                writer = open_writers.get(path)
+                if writer is None:
+                    continue
+                if t < end - 1e-6:
+                    writer.write_frame(frame)
+                else:
+                    writer.close()
+                    del open_writers[path]
+    finally:
+        for writer in open_writers.values():
+            writer.close()
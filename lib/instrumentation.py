@@ -0,0 +1,207 @@
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterator
+
+from lib.openai_client import metrics as api_metrics
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RUN_REPORT_FILENAME = "run_report.json"
+METRICS_FILE = Path("temp") / "metrics.prom"
+METRIC_PREFIX = "video_agent"
+
+
+@dataclass
+class StageMetrics:
+    """What one stage of a run cost.
+
+    Counters are process-wide, so a stage that runs alongside another job
+    also counts that job's work. CPU time and I/O include ffmpeg children
+    once they have exited; peak RSS is the highest seen so far by this
+    process or by any single child.
+    """
+
+    name: str
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    peak_rss_bytes: int | None = None
+    bytes_read: int | None = None
+    bytes_written: int | None = None
+    api_requests: int = 0
+    api_seconds: float = 0.0
+    api_retries: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+
+def _cpu_seconds() -> float:
+    if resource is None:
+        return time.process_time()
+    return sum(
+        usage.ru_utime + usage.ru_stime
+        for usage in (
+            resource.getrusage(resource.RUSAGE_SELF),
+            resource.getrusage(resource.RUSAGE_CHILDREN),
+        )
+    )
+
+
+def _peak_rss_bytes() -> int | None:
+    if resource is None:
+        return None
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _io_bytes() -> tuple[int | None, int | None]:
+    """Bytes read and written through system calls, where /proc reports them."""
+    try:
+        counters = dict(
+            line.split(": ")
+            for line in Path("/proc/self/io").read_text().splitlines()
+        )
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _difference(after: int | None, before: int | None) -> int | None:
+    return None if after is None or before is None else after - before
+
+
+class RunRecorder:
+    """Measures the stages of one run and writes them out as a run report."""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.stages: list[StageMetrics] = []
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageMetrics]:
+        """Measure the block; the caller may add tokens to the yielded metrics."""
+        stage = StageMetrics(name)
+        started = time.perf_counter()
+        cpu = _cpu_seconds()
+        bytes_read, bytes_written = _io_bytes()
+        api_requests, api_seconds, api_retries = api_metrics.totals()
+        try:
+            yield stage
+        finally:
+            stage.wall_seconds = time.perf_counter() - started
+            stage.cpu_seconds = _cpu_seconds() - cpu
+            stage.peak_rss_bytes = _peak_rss_bytes()
+            read_after, written_after = _io_bytes()
+            stage.bytes_read = _difference(read_after, bytes_read)
+            stage.bytes_written = _difference(written_after, bytes_written)
+            requests_after, seconds_after, retries_after = api_metrics.totals()
+            stage.api_requests = requests_after - api_requests
+            stage.api_seconds = seconds_after - api_seconds
+            stage.api_retries = retries_after - api_retries
+            self.stages.append(stage)
+
+    def report(self) -> dict:
+        return {
+            "kind": self.kind,
+            "total_seconds": time.perf_counter() - self._started,
+            "stages": [asdict(stage) for stage in self.stages],
+        }
+
+    def write(self, work_dir: str | Path) -> Path:
+        """Write the run report into work_dir and add it to the process metrics."""
+        report = self.report()
+        path = Path(work_dir) / RUN_REPORT_FILENAME
+        path.write_text(json.dumps(report, indent=2))
+        registry.observe(report)
+        return path
+
+
+# Totals summed over the stages of every run: (metric, help, StageMetrics field)
+_STAGE_COUNTERS = (
+    ("stage_runs_total", "Stages completed", None),
+    ("stage_wall_seconds_total", "Wall time spent in stages", "wall_seconds"),
+    ("stage_cpu_seconds_total", "CPU time spent in stages", "cpu_seconds"),
+    ("stage_read_bytes_total", "Bytes read during stages", "bytes_read"),
+    ("stage_written_bytes_total", "Bytes written during stages", "bytes_written"),
+    ("stage_api_requests_total", "API requests made during stages", "api_requests"),
+    ("stage_api_seconds_total", "API latency summed over requests", "api_seconds"),
+    ("stage_api_retries_total", "API calls retried during stages", "api_retries"),
+    ("stage_input_tokens_total", "LLM input tokens", "input_tokens"),
+    ("stage_output_tokens_total", "LLM output tokens", "output_tokens"),
+)
+
+
+class MetricsRegistry:
+    """Process-wide totals of every run report, in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs: dict[str, int] = {}
+        self.counters: dict[tuple[str, str, str], float] = {}
+        self.peak_rss_bytes = 0
+
+    def observe(self, report: dict) -> None:
+        kind = report["kind"]
+        with self._lock:
+            self.runs[kind] = self.runs.get(kind, 0) + 1
+            for stage in report["stages"]:
+                for metric, _, field_name in _STAGE_COUNTERS:
+                    value = 1 if field_name is None else stage[field_name]
+                    key = (metric, kind, stage["name"])
+                    self.counters[key] = self.counters.get(key, 0) + (value or 0)
+                self.peak_rss_bytes = max(
+                    self.peak_rss_bytes, stage["peak_rss_bytes"] or 0
+                )
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [
+                f"# HELP {METRIC_PREFIX}_runs_total Runs completed",
+                f"# TYPE {METRIC_PREFIX}_runs_total counter",
+            ]
+            lines += [
+                f'{METRIC_PREFIX}_runs_total{{kind="{kind}"}} {count}'
+                for kind, count in sorted(self.runs.items())
+            ]
+            for metric, description, _ in _STAGE_COUNTERS:
+                lines += [
+                    f"# HELP {METRIC_PREFIX}_{metric} {description}",
+                    f"# TYPE {METRIC_PREFIX}_{metric} counter",
+                ]
+                lines += [
+                    f'{METRIC_PREFIX}_{metric}{{kind="{kind}",stage="{stage}"}} '
+                    f"{int(value) if float(value).is_integer() else value}"
+                    for (name, kind, stage), value in sorted(self.counters.items())
+                    if name == metric
+                ]
+            lines += [
+                f"# HELP {METRIC_PREFIX}_peak_rss_bytes Highest peak RSS seen",
+                f"# TYPE {METRIC_PREFIX}_peak_rss_bytes gauge",
+                f"{METRIC_PREFIX}_peak_rss_bytes {self.peak_rss_bytes}",
+            ]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str | Path = METRICS_FILE) -> Path:
+        """Write the metrics for a node_exporter textfile collector to scrape."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written aside and renamed so a scrape never sees half a file
+        partial = path.with_suffix(".tmp")
+        partial.write_text(self.render())
+        partial.replace(path)
+        return path
+
+
+registry = MetricsRegistry()
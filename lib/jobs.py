@@ -0,0 +1,438 @@
+import asyncio
+import inspect
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+DEFAULT_JOBS_DB = "jobs/jobs.db"
+
+# Rough resident peak of one process job (decode buffers, moviepy frames and
+# the export workers it starts); used to size the pool on small instances.
+JOB_MEMORY_BYTES = 2 * 1024**3
+# Jobs allowed to wait per worker before new submissions are turned away.
+QUEUED_JOBS_PER_WORKER = 4
+POLL_SECONDS = 1.0
+# Running jobs are stamped this often by the process running them; one whose
+# stamp is older than STALE_SECONDS is taken to belong to a dead process.
+HEARTBEAT_SECONDS = 10.0
+STALE_SECONDS = 60.0
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED_STATUSES = (DONE, FAILED)
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    params: dict
+    status: str
+    progress: float
+    message: str
+    result: dict | None
+    error: str | None
+    created_at: float
+    started_at: float | None
+    finished_at: float | None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+_BOOT_TOKEN = uuid.uuid4().hex[:8]
+
+
+def process_owner() -> str:
+    """Who claims jobs for this process: host, pid and a token for this boot,
+    so a later process that reuses the pid is not mistaken for this one."""
+    return f"{socket.gethostname()}:{os.getpid()}:{_BOOT_TOKEN}"
+
+
+def owner_gone(owner: str) -> bool:
+    """Whether the process that owner names has certainly exited.
+
+    Only processes on this host can be checked; others count as alive until
+    their heartbeat goes stale.
+    """
+    try:
+        host, pid, token = owner.rsplit(":", 2)
+        pid = int(pid)
+    except ValueError:
+        return False
+    if host != socket.gethostname():
+        return False
+    if pid == os.getpid():
+        return token != _BOOT_TOKEN
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def total_memory_bytes() -> int | None:
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def plan_job_workers(
+    cpu_count: int | None = None,
+    memory_bytes: int | None = None,
+    job_memory: int = JOB_MEMORY_BYTES,
+) -> int:
+    """Number of jobs to run at once given the cores and memory available.
+
+    Each job gets at least two cores, so export workers and encoder threads
+    inside a job still have room, and at most memory / job_memory jobs run.
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    workers = max(1, cpu_count // 2)
+    memory_bytes = memory_bytes if memory_bytes is not None else total_memory_bytes()
+    if memory_bytes:
+        workers = min(workers, max(1, memory_bytes // job_memory))
+    return workers
+
+
+class JobStore:
+    """SQLite-backed job table shared by the UI and the worker threads.
+
+    Several server processes may share the file. A claimed job records its
+    owner (see process_owner) and a heartbeat, so each process only requeues
+    jobs whose owner has exited or stopped beating.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_JOBS_DB, owner: str | None = None):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.owner = owner or process_owner()
+        self._lock = threading.Lock()
+        with self._connect() as db:
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    message TEXT NOT NULL DEFAULT '',
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    owner TEXT,
+                    heartbeat_at REAL
+                )
+                """
+            )
+            columns = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+            # Tables created before jobs had owners
+            for column, kind in (("owner", "TEXT"), ("heartbeat_at", "REAL")):
+                if column not in columns:
+                    db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)"
+            )
+
+    def submit(
+        self,
+        kind: str,
+        params: dict,
+        job_id: str | None = None,
+        max_pending: int | None = None,
+    ) -> str:
+        """Queue a job and return its ID, or raise QueueFullError."""
+        job_id = job_id or new_job_id()
+        with self._lock, self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            if max_pending is not None:
+                (pending,) = db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)
+                ).fetchone()
+                if pending >= max_pending:
+                    raise QueueFullError(
+                        f"{pending} jobs are already waiting; try again shortly."
+                    )
+            db.execute(
+                "INSERT INTO jobs (id, kind, params, status, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(params), QUEUED, time.time()),
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Job | None:
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def claim_next(self) -> Job | None:
+        """Mark the oldest queued job as running and return it."""
+        with self._lock, self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                (QUEUED,),
+            ).fetchone()
+            if row is None:
+                return None
+            started_at = time.time()
+            db.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, owner = ?,"
+                " heartbeat_at = ? WHERE id = ?",
+                (RUNNING, started_at, self.owner, started_at, row["id"]),
+            )
+        job = _row_to_job(row)
+        job.status, job.started_at = RUNNING, started_at
+        return job
+
+    def report(self, job_id: str, message: str, progress: float | None = None) -> None:
+        with self._connect() as db:
+            if progress is None:
+                db.execute(
+                    "UPDATE jobs SET message = ? WHERE id = ?", (message, job_id)
+                )
+            else:
+                db.execute(
+                    "UPDATE jobs SET message = ?, progress = ? WHERE id = ?",
+                    (message, progress, job_id),
+                )
+
+    def finish(self, job_id: str, result: dict) -> None:
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, progress = 1, result = ?, finished_at = ?"
+                " WHERE id = ?",
+                (DONE, json.dumps(result), time.time(), job_id),
+            )
+
+    def fail(self, job_id: str, error: str) -> None:
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (FAILED, error, time.time(), job_id),
+            )
+
+    def counts(self) -> dict[str, int]:
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return {status: count for status, count in rows}
+
+    def active(self) -> list[Job]:
+        """Jobs that are queued or running."""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT * FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchall()
+        return [_row_to_job(row) for row in rows]
+
+    def queued_ahead(self, job_id: str) -> int:
+        """Number of queued jobs that will start before job_id."""
+        with self._connect() as db:
+            (ahead,) = db.execute(
+                "SELECT COUNT(*) FROM jobs AS other, jobs AS job"
+                " WHERE job.id = ? AND job.status = ? AND other.status = ?"
+                " AND other.created_at < job.created_at",
+                (job_id, QUEUED, QUEUED),
+            ).fetchone()
+        return ahead
+
+    def heartbeat(self) -> None:
+        """Stamp the jobs this store's owner is running as still alive."""
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE status = ? AND owner = ?",
+                (time.time(), RUNNING, self.owner),
+            )
+
+    def requeue_interrupted(self, stale_after: float = STALE_SECONDS) -> int:
+        """Put jobs left running by a server process that has exited, or whose
+        heartbeat is older than stale_after seconds, back in the queue."""
+        with self._lock, self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            stale_before = time.time() - stale_after
+            rows = db.execute(
+                "SELECT id, owner, heartbeat_at FROM jobs WHERE status = ?",
+                (RUNNING,),
+            ).fetchall()
+            interrupted = [
+                row["id"]
+                for row in rows
+                if row["owner"] is None
+                or (row["heartbeat_at"] or 0) < stale_before
+                or (row["owner"] != self.owner and owner_gone(row["owner"]))
+            ]
+            for job_id in interrupted:
+                db.execute(
+                    "UPDATE jobs SET status = ?, started_at = NULL, progress = 0,"
+                    " owner = NULL, heartbeat_at = NULL WHERE id = ?",
+                    (QUEUED, job_id),
+                )
+            return len(interrupted)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return _closing(db)
+
+
+class _closing:
+    """Context manager that commits or rolls back, then closes the connection."""
+
+    def __init__(self, db: sqlite3.Connection):
+        self.db = db
+
+    def __enter__(self) -> sqlite3.Connection:
+        return self.db
+
+    def __exit__(self, exc_type, *_) -> None:
+        try:
+            if self.db.in_transaction:
+                self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.db.close()
+
+
+def _row_to_job(row: sqlite3.Row) -> Job:
+    return Job(
+        id=row["id"],
+        kind=row["kind"],
+        params=json.loads(row["params"]),
+        status=row["status"],
+        progress=row["progress"],
+        message=row["message"],
+        result=json.loads(row["result"]) if row["result"] else None,
+        error=row["error"],
+        created_at=row["created_at"],
+        started_at=row["started_at"],
+        finished_at=row["finished_at"],
+    )
+
+
+# A handler takes the job and a report(message, progress) callback and returns
+# the job's result; coroutine functions are run on a fresh event loop.
+JobHandler = Callable[[Job, Callable[[str, float | None], None]], dict]
+
+
+class JobQueue:
+    """Worker threads that run queued jobs through their kind's handler.
+
+    Heavy lifting inside a job happens in ffmpeg subprocesses and export
+    process pools, so threads are enough to keep several jobs in flight.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        handlers: dict[str, JobHandler],
+        workers: int | None = None,
+        max_pending: int | None = None,
+    ):
+        self.store = store
+        self.handlers = handlers
+        self.workers = workers or plan_job_workers()
+        self.max_pending = (
+            max_pending
+            if max_pending is not None
+            else self.workers * QUEUED_JOBS_PER_WORKER
+        )
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def start(self) -> "JobQueue":
+        self.store.requeue_interrupted()
+        for n in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f"job-worker-{n}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        return self
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+
+    def has_capacity(self) -> bool:
+        return self.store.counts().get(QUEUED, 0) < self.max_pending
+
+    def submit(self, kind: str, params: dict, job_id: str | None = None) -> str:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = self.store.submit(kind, params, job_id, self.max_pending)
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str) -> Job | None:
+        return self.store.get(job_id)
+
+    def position(self, job_id: str) -> int:
+        return self.store.queued_ahead(job_id)
+
+    def run_next(self) -> Job | None:
+        """Claim and run one job in the calling thread, returning it."""
+        job = self.store.claim_next()
+        if job is None:
+            return None
+
+        def report(message: str, progress: float | None = None) -> None:
+            self.store.report(job.id, message, progress)
+
+        try:
+            result = self.handlers[job.kind](job, report)
+            if inspect.isawaitable(result):
+                result = asyncio.run(result)
+            self.store.finish(job.id, result or {})
+        except Exception as e:
+            print(f"Error running job {job.id}: {e}")
+            trace_lines = traceback.format_exception(type(e), e, e.__traceback__)
+            self.store.fail(job.id, f"{e}\n\n{''.join(trace_lines[-6:])}")
+
+        return self.store.get(job.id)
+
+    def _beat(self) -> None:
+        """Keep this process's jobs alive and take over those of dead ones."""
+        while not self._stopping.wait(HEARTBEAT_SECONDS):
+            try:
+                self.store.heartbeat()
+                if self.store.requeue_interrupted():
+                    self._wakeup.set()
+            except sqlite3.Error as e:
+                print(f"Error updating job heartbeats: {e}")
+
+    def _work(self) -> None:
+        while not self._stopping.is_set():
+            if self.run_next() is None:
+                # Submissions from other processes only show up by polling
+                self._wakeup.wait(POLL_SECONDS)
+                self._wakeup.clear()
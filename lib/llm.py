@@ -1,53 +1,381 @@
+import asyncio
 import json
-from openai import OpenAI
-from agents import Agent, Runner
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from agents import Agent, Runner, set_default_openai_client
+from openai.types.responses import ResponseTextDeltaEvent
 from pydantic import BaseModel
 
-client = OpenAI()
+from lib.openai_client import get_async_client, with_retries
+from lib.transcript_index import (
+    MIN_SNIPPET_MATCH,
+    SENTENCE_GAP_SECONDS,
+    TranscriptIndex,
+    load_transcript_index,
+)
+
+LLM_MODEL = "gpt-5.1"
+
+# Transcript tokens per map window; the prompt itself comes on top.
+WINDOW_TOKEN_BUDGET = 6000
+# Blocks repeated at the start of the next window so edits spanning a window
+# edge are still seen whole by one of the two calls.
+WINDOW_OVERLAP_BLOCKS = 2
+MAX_BLOCK_SECONDS = 30.0
+MAX_EDITS = 20
+
+# Candidate clip lengths the prompt asks for, used to rank candidates
+TARGET_CLIP_SECONDS = (30, 120)
 
 
 class VideoEdit(BaseModel):
-    start: int
-    end: int
+    start: float
+    end: float
     targeted_script_snippet: str
 
 
-async def process_transcription_with_llm(
-    transcript_path: str, prompt: str, processed_result_path: str
+class AlignedEdit(VideoEdit):
+    """An edit moved onto word/sentence boundaries of the transcript.
+
+    snippet_match is the share of targeted_script_snippet found in the range.
+    """
+
+    snippet_match: float = 1.0
+
+
+@dataclass
+class TranscriptBlock:
+    start: float
+    end: float
+    text: str
+
+    def render(self) -> str:
+        return f"[{self.start:.1f}-{self.end:.1f}] {self.text}"
+
+
+@dataclass
+class LLMRunMetrics:
+    windows: int = 0
+    blocks: int = 0
+    estimated_tokens_sent: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    candidates: int = 0
+    edits: int = 0
+    wall_seconds: float = 0.0
+    window_seconds: list[float] = field(default_factory=list)
+    unmatched_snippets: int = 0
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English)."""
+    return math.ceil(len(text) / 4)
+
+
+def condense_transcript(
+    words: list[dict],
+    max_block_seconds: float = MAX_BLOCK_SECONDS,
+    sentence_gap: float = SENTENCE_GAP_SECONDS,
+) -> list[TranscriptBlock]:
+    """Collapse word-level timestamps into timestamped sentence blocks.
+
+    A block ends at sentence punctuation, at a pause longer than sentence_gap,
+    or once it spans max_block_seconds.
+    """
+    blocks: list[TranscriptBlock] = []
+    current: list[dict] = []
+
+    def flush() -> None:
+        if current:
+            text = " ".join(w["word"].strip() for w in current)
+            start, end = current[0]["start"], current[-1]["end"]
+            blocks.append(TranscriptBlock(start, end, text))
+            current.clear()
+
+    for word in words:
+        if current and (
+            word["start"] - current[-1]["end"] > sentence_gap
+            or word["end"] - current[0]["start"] > max_block_seconds
+        ):
+            flush()
+        current.append(word)
+        if word["word"].strip().endswith((".", "!", "?")):
+            flush()
+    flush()
+
+    return blocks
+
+
+def window_blocks(
+    blocks: list[TranscriptBlock],
+    token_budget: int = WINDOW_TOKEN_BUDGET,
+    overlap_blocks: int = WINDOW_OVERLAP_BLOCKS,
+) -> list[list[TranscriptBlock]]:
+    """Split blocks into windows of at most token_budget estimated tokens."""
+    windows: list[list[TranscriptBlock]] = []
+    current: list[TranscriptBlock] = []
+    tokens = 0
+
+    for block in blocks:
+        block_tokens = estimate_tokens(block.render()) + 1
+        if current and tokens + block_tokens > token_budget:
+            windows.append(current)
+            current = current[-overlap_blocks:] if overlap_blocks else []
+            tokens = sum(estimate_tokens(b.render()) + 1 for b in current)
+        current.append(block)
+        tokens += block_tokens
+
+    if current:
+        windows.append(current)
+    return windows
+
+
+def reduce_edits(
+    candidates: list[VideoEdit], max_edits: int = MAX_EDITS
+) -> list[VideoEdit]:
+    """Merge near-duplicate candidates, keep the best ranked, in time order.
+
+    Candidates overlapping by more than half of the shorter one are treated as
+    the same moment; the longest survives and gains one vote per duplicate.
+    Ranking prefers edits whose snippet was found in the transcript, then more
+    votes (proposed by several windows), then clips whose length sits inside
+    the requested range.
+    """
+    kept: list[tuple[VideoEdit, int]] = []
+    for edit in sorted(candidates, key=lambda e: e.end - e.start, reverse=True):
+        for n, (other, votes) in enumerate(kept):
+            if _same_moment(edit, other):
+                kept[n] = (other, votes + 1)
+                break
+        else:
+            kept.append((edit, 1))
+
+    low, high = TARGET_CLIP_SECONDS
+
+    def rank(item: tuple[VideoEdit, int]) -> tuple[bool, int, float]:
+        edit, votes = item
+        length = edit.end - edit.start
+        matched = getattr(edit, "snippet_match", 1.0) >= MIN_SNIPPET_MATCH
+        return matched, votes, -max(low - length, length - high, 0)
+
+    best = sorted(kept, key=rank, reverse=True)[:max_edits]
+    return sorted((edit for edit, _ in best), key=lambda e: e.start)
+
+
+def align_edit(index: TranscriptIndex, edit: VideoEdit) -> AlignedEdit:
+    """Snap an edit to the transcript's words and score its snippet."""
+    if not len(index):
+        return AlignedEdit(**edit.model_dump())
+    start, end, match = index.align(edit.start, edit.end, edit.targeted_script_snippet)
+    return AlignedEdit(
+        start=start,
+        end=end,
+        targeted_script_snippet=edit.targeted_script_snippet,
+        snippet_match=round(match, 3),
+    )
+
+
+def accept_streamed_edit(
+    accepted: list[VideoEdit], edit: VideoEdit, max_edits: int = MAX_EDITS
+) -> bool:
+    """Online counterpart of reduce_edits for edits that are cut as they arrive.
+
+    An edit is taken unless it duplicates one already taken or the limit is
+    reached; without the full candidate list there is no ranking.
+    """
+    if len(accepted) >= max_edits or edit.end <= edit.start:
+        return False
+    if any(_same_moment(edit, other) for other in accepted):
+        return False
+    accepted.append(edit)
+    return True
+
+
+def _same_moment(a: VideoEdit, b: VideoEdit) -> bool:
+    overlap = min(a.end, b.end) - max(a.start, b.start)
+    shorter = min(a.end - a.start, b.end - b.start)
+    return shorter > 0 and overlap > shorter / 2
+
+
+class IncrementalEditParser:
+    """Pull complete VideoEdit objects out of streamed JSON text.
+
+    The structured output arrives as ``{"response": [{...}, {...}]}``; every
+    object whose parent is an array is parsed as soon as its closing brace
+    has been received.
+    """
+
+    def __init__(self):
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._object_start: int | None = None
+        self._buffer = ""
+
+    def feed(self, text: str) -> list[VideoEdit]:
+        edits = []
+        offset = len(self._buffer)
+        self._buffer += text
+
+        for n, char in enumerate(text, start=offset):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if char == "{" and self._stack[-1:] == ["["]:
+                    self._object_start = n
+                self._stack.append(char)
+            elif char in "}]":
+                self._stack.pop()
+                if char == "}" and self._object_start is not None:
+                    raw = self._buffer[self._object_start : n + 1]
+                    self._object_start = None
+                    edits.append(VideoEdit.model_validate_json(raw))
+
+        # Only the text of an unfinished edit is needed again
+        if self._object_start is None:
+            self._buffer = ""
+        else:
+            self._buffer = self._buffer[self._object_start :]
+            self._object_start = 0
+        return edits
+
+
+async def stream_window_edits(
+    agent: Agent,
+    prompt: str,
+    window: list[TranscriptBlock],
+    metrics: LLMRunMetrics,
+    on_edit: Callable[[VideoEdit], Awaitable[None]],
 ) -> None:
+    """Like _evaluate_window, but hands each edit to on_edit as it streams in."""
+    window_input = _window_input(prompt, window)
+    metrics.estimated_tokens_sent += estimate_tokens(window_input)
+
+    async def stream():
+        parser = IncrementalEditParser()
+        result = Runner.run_streamed(agent, window_input)
+        async for event in result.stream_events():
+            if event.type == "raw_response_event" and isinstance(
+                event.data, ResponseTextDeltaEvent
+            ):
+                for edit in parser.feed(event.data.delta):
+                    await on_edit(edit)
+        return result
+
+    started = time.perf_counter()
+    # A retried stream may repeat edits; on_edit is expected to drop duplicates
+    result = await with_retries(stream)
+    metrics.window_seconds.append(time.perf_counter() - started)
+    _record_usage(result, metrics)
+
+
+def _window_input(prompt: str, window: list[TranscriptBlock]) -> str:
+    transcript = "\n".join(block.render() for block in window)
+    return (
+        f"{prompt}\n\n# Transcription\n"
+        "Each line is [start-end seconds] followed by what is said.\n\n"
+        f"{transcript}"
+    )
+
+
+def _record_usage(result, metrics: LLMRunMetrics) -> None:
+    usage = getattr(getattr(result, "context_wrapper", None), "usage", None)
+    if usage is not None:
+        metrics.input_tokens += usage.input_tokens
+        metrics.output_tokens += usage.output_tokens
+
+
+def make_edit_agent(model: str = LLM_MODEL) -> Agent:
+    return Agent(
+        name="Video Editing Agent",
+        model=model,
+        output_type=list[VideoEdit],
+    )
+
+
+async def _evaluate_window(
+    agent: Agent, prompt: str, window: list[TranscriptBlock], metrics: LLMRunMetrics
+) -> list[VideoEdit]:
+    window_input = _window_input(prompt, window)
+    metrics.estimated_tokens_sent += estimate_tokens(window_input)
+
+    started = time.perf_counter()
+    result = await with_retries(lambda: Runner.run(agent, window_input))
+    metrics.window_seconds.append(time.perf_counter() - started)
+    _record_usage(result, metrics)
+
+    return list(result.final_output or [])
+
+
+async def process_transcription_with_llm(
+    transcript_path: str,
+    prompt: str,
+    processed_result_path: str,
+    model: str = LLM_MODEL,
+    token_budget: int = WINDOW_TOKEN_BUDGET,
+) -> LLMRunMetrics | None:
+    """Pick edits window by window over the transcript, then merge the picks.
+
+    Each token-budgeted window of the condensed transcript is evaluated
+    concurrently; the candidates are snapped to word and sentence boundaries
+    and reduced locally without another model call.
+    """
     try:
+        started = time.perf_counter()
+
         with open(transcript_path, "r", encoding="utf-8") as f:
             transcript = f.read()
 
-        transcript = json.loads(transcript)["words"] if transcript else {}
+        transcript = json.loads(transcript)["words"] if transcript else []
+
+        metrics = LLMRunMetrics()
+        blocks = condense_transcript(transcript or [])
+        windows = window_blocks(blocks, token_budget)
+        metrics.blocks = len(blocks)
+        metrics.windows = len(windows)
+
+        if not windows:
+            return None
 
-        agent = Agent(
-            name="Video Editing Agent",
-            model="gpt-5.1",
-            output_type=list[VideoEdit],
+        agent = make_edit_agent(model)
+
+        set_default_openai_client(get_async_client(), use_for_tracing=False)
+        window_results = await asyncio.gather(
+            *(_evaluate_window(agent, prompt, window, metrics) for window in windows)
         )
 
-        result = await Runner.run(agent, prompt)
+        index = load_transcript_index(transcript_path)
+        candidates = [
+            align_edit(index, edit) for edits in window_results for edit in edits
+        ]
+        output_data = reduce_edits(candidates)
+        metrics.candidates = len(candidates)
+        metrics.unmatched_snippets = sum(
+            edit.snippet_match < MIN_SNIPPET_MATCH for edit in output_data
+        )
+        metrics.edits = len(output_data)
+        metrics.wall_seconds = time.perf_counter() - started
 
-        # Handle different result structures
-        if hasattr(result, "content") and result.content:
-            output_data = result.content
-        elif hasattr(result, "final_output") and result.final_output:
-            output_data = result.final_output
-        else:
-            return
+        if not output_data:
+            return metrics
 
         # Save the result as JSON
         with open(processed_result_path, "w", encoding="utf-8") as f:
             # Convert VideoEdit objects to dict for JSON serialization
-            if isinstance(output_data, list):
-                json_data = [
-                    edit.dict() if hasattr(edit, "dict") else edit
-                    for edit in output_data
-                ]
-            else:
-                json_data = output_data
+            json_data = [edit.model_dump() for edit in output_data]
             json.dump(json_data, f, ensure_ascii=False, indent=4)
 
+        return metrics
+
     except Exception as e:
         print(f"Error processing transcript: {e}")
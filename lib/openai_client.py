@@ -0,0 +1,193 @@
+import asyncio
+import random
+import statistics
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, TypeVar
+
+import httpx
+import openai
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+MAX_CONNECTIONS = 20
+MAX_KEEPALIVE_CONNECTIONS = 10
+KEEPALIVE_EXPIRY = 30.0
+MAX_CONCURRENT_REQUESTS = 8
+MAX_RETRIES = 5
+BASE_RETRY_DELAY = 0.5
+MAX_RETRY_DELAY = 20.0
+# Most recent request latencies kept for the percentiles in summary()
+MAX_LATENCY_SAMPLES = 1000
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,
+)
+
+T = TypeVar("T")
+
+
+@dataclass
+class RequestMetrics:
+    """Latency of the HTTP requests made through the shared clients.
+
+    Counts and total seconds cover every request; the percentiles cover the
+    last MAX_LATENCY_SAMPLES, so a long-running server keeps bounded memory.
+    """
+
+    requests: int = 0
+    seconds: float = 0.0
+    retries: int = 0
+    statuses: dict[int, int] = field(default_factory=dict)
+    latencies: deque[float] = field(
+        default_factory=lambda: deque(maxlen=MAX_LATENCY_SAMPLES)
+    )
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, path: str, status: int, seconds: float) -> None:
+        with self._lock:
+            self.requests += 1
+            self.seconds += seconds
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            self.latencies.append(seconds)
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def totals(self) -> tuple[int, float, int]:
+        """(requests, seconds, retries) so far; subtract two to measure a span."""
+        with self._lock:
+            return self.requests, self.seconds, self.retries
+
+    def summary(self) -> dict:
+        with self._lock:
+            latencies = sorted(self.latencies)
+            statuses = dict(self.statuses)
+            requests, retries = self.requests, self.retries
+
+        if not latencies:
+            return {"requests": requests, "retries": retries, "statuses": statuses}
+        p95_index = min(len(latencies) - 1, int(len(latencies) * 0.95))
+        return {
+            "requests": requests,
+            "retries": retries,
+            "statuses": statuses,
+            "p50_seconds": statistics.median(latencies),
+            "p95_seconds": latencies[p95_index],
+            "max_seconds": latencies[-1],
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.seconds = 0.0
+            self.retries = 0
+            self.statuses.clear()
+            self.latencies.clear()
+
+
+metrics = RequestMetrics()
+
+# httpx connection pools belong to the event loop that opened them, and the
+# Streamlit tabs start a fresh loop per run, so clients are kept per loop.
+_clients: dict[asyncio.AbstractEventLoop, AsyncOpenAI] = {}
+_semaphores: dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+
+
+def get_async_client() -> AsyncOpenAI:
+    """Return the shared async client for the running event loop."""
+    loop = _running_loop()
+    if loop not in _clients:
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            event_hooks={"request": [_mark_start], "response": [_record_latency]},
+        )
+        # Retries are handled by with_retries so they share the jittered policy.
+        _clients[loop] = AsyncOpenAI(http_client=http_client, max_retries=0)
+    return _clients[loop]
+
+
+def reset_clients() -> None:
+    """Forget cached clients, e.g. after changing OPENAI_BASE_URL."""
+    _clients.clear()
+    _semaphores.clear()
+
+
+async def with_retries(
+    call: Callable[[], Awaitable[T]],
+    max_retries: int | None = None,
+    base_delay: float | None = None,
+    max_delay: float | None = None,
+) -> T:
+    """Run an API call under the concurrency limit, retrying 429/5xx errors.
+
+    Delays use full-jitter exponential backoff, stretched to the server's
+    Retry-After when it asks for longer.
+    """
+    max_retries = MAX_RETRIES if max_retries is None else max_retries
+    base_delay = BASE_RETRY_DELAY if base_delay is None else base_delay
+    max_delay = MAX_RETRY_DELAY if max_delay is None else max_delay
+
+    loop = _running_loop()
+    semaphore = _semaphores.setdefault(
+        loop, asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    )
+    attempt = 0
+    while True:
+        try:
+            async with semaphore:
+                return await call()
+        except RETRYABLE_ERRORS as err:
+            if attempt >= max_retries:
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2**attempt))
+            delay = max(delay, _retry_after(err))
+            attempt += 1
+            metrics.record_retry()
+            await asyncio.sleep(delay)
+
+
+def _running_loop() -> asyncio.AbstractEventLoop:
+    loop = asyncio.get_running_loop()
+    for stale in [other for other in _clients if other.is_closed()]:
+        del _clients[stale]
+    for stale in [other for other in _semaphores if other.is_closed()]:
+        del _semaphores[stale]
+    return loop
+
+
+def _retry_after(err: Exception) -> float:
+    response = getattr(err, "response", None)
+    if response is None:
+        return 0.0
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return 0.0
+
+
+async def _mark_start(request: httpx.Request) -> None:
+    request.extensions["started_at"] = time.perf_counter()
+
+
+async def _record_latency(response: httpx.Response) -> None:
+    started_at = response.request.extensions.get("started_at")
+    if started_at is not None:
+        metrics.record(
+            response.request.url.path,
+            response.status_code,
+            time.perf_counter() - started_at,
+        )
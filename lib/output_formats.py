@@ -0,0 +1,105 @@
+from dataclasses import dataclass
+from pathlib import Path
+
+FIT_MODES = ("crop", "pad")
+
+
+@dataclass(frozen=True)
+class OutputFormat:
+    """Frame shape of one rendered variant of a segment."""
+
+    name: str
+    # (width, height) ratio of the frame, or None to keep the source's
+    aspect: tuple[int, int] | None = None
+    # "crop" fills the frame and trims the overflow around the centre;
+    # "pad" fits the whole picture and fills the rest with black bars
+    fit: str = "crop"
+
+    @property
+    def suffix(self) -> str:
+        """File name suffix of this variant; empty for the source shape."""
+        if self.aspect is None:
+            return ""
+        return f"_{self.aspect[0]}x{self.aspect[1]}"
+
+    def path(self, path: str | Path) -> Path:
+        path = Path(path)
+        return path.with_name(f"{path.stem}{self.suffix}{path.suffix}")
+
+    def frame_size(
+        self, size: tuple[int, int], max_height: int | None = None
+    ) -> tuple[int, int]:
+        """(width, height) of the output frame for a source of this size.
+
+        The frame is the largest box of this aspect that fits in the source,
+        scaled down to max_height when it is taller.
+        """
+        width, height = size
+        if self.aspect is None:
+            aspect_width, aspect_height = width, height
+        else:
+            aspect_width, aspect_height = self.aspect
+        frame_height = min(height, width * aspect_height / aspect_width)
+        if max_height is not None:
+            frame_height = min(frame_height, max_height)
+        # libx264 with yuv420p needs even dimensions
+        frame_height = max(2, int(frame_height) // 2 * 2)
+        frame_width = max(2, round(frame_height * aspect_width / aspect_height / 2) * 2)
+        return frame_width, frame_height
+
+    def filters(
+        self, size: tuple[int, int], max_height: int | None = None
+    ) -> str | None:
+        """ffmpeg video filters that turn source frames into this format, or
+        None when they can be encoded unchanged."""
+        frame_width, frame_height = self.frame_size(size, max_height)
+        if self.aspect is None:
+            if (frame_width, frame_height) == tuple(size):
+                return None
+            return f"scale={frame_width}:{frame_height}"
+
+        aspect_width, aspect_height = self.aspect
+        if self.fit == "crop":
+            return (
+                f"crop='min(iw,ih*{aspect_width}/{aspect_height})'"
+                f":'min(ih,iw*{aspect_height}/{aspect_width})',"
+                f"scale={frame_width}:{frame_height},setsar=1"
+            )
+        return (
+            f"scale={frame_width}:{frame_height}:force_original_aspect_ratio=decrease"
+            f":force_divisible_by=2,pad={frame_width}:{frame_height}"
+            ":(ow-iw)/2:(oh-ih)/2,setsar=1"
+        )
+
+
+OUTPUT_FORMATS = {
+    "original": OutputFormat("original"),
+    "vertical": OutputFormat("vertical", aspect=(9, 16)),
+    "square": OutputFormat("square", aspect=(1, 1)),
+}
+DEFAULT_FORMATS = ("original",)
+
+
+def get_format(output_format: str | OutputFormat) -> OutputFormat:
+    if isinstance(output_format, OutputFormat):
+        return output_format
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    return OUTPUT_FORMATS[output_format]
+
+
+def get_formats(
+    output_formats: list[str | OutputFormat] | None = None,
+) -> list[OutputFormat]:
+    """Resolve format names, defaulting to DEFAULT_FORMATS, without duplicates."""
+    resolved: list[OutputFormat] = []
+    for output_format in output_formats or DEFAULT_FORMATS:
+        output_format = get_format(output_format)
+        if output_format not in resolved:
+            resolved.append(output_format)
+    return resolved
+
+
+def reframes(output_formats: list[OutputFormat]) -> bool:
+    """True when any format changes the frame shape of the source."""
+    return any(output_format.aspect is not None for output_format in output_formats)
@@ -0,0 +1,664 @@
+import asyncio
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Callable
+
+from agents import set_default_openai_client
+
+from lib.audio_analysis import analyze_audio
+from lib.cache import ArtifactCache, hash_file, hash_text, llm_result_key
+from lib.convert import convert_video_to_audio, extract_audio_chunks
+from lib.cut_video import CutProgress, IncrementalCutter, cut_video_segments
+from lib.download import zip_and_download_files
+from lib.instrumentation import RunRecorder, registry
+from lib.llm import (
+    LLM_MODEL,
+    LLMRunMetrics,
+    TranscriptBlock,
+    VideoEdit,
+    accept_streamed_edit,
+    align_edit,
+    condense_transcript,
+    make_edit_agent,
+    process_transcription_with_llm,
+    stream_window_edits,
+    window_blocks,
+)
+from lib.openai_client import get_async_client
+from lib.output_formats import get_formats
+from lib.probe import probe_media
+from lib.proxy import build_proxy
+from lib.reel import REEL_FILENAME, reencode_reason
+from lib.render_backend import get_backend
+from lib.render_plan import MERGE_GAP_SECONDS, RenderPlan, plan_render
+from lib.render_profiles import DEFAULT_PROFILE, get_profile
+from lib.transcribe import (
+    STREAM_CHUNK_SECONDS,
+    transcribe_audio_chunked,
+    transcribe_audio_stream,
+)
+from lib.transcript_index import MIN_SNIPPET_MATCH, TranscriptIndex
+from lib.workspace import WorkspaceManager, job_paths
+
+# report(message, progress) with progress in [0, 1], or None to leave it as is
+Report = Callable[[str, float | None], None]
+
+
+def _no_report(message: str, progress: float | None = None) -> None:
+    pass
+
+
+async def run_process_pipeline(
+    video_path: str,
+    user_prompt: str,
+    upload_hash: str,
+    work_dir: str,
+    cache: ArtifactCache,
+    cut_mode: str = "smart",
+    export_workers: int = 1,
+    report: Report = _no_report,
+    pipelined: bool = False,
+    snap: bool = True,
+    profile: str = DEFAULT_PROFILE,
+    formats: list[str] | None = None,
+    merge: bool = True,
+    merge_gap: float = MERGE_GAP_SECONDS,
+) -> dict:
+    """Transcribe, pick edits and cut one video; return the run's outputs.
+
+    All intermediate files and the exports go to work_dir, so runs can
+    overlap safely.
+    Segments are rendered with the named profile, in each of the named output
+    formats; after a preview render, render_approved re-renders the chosen
+    segments. Every stage is measured into a run report in work_dir.
+    Edits are merged into segments as plan_render does with merge and
+    merge_gap, and the plan is written to PLAN_FILENAME in work_dir before
+    cutting starts. Pipelined runs cut each edit as it arrives, so they never
+    merge and rewrite the plan as segments are added.
+    """
+    if pipelined:
+        return await run_pipelined_process(
+            video_path,
+            user_prompt,
+            upload_hash,
+            work_dir,
+            cache,
+            cut_mode,
+            export_workers,
+            report,
+            snap,
+            profile,
+            formats,
+        )
+
+    started = time.perf_counter()
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    notes: list[str] = []
+    recorder = RunRecorder("process")
+
+    audio_file_path = work_dir / "audio.mp3"
+    transcription_file_path = cache.get("transcript", upload_hash)
+
+    if transcription_file_path is not None:
+        notes.append("♻️ Reused cached transcription for this file")
+    else:
+        cached_audio = cache.get("audio", upload_hash)
+
+        if cached_audio is not None:
+            notes.append("♻️ Reused cached audio for this file")
+            shutil.copyfile(cached_audio, audio_file_path)
+        else:
+            report("Converting video to audio...", 0.2)
+            with recorder.stage("audio_extraction"):
+                audio_bytes = convert_video_to_audio(video_path, audio_file_path)
+            notes.append(f"Extracted {audio_bytes / 1024:.2f} KB of speech audio")
+            cache.put("audio", upload_hash, audio_file_path)
+
+        report("Transcribing audio...", 0.3)
+        with recorder.stage("transcription"):
+            transcription_file_path = await transcribe_audio_chunked(audio_file_path)
+        cache.put("transcript", upload_hash, transcription_file_path)
+
+    report("Processing transcription with LLM...", 0.4)
+
+    processed_result_path = work_dir / "processed_result.json"
+    processed_result_path.unlink(missing_ok=True)
+
+    result_key = llm_result_key(
+        hash_file(transcription_file_path), hash_text(user_prompt), LLM_MODEL
+    )
+    cached_result = cache.get("llm", result_key)
+
+    if cached_result is not None:
+        notes.append("♻️ Reused cached LLM result for this transcript and prompt")
+        shutil.copyfile(cached_result, processed_result_path)
+    else:
+        with recorder.stage("llm") as stage:
+            llm_metrics = await process_transcription_with_llm(
+                transcription_file_path, user_prompt, str(processed_result_path)
+            )
+            if llm_metrics is not None:
+                stage.input_tokens = llm_metrics.input_tokens
+                stage.output_tokens = llm_metrics.output_tokens
+        if llm_metrics is not None:
+            notes.append(
+                f"LLM: {llm_metrics.windows} windows, "
+                f"~{llm_metrics.estimated_tokens_sent} tokens sent, "
+                f"{llm_metrics.candidates} candidates → {llm_metrics.edits} edits "
+                f"in {llm_metrics.wall_seconds:.1f}s"
+            )
+            if llm_metrics.unmatched_snippets:
+                notes.append(
+                    f"⚠️ {llm_metrics.unmatched_snippets} edits did not match "
+                    "their snippet in the transcript"
+                )
+        if processed_result_path.exists():
+            cache.put("llm", result_key, processed_result_path)
+
+    if not processed_result_path.exists():
+        raise ValueError("The LLM did not return any edits for this video.")
+
+    cache_stats = cache.stats()
+    notes.append(
+        f"Cache hits: {sum(cache_stats['hits'].values())}, "
+        f"misses: {sum(cache_stats['misses'].values())}, "
+        f"size: {cache_stats['bytes'] / (1024*1024):.1f} MB"
+    )
+
+    # From this run's stages, not the process-wide totals of every job
+    api_requests = sum(stage.api_requests for stage in recorder.stages)
+    if api_requests:
+        api_seconds = sum(stage.api_seconds for stage in recorder.stages)
+        notes.append(
+            f"API requests: {api_requests}, "
+            f"retries: {sum(stage.api_retries for stage in recorder.stages)}, "
+            f"mean latency: {api_seconds / api_requests:.2f}s"
+        )
+
+    with open(processed_result_path, "r", encoding="utf-8") as f:
+        edits = json.load(f)
+    with recorder.stage("planning"):
+        media = probe_media(video_path, upload_hash)
+        plan = plan_render(
+            edits,
+            media.duration,
+            analyze_audio(str(video_path)) if snap else None,
+            merge,
+            merge_gap,
+        )
+        plan.write(work_dir)
+    notes.append(plan.summary())
+    report(f"Cutting video segments... {plan.summary()}", 0.6)
+
+    run_dir = work_dir / "exports" / f"run_{upload_hash[:12]}_{int(time.time())}"
+    with recorder.stage("cutting") as stage:
+        exported_files = await cut_video_segments(
+            str(video_path),
+            edits,
+            mode=cut_mode,
+            workers=export_workers,
+            exports_dir=run_dir,
+            temp_dir=work_dir,
+            plan=plan,
+            profile=profile,
+            formats=formats,
+            progress=_frame_progress(report, media.fps, 0.6, 0.9),
+        )
+    render_fps = _render_fps(plan, media.fps, stage.wall_seconds)
+    notes.append(f"Rendered with the {profile} profile at {render_fps:.0f} fps")
+    output_formats = get_formats(formats)
+    for n, output_format in enumerate(output_formats):
+        reel_path = output_format.path(run_dir / REEL_FILENAME)
+        if reel_path.exists():
+            # Segments come back format by format, as cut_video_segments joined them
+            reason = reencode_reason(exported_files[n :: len(output_formats)])
+            notes.append(
+                f"🎬 Highlight reel: {reel_path.name}"
+                + (f" (re-encoded, {reason})" if reason else "")
+            )
+
+    report("Preparing files for download...", 0.9)
+
+    with recorder.stage("bundling"):
+        zip_file_path = await zip_and_download_files(str(run_dir), str(work_dir))
+
+    total_seconds = time.perf_counter() - started
+    notes.append(f"End to end: {total_seconds:.1f}s")
+
+    return {
+        "run_dir": str(run_dir),
+        "exported_files": exported_files,
+        "zip_file_path": zip_file_path,
+        "notes": notes,
+        "profile": profile,
+        "render_plan": plan.to_dict(),
+        "render_fps": render_fps,
+        "total_seconds": total_seconds,
+        "run_report": str(recorder.write(work_dir)),
+        "stages": recorder.report()["stages"],
+    }
+
+
+async def run_pipelined_process(
+    video_path: str,
+    user_prompt: str,
+    upload_hash: str,
+    work_dir: str,
+    cache: ArtifactCache,
+    cut_mode: str = "smart",
+    export_workers: int = 1,
+    report: Report = _no_report,
+    snap: bool = True,
+    profile: str = DEFAULT_PROFILE,
+    formats: list[str] | None = None,
+) -> dict:
+    """run_process_pipeline with the stages overlapped instead of in sequence.
+
+    Audio is extracted in chunks and each chunk is transcribed as soon as it
+    is written; transcript windows go to the LLM as soon as they fill up; and
+    every edit streamed back is cut right away. Edits are deduplicated as they
+    arrive rather than ranked at the end (see accept_streamed_edit).
+    Since those stages overlap, the run report measures them as one
+    "streaming" stage.
+    """
+    started = time.perf_counter()
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    notes: list[str] = []
+    recorder = RunRecorder("process")
+
+    run_dir = work_dir / "exports" / f"run_{upload_hash[:12]}_{int(time.time())}"
+    cutter = IncrementalCutter(
+        video_path,
+        cut_mode,
+        export_workers,
+        run_dir,
+        work_dir,
+        started_at=started,
+        snap=snap,
+        profile=profile,
+        formats=formats,
+    )
+
+    agent = make_edit_agent()
+    set_default_openai_client(get_async_client(), use_for_tracing=False)
+    llm_metrics = LLMRunMetrics()
+    accepted: list[VideoEdit] = []
+    # Words transcribed so far; every streamed edit falls inside them
+    index = TranscriptIndex()
+    window_tasks: list[asyncio.Task] = []
+    # Blocks of the window still filling up, carried over between chunks
+    open_window: list[TranscriptBlock] = []
+
+    async def on_edit(edit: VideoEdit) -> None:
+        edit = align_edit(index, edit)
+        if edit.snippet_match < MIN_SNIPPET_MATCH:
+            llm_metrics.unmatched_snippets += 1
+        if accept_streamed_edit(accepted, edit):
+            cutter.submit(edit.model_dump())
+            cutter.plan().write(work_dir)
+            report(f"Cutting clip {len(accepted)} while the LLM continues...", 0.6)
+
+    def evaluate(blocks: list[TranscriptBlock], final: bool) -> None:
+        nonlocal open_window
+        windows = window_blocks(open_window + blocks)
+        open_window = [] if final or not windows else windows.pop()
+        llm_metrics.blocks += len(blocks)
+        for window in windows:
+            llm_metrics.windows += 1
+            window_tasks.append(
+                asyncio.create_task(
+                    stream_window_edits(
+                        agent, user_prompt, window, llm_metrics, on_edit
+                    )
+                )
+            )
+
+    transcription_file_path = cache.get("transcript", upload_hash)
+
+    with recorder.stage("streaming") as stage:
+        if transcription_file_path is not None:
+            notes.append("♻️ Reused cached transcription for this file")
+            with open(transcription_file_path, "r", encoding="utf-8") as f:
+                words = json.load(f)["words"] or []
+            index.extend(words)
+            evaluate(condense_transcript(words), final=True)
+        else:
+
+            async def on_transcribed(transcription: dict) -> None:
+                report("Transcribing audio and picking edits...", 0.3)
+                index.extend(transcription["words"])
+                evaluate(condense_transcript(transcription["words"]), final=False)
+
+            report("Extracting audio...", 0.2)
+            transcription = await transcribe_audio_stream(
+                extract_audio_chunks(
+                    video_path, str(work_dir / "chunks"), STREAM_CHUNK_SECONDS
+                ),
+                on_transcribed,
+            )
+            evaluate([], final=True)
+
+            transcription_file_path = work_dir / "audio.json"
+            with open(transcription_file_path, "w", encoding="utf-8") as f:
+                json.dump(transcription, f, ensure_ascii=False, indent=2)
+            cache.put("transcript", upload_hash, transcription_file_path)
+
+        await asyncio.gather(*window_tasks)
+        exported_files = await cutter.wait()
+        stage.input_tokens = llm_metrics.input_tokens
+        stage.output_tokens = llm_metrics.output_tokens
+
+    # Edits that fall past the end of the video are accepted but not cut
+    if not accepted or not cutter.segments:
+        raise ValueError("The LLM did not return any edits for this video.")
+
+    processed_result_path = work_dir / "processed_result.json"
+    with open(processed_result_path, "w", encoding="utf-8") as f:
+        accepted.sort(key=lambda e: e.start)
+        json.dump([e.model_dump() for e in accepted], f, ensure_ascii=False, indent=4)
+    result_key = llm_result_key(
+        hash_file(transcription_file_path), hash_text(user_prompt), LLM_MODEL
+    )
+    cache.put("llm", result_key, processed_result_path)
+
+    report("Preparing files for download...", 0.9)
+
+    with recorder.stage("bundling"):
+        zip_file_path = await zip_and_download_files(str(run_dir), str(work_dir))
+
+    total_seconds = time.perf_counter() - started
+    notes.append(
+        f"LLM: {llm_metrics.windows} windows streamed, "
+        f"~{llm_metrics.estimated_tokens_sent} tokens sent, {len(accepted)} edits"
+    )
+    if llm_metrics.unmatched_snippets:
+        notes.append(
+            f"⚠️ {llm_metrics.unmatched_snippets} edits did not match their "
+            "snippet in the transcript"
+        )
+    plan = cutter.plan()
+    render_fps = _render_fps(plan, cutter.fps, cutter.render_wall_seconds)
+    notes.append(f"Rendered with the {profile} profile at {render_fps:.0f} fps")
+    notes.append(
+        f"Time to first clip: {cutter.first_clip_seconds:.1f}s, "
+        f"end to end: {total_seconds:.1f}s"
+    )
+    return {
+        "run_dir": str(run_dir),
+        "exported_files": exported_files,
+        "zip_file_path": zip_file_path,
+        "notes": notes,
+        "profile": profile,
+        "render_plan": plan.to_dict(),
+        "render_fps": render_fps,
+        "time_to_first_clip_seconds": cutter.first_clip_seconds,
+        "total_seconds": total_seconds,
+        "run_report": str(recorder.write(work_dir)),
+        "stages": recorder.report()["stages"],
+    }
+
+
+async def render_approved(
+    video_path: str,
+    render_plan: dict,
+    approved: list[int],
+    run_dir: str,
+    work_dir: str,
+    cut_mode: str = "smart",
+    export_workers: int = 1,
+    profile: str = "final",
+    report: Report = _no_report,
+    formats: list[str] | None = None,
+) -> dict:
+    """Re-render the approved segments of an earlier run with another profile.
+
+    Segments keep the numbers and bounds they had in the earlier run, so the
+    files line up with the ones that were reviewed.
+    """
+    plan = RenderPlan.from_dict(render_plan, keep=approved)
+    if not plan.segments:
+        raise ValueError("No segments were approved.")
+
+    output_dir = Path(run_dir) / profile
+    recorder = RunRecorder("render")
+    report(f"Rendering {len(plan.segments)} approved segments...", 0.2)
+
+    fps = probe_media(video_path).fps
+    with recorder.stage("cutting") as stage:
+        exported_files = await cut_video_segments(
+            str(video_path),
+            [],
+            mode=cut_mode,
+            workers=export_workers,
+            exports_dir=output_dir,
+            temp_dir=work_dir,
+            plan=plan,
+            profile=profile,
+            formats=formats,
+            progress=_frame_progress(report, fps, 0.2, 0.9),
+        )
+    render_fps = _render_fps(plan, fps, stage.wall_seconds)
+
+    report("Preparing files for download...", 0.9)
+    with recorder.stage("bundling"):
+        zip_file_path = await zip_and_download_files(str(output_dir), str(work_dir))
+
+    return {
+        "run_dir": str(output_dir),
+        "exported_files": exported_files,
+        "zip_file_path": zip_file_path,
+        "notes": [
+            f"Rendered {len(plan.segments)} segments with the {profile} profile "
+            f"at {render_fps:.0f} fps"
+        ],
+        "profile": profile,
+        "render_fps": render_fps,
+        "run_report": str(recorder.write(work_dir)),
+        "stages": recorder.report()["stages"],
+    }
+
+
+def _render_fps(plan: RenderPlan, fps: float | None, seconds: float) -> float:
+    """Source frames encoded per second of wall time."""
+    return plan.render_seconds * (fps or 0) / max(seconds, 1e-6)
+
+
+def _frame_progress(
+    report: Report, fps: float | None, start: float, end: float
+) -> CutProgress:
+    """Report frames encoded out of frames planned, as progress from start to end."""
+
+    def progress(done_seconds: float, total_seconds: float) -> None:
+        fraction = min(done_seconds / total_seconds, 1.0) if total_seconds else 1.0
+        if fps:
+            message = (
+                f"Encoding frame {int(done_seconds * fps)} "
+                f"of {int(total_seconds * fps)}..."
+            )
+        else:
+            message = f"Encoding {done_seconds:.0f}s of {total_seconds:.0f}s..."
+        report(message, start + (end - start) * fraction)
+
+    return progress
+
+
+def export_clip(
+    video_path: str,
+    start_seconds: float,
+    end_seconds: float,
+    work_dir: str = "temp",
+    report: Report = _no_report,
+    profile: str = DEFAULT_PROFILE,
+    backend: str | None = None,
+) -> dict:
+    """Cut a single clip between start and end times; return its path."""
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    video_stem = Path(video_path).stem
+    warnings: list[str] = []
+
+    report("Loading video and preparing cut...", 0.2)
+
+    media = probe_media(video_path)
+    duration = media.duration
+
+    if duration <= 0:
+        raise ValueError("The video has no duration.")
+
+    if start_seconds < 0 or end_seconds > duration:
+        raise ValueError("Start/end times must be within the video duration.")
+
+    run_dir = work_dir / "exports" / f"cuts_{video_stem}_{int(time.time())}"
+    run_dir.mkdir(parents=True, exist_ok=True)
+
+    output_path = run_dir / f"{video_stem}_{int(start_seconds)}-{int(end_seconds)}.mp4"
+    segments = [(start_seconds, end_seconds, output_path)]
+    render_backend = get_backend(backend)
+
+    report("Cutting clip...", 0.4)
+    recorder = RunRecorder("cut")
+    progress = _frame_progress(report, media.fps, 0.4, 1.0)
+
+    def on_progress(seconds: float) -> None:
+        progress(seconds, end_seconds - start_seconds)
+
+    with recorder.stage("cutting"):
+        try:
+            render_backend.render_segments(
+                video_path,
+                segments,
+                get_profile(profile),
+                temp_dir=work_dir,
+                on_progress=on_progress,
+            )
+        except Exception as write_err:
+            if "stdout" not in str(write_err):
+                raise
+            warnings.append(
+                "Audio track failed to process; exporting clip without audio."
+            )
+            render_backend.render_segments(
+                video_path,
+                segments,
+                get_profile(profile),
+                temp_dir=work_dir,
+                audio=False,
+                on_progress=on_progress,
+            )
+
+    return {
+        "output_path": str(output_path),
+        "warnings": warnings,
+        "run_report": str(recorder.write(work_dir)),
+    }
+
+
+def default_export_workers(job_workers: int, cpu_count: int | None = None) -> int:
+    """Export processes a single job may use while job_workers jobs run."""
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return max(1, cpu_count // max(1, job_workers))
+
+
+def job_handlers(
+    cache: ArtifactCache,
+    job_workers: int = 1,
+    workspaces: WorkspaceManager | None = None,
+) -> dict:
+    """Handlers for the job queue's "process", "render", "cut" and "proxy" job
+    kinds.
+
+    After every job the process-wide metrics are rewritten to METRICS_FILE,
+    and the workspaces the job used are marked as used and a cleanup of
+    workspaces is requested. Process, render and cut results also carry notes
+    on what earlier cleanups evicted or failed to.
+    """
+
+    def finished(job) -> None:
+        registry.write()
+        if workspaces is not None:
+            workspaces.touch(*job_paths(job.params))
+            workspaces.request_cleanup()
+
+    def with_workspace_notes(result: dict) -> dict:
+        if workspaces is not None:
+            result["notes"] = result.get("notes", []) + workspaces.notes()
+        return result
+
+    async def process(job, report: Report) -> dict:
+        params = job.params
+        try:
+            result = await run_process_pipeline(
+                params["video_path"],
+                params["prompt"],
+                params["upload_hash"],
+                params["work_dir"],
+                cache,
+                cut_mode=params.get("cut_mode", "smart"),
+                export_workers=min(
+                    params.get("export_workers", 1),
+                    default_export_workers(job_workers),
+                ),
+                report=report,
+                pipelined=params.get("pipelined", False),
+                snap=params.get("snap", True),
+                profile=params.get("profile", DEFAULT_PROFILE),
+                formats=params.get("formats"),
+                merge=params.get("merge", True),
+                merge_gap=params.get("merge_gap", MERGE_GAP_SECONDS),
+            )
+            return with_workspace_notes(result)
+        finally:
+            finished(job)
+
+    async def render(job, report: Report) -> dict:
+        params = job.params
+        try:
+            result = await render_approved(
+                params["video_path"],
+                params["render_plan"],
+                params["approved"],
+                params["run_dir"],
+                params["work_dir"],
+                cut_mode=params.get("cut_mode", "smart"),
+                export_workers=min(
+                    params.get("export_workers", 1),
+                    default_export_workers(job_workers),
+                ),
+                profile=params.get("profile", "final"),
+                report=report,
+                formats=params.get("formats"),
+            )
+            return with_workspace_notes(result)
+        finally:
+            finished(job)
+
+    def cut(job, report: Report) -> dict:
+        params = job.params
+        try:
+            result = export_clip(
+                params["video_path"],
+                params["start_seconds"],
+                params["end_seconds"],
+                params["work_dir"],
+                report=report,
+                profile=params.get("profile", DEFAULT_PROFILE),
+            )
+            return with_workspace_notes(result)
+        finally:
+            finished(job)
+
+    def proxy(job, report: Report) -> dict:
+        params = job.params
+        try:
+            report("Encoding preview...", 0.1)
+            built = build_proxy(params["video_path"], params["upload_hash"], cache)
+            return {"preview_path": str(built.preview_path)}
+        finally:
+            finished(job)
+
+    return {"process": process, "render": render, "cut": cut, "proxy": proxy}
@@ -0,0 +1,242 @@
+import re
+import struct
+import subprocess
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+from moviepy.config import FFMPEG_BINARY
+from moviepy.video.io.ffmpeg_reader import FFmpegInfosParser
+
+_probe_cache: dict[tuple[str, int, int], "MediaInfo"] = {}
+_content_cache: dict[str, "MediaInfo"] = {}
+
+_STREAM_LINE = re.compile(r"Stream #\d+:(\d+)\S*: (\w+): (\w+)")
+# The rest of the first video stream line, e.g.
+# "h264 (High) (avc1 / 0x31637661), yuv420p(progressive), ..., 12800 tbn"
+_VIDEO_LINE = re.compile(r"Stream #\d+:\d+\S*: Video: (.*)")
+_PROFILE = re.compile(r"\w+ \(([^)/]+)\)")
+_TIMESCALE = re.compile(r"([\d.]+)(k?) tbn")
+_BASE_FPS = re.compile(r"([\d.]+)(k?) tbr")
+
+
+@dataclass(frozen=True)
+class StreamInfo:
+    index: int
+    kind: str
+    codec: str
+
+
+@dataclass(frozen=True)
+class MediaInfo:
+    """What the container headers say about one media file."""
+
+    path: str
+    duration: float
+    # Overall bitrate in kb/s
+    bitrate: int | None
+    streams: tuple[StreamInfo, ...]
+    video_size: tuple[int, int] | None = None
+    fps: float | None = None
+    video_codec: str | None = None
+    audio_codec: str | None = None
+    audio_rate: int | None = None
+    # ffmpeg's "tbr", the nominal rate; fps is the average over the stream,
+    # which drifts for cuts whose first timestamps are offset
+    base_fps: float | None = None
+    video_profile: str | None = None
+    pix_fmt: str | None = None
+    # Video timestamp units per second (the stream's time base denominator)
+    timescale: int | None = None
+    # From the MP4 sample tables; None for containers without them
+    frames: int | None = None
+    keyframes: int | None = None
+
+    @property
+    def has_video(self) -> bool:
+        return self.video_codec is not None
+
+    @property
+    def has_audio(self) -> bool:
+        return self.audio_codec is not None
+
+
+def probe_media(
+    media_path: str | Path, content_hash: str | None = None
+) -> MediaInfo:
+    """Read a media file's metadata from its headers, never decoding a frame.
+
+    Results are cached by resolved path, size and mtime. With content_hash
+    (such as an upload's sha256) they are also cached by content, so a copy
+    of an already probed file is not probed again.
+    """
+    path = Path(media_path).resolve()
+    stat = path.stat()
+    cache_key = (str(path), stat.st_size, stat.st_mtime_ns)
+    if cache_key in _probe_cache:
+        info = _probe_cache[cache_key]
+    elif content_hash is not None and content_hash in _content_cache:
+        info = replace(_content_cache[content_hash], path=str(path))
+    else:
+        info = _probe(path)
+    _probe_cache[cache_key] = info
+    if content_hash is not None:
+        _content_cache[content_hash] = info
+    return info
+
+
+def _probe(path: Path) -> MediaInfo:
+    # Without an output ffmpeg only opens the input and prints its headers
+    proc = subprocess.run(
+        [FFMPEG_BINARY, "-hide_banner", "-i", str(path)],
+        capture_output=True,
+        text=True,
+        errors="ignore",
+    )
+    try:
+        infos = FFmpegInfosParser(proc.stderr, str(path)).parse()
+    except Exception as e:
+        raise IOError(f"Could not read the headers of {path}:\n{proc.stderr}") from e
+
+    streams = tuple(
+        StreamInfo(int(index), kind.lower(), codec)
+        for index, kind, codec in _STREAM_LINE.findall(proc.stderr)
+    )
+    codecs = {}
+    for stream in streams:
+        codecs.setdefault(stream.kind, stream.codec)
+
+    video_profile, pix_fmt, base_fps, timescale = _video_details(proc.stderr)
+    frames, keyframes = None, None
+    if "video" in codecs:
+        frames, keyframes = mp4_sample_counts(path)
+    video_size = infos.get("video_size") if infos.get("video_found") else None
+    return MediaInfo(
+        path=str(path),
+        duration=infos.get("duration") or 0.0,
+        bitrate=infos.get("bitrate"),
+        streams=streams,
+        video_size=tuple(video_size) if video_size else None,
+        fps=infos.get("video_fps") if infos.get("video_found") else None,
+        video_codec=codecs.get("video"),
+        audio_codec=codecs.get("audio"),
+        audio_rate=infos.get("audio_fps") if infos.get("audio_found") else None,
+        base_fps=base_fps,
+        video_profile=video_profile,
+        pix_fmt=pix_fmt,
+        timescale=timescale,
+        frames=frames,
+        keyframes=keyframes,
+    )
+
+
+def _video_details(
+    header: str,
+) -> tuple[str | None, str | None, float | None, int | None]:
+    """(codec profile, pixel format, base fps, timescale) of the first video
+    stream."""
+    line = _VIDEO_LINE.search(header)
+    if line is None:
+        return None, None, None, None
+    parts = line.group(1).split(", ")
+    profile = _PROFILE.match(parts[0])
+    pix_fmt = re.match(r"\w+", parts[1]) if len(parts) > 1 else None
+    base_fps, timescale = (
+        _header_number(pattern.search(line.group(1)))
+        for pattern in (_BASE_FPS, _TIMESCALE)
+    )
+    return (
+        profile.group(1) if profile else None,
+        pix_fmt.group(0) if pix_fmt else None,
+        base_fps,
+        round(timescale) if timescale else None,
+    )
+
+
+def _header_number(match: re.Match | None) -> float | None:
+    """A number as ffmpeg prints it in stream lines, where "90k" is 90000."""
+    if match is None:
+        return None
+    return float(match.group(1)) * (1000 if match.group(2) else 1)
+
+
+def mp4_sample_counts(path: str | Path) -> tuple[int | None, int | None]:
+    """(frames, keyframes) of the first video track of an MP4/MOV file.
+
+    Only the box headers and the moov sample tables are read: stsz holds the
+    sample count and stss the sync samples, which are the keyframes. Other
+    containers, and fragmented MP4s whose samples live in moof boxes, give
+    (None, None).
+    """
+    try:
+        with open(path, "rb") as f:
+            file_end = f.seek(0, 2)
+            top_level = _boxes(f, 0, file_end)
+            # Anything else is not an ISO media file, so its bytes are not boxes
+            if next(top_level, (None,))[0] != b"ftyp":
+                return None, None
+            for kind, start, end in top_level:
+                if kind != b"moov":
+                    continue
+                for kind, start, end in _boxes(f, start, end):
+                    if kind == b"trak":
+                        counts = _video_track_counts(f, start, end)
+                        if counts is not None:
+                            return counts
+    except (OSError, struct.error):
+        pass
+    return None, None
+
+
+def _boxes(f, start: int, end: int):
+    """(type, payload start, box end) of the boxes between start and end."""
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        size, kind = struct.unpack(">I4s", f.read(8))
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            return
+        yield kind, offset + header_size, offset + size
+        offset += size
+
+
+def _child(f, start: int, end: int, kind: str) -> tuple[int, int] | None:
+    for child_kind, child_start, child_end in _boxes(f, start, end):
+        if child_kind == kind.encode():
+            return child_start, child_end
+    return None
+
+
+def _video_track_counts(f, start: int, end: int) -> tuple[int, int] | None:
+    mdia = _child(f, start, end, "mdia")
+    hdlr = mdia and _child(f, *mdia, "hdlr")
+    if not hdlr:
+        return None
+    # version and flags, pre_defined, then the handler type
+    f.seek(hdlr[0] + 8)
+    if f.read(4) != b"vide":
+        return None
+
+    minf = _child(f, *mdia, "minf")
+    stbl = minf and _child(f, *minf, "stbl")
+    stsz = stbl and _child(f, *stbl, "stsz")
+    if not stsz:
+        return None
+    # version and flags, sample_size, then sample_count
+    f.seek(stsz[0] + 8)
+    (frames,) = struct.unpack(">I", f.read(4))
+    if not frames:
+        return None
+
+    stss = _child(f, *stbl, "stss")
+    if stss is None:
+        # No sync sample table means every sample is a keyframe
+        return frames, frames
+    f.seek(stss[0] + 4)
+    (keyframes,) = struct.unpack(">I", f.read(4))
+    return frames, keyframes
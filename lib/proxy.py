@@ -0,0 +1,174 @@
+import math
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+from moviepy.config import FFMPEG_BINARY
+from moviepy.tools import subprocess_call
+
+from lib.cache import ArtifactCache, hash_text
+from lib.probe import probe_media
+
+PREVIEW_MAX_HEIGHT = 360
+PREVIEW_MAX_KBPS = 500
+PREVIEW_AUDIO_KBPS = 64
+
+THUMB_WIDTH = 160
+THUMB_COLUMNS = 10
+MIN_THUMB_INTERVAL = 5.0
+MAX_THUMBS = 100
+
+# Part of the cache key, so changing the encoding settings above regenerates
+# proxies instead of serving stale ones.
+PROXY_VERSION = 1
+
+
+@dataclass
+class ThumbnailGrid:
+    """Layout of a sprite sheet: tile n shows the source at n * interval."""
+
+    interval: float
+    count: int
+    columns: int
+    thumb_width: int
+    thumb_height: int
+
+    @property
+    def rows(self) -> int:
+        return math.ceil(self.count / self.columns)
+
+    def times(self) -> list[float]:
+        return [n * self.interval for n in range(self.count)]
+
+    def tile_box(self, n: int) -> tuple[int, int, int, int]:
+        """(left, top, right, bottom) of tile n within the sprite sheet."""
+        left = (n % self.columns) * self.thumb_width
+        top = (n // self.columns) * self.thumb_height
+        return left, top, left + self.thumb_width, top + self.thumb_height
+
+
+@dataclass
+class Proxy:
+    preview_path: Path
+    sprite_path: Path
+    grid: ThumbnailGrid
+    duration: float
+    # False while the source itself stands in for the low-bitrate preview
+    preview_ready: bool = True
+
+
+def plan_thumbnails(
+    duration: float,
+    video_size: tuple[int, int],
+    min_interval: float = MIN_THUMB_INTERVAL,
+    max_thumbs: int = MAX_THUMBS,
+) -> ThumbnailGrid:
+    """Pick a thumbnail interval so the sheet never exceeds max_thumbs tiles."""
+    interval = max(min_interval, duration / max_thumbs)
+    count = max(1, math.ceil(duration / interval))
+    width, height = video_size
+    thumb_height = max(2, round(THUMB_WIDTH * height / width / 2) * 2)
+    return ThumbnailGrid(
+        interval=interval,
+        count=count,
+        columns=min(THUMB_COLUMNS, count),
+        thumb_width=THUMB_WIDTH,
+        thumb_height=thumb_height,
+    )
+
+
+def build_proxy(
+    video_path: str, content_hash: str, cache: ArtifactCache, preview: bool = True
+) -> Proxy:
+    """Return a low-bitrate preview and thumbnail sheet for a source, cached by
+    content hash so each upload is only transcoded once.
+
+    With preview off only the thumbnail sheet is rendered, which decodes
+    keyframes alone, and the source stands in for a preview not yet encoded.
+    """
+    media = probe_media(video_path, content_hash)
+    grid = plan_thumbnails(media.duration, media.video_size)
+    key = hash_text(f"{content_hash}:proxy-v{PROXY_VERSION}")
+
+    preview_path = cache.get("proxy", key)
+    sprite_path = cache.get("sprite", key)
+
+    if (preview and preview_path is None) or sprite_path is None:
+        with tempfile.TemporaryDirectory(prefix="proxy_") as work:
+            if preview and preview_path is None:
+                preview = Path(work) / "preview.mp4"
+                _encode_preview(video_path, preview, media.has_audio)
+                preview_path = cache.put("proxy", key, preview)
+            if sprite_path is None:
+                sprite = Path(work) / "sprite.jpg"
+                _render_sprite(video_path, sprite, grid)
+                sprite_path = cache.put("sprite", key, sprite)
+
+    if preview_path is None:
+        return Proxy(Path(video_path), sprite_path, grid, media.duration, False)
+    return Proxy(preview_path, sprite_path, grid, media.duration)
+
+
+def _encode_preview(video_path: str, output: Path, has_audio: bool) -> None:
+    audio_args = (
+        ["-map", "0:a:0", "-c:a", "aac", "-ac", "1", "-b:a", f"{PREVIEW_AUDIO_KBPS}k"]
+        if has_audio
+        else []
+    )
+    subprocess_call(
+        [
+            FFMPEG_BINARY,
+            "-y",
+            "-i",
+            str(video_path),
+            "-map",
+            "0:v:0",
+            *audio_args,
+            "-vf",
+            f"scale=-2:'min({PREVIEW_MAX_HEIGHT},ih)'",
+            "-c:v",
+            "libx264",
+            "-preset",
+            "veryfast",
+            "-crf",
+            "30",
+            "-maxrate",
+            f"{PREVIEW_MAX_KBPS}k",
+            "-bufsize",
+            f"{2 * PREVIEW_MAX_KBPS}k",
+            "-pix_fmt",
+            "yuv420p",
+            # moov up front so the browser can start playing before the end
+            "-movflags",
+            "+faststart",
+            str(output),
+        ],
+        logger=None,
+    )
+
+
+def _render_sprite(video_path: str, output: Path, grid: ThumbnailGrid) -> None:
+    subprocess_call(
+        [
+            FFMPEG_BINARY,
+            "-y",
+            # Decode keyframes only; each tile shows the last keyframe before
+            # its timestamp, which is plenty for picking a cut point.
+            "-skip_frame",
+            "nokey",
+            "-i",
+            str(video_path),
+            "-map",
+            "0:v:0",
+            "-vf",
+            f"fps=1/{grid.interval:.6f},"
+            f"scale={grid.thumb_width}:{grid.thumb_height},"
+            f"tile={grid.columns}x{grid.rows}",
+            "-frames:v",
+            "1",
+            "-q:v",
+            "4",
+            str(output),
+        ],
+        logger=None,
+    )
@@ -0,0 +1,151 @@
+import tempfile
+from pathlib import Path
+
+from moviepy.config import FFMPEG_BINARY
+from moviepy.tools import subprocess_call
+
+from lib.probe import probe_media
+from lib.render_profiles import RenderProfile, get_profile
+
+REEL_FILENAME = "highlight_reel.mp4"
+# MediaInfo fields that must agree for files to be joined by stream copy
+SIGNATURE_FIELDS = (
+    "video_codec",
+    "video_profile",
+    "pix_fmt",
+    "video_size",
+    "base_fps",
+    "timescale",
+    "audio_codec",
+    "audio_rate",
+)
+
+
+def stream_signature(path: str) -> tuple:
+    """Stream parameters that must agree for files to be joined by stream copy."""
+    media = probe_media(path)
+    return tuple(getattr(media, name) for name in SIGNATURE_FIELDS)
+
+
+def reencode_reason(segment_paths: list[str]) -> str | None:
+    """Why the segments cannot be joined by stream copy, or None if they can."""
+    signatures = [stream_signature(path) for path in segment_paths]
+    differing = [
+        name
+        for name, values in zip(SIGNATURE_FIELDS, zip(*signatures))
+        if len(set(values)) > 1
+    ]
+    if not differing:
+        return None
+    return f"segment streams differ in {', '.join(differing)}"
+
+
+def concat_segments(
+    segment_paths: list[str],
+    output_path: str | Path,
+    profile: str | RenderProfile | None = None,
+) -> str:
+    """Join already exported segments into one reel.
+
+    Segments whose streams agree (see reencode_reason) are joined by the
+    concat demuxer without re-encoding. Otherwise, e.g. when smart cut
+    segments keep the source's H.264 profile and re-encoded ones do not, the
+    reel is re-encoded with profile to the first segment's frame size, rate
+    and audio format, since copied packets would not make a valid stream.
+    """
+    if reencode_reason(segment_paths) is not None:
+        subprocess_call(
+            reencode_command(segment_paths, output_path, get_profile(profile)),
+            logger=None,
+        )
+        return str(output_path)
+
+    with tempfile.TemporaryDirectory(prefix="reel_") as work:
+        segment_list = Path(work) / "segments.txt"
+        segment_list.write_text(
+            "".join(f"file '{Path(path).resolve()}'\n" for path in segment_paths)
+        )
+        subprocess_call(
+            [
+                FFMPEG_BINARY,
+                "-y",
+                "-f",
+                "concat",
+                "-safe",
+                "0",
+                "-i",
+                str(segment_list),
+                "-map",
+                "0",
+                "-c",
+                "copy",
+                "-movflags",
+                "+faststart",
+                str(output_path),
+            ],
+            logger=None,
+        )
+    return str(output_path)
+
+
+def reencode_command(
+    segment_paths: list[str], output_path: str | Path, profile: RenderProfile
+) -> list[str]:
+    """ffmpeg arguments that join segments through the concat filter, each
+    first brought to the first segment's frame size, rate and audio format."""
+    first = probe_media(segment_paths[0])
+    width, height = first.video_size
+    rate = first.base_fps or first.fps
+    fps = f"{rate:g}" if rate else "25"
+    with_audio = all(probe_media(path).has_audio for path in segment_paths)
+
+    filters = []
+    labels = ""
+    for n in range(len(segment_paths)):
+        filters.append(
+            f"[{n}:v:0]fps={fps},scale={width}:{height},setsar=1,"
+            f"format=yuv420p[v{n}]"
+        )
+        labels += f"[v{n}]"
+        if with_audio:
+            filters.append(
+                f"[{n}:a:0]aformat=sample_rates={first.audio_rate}"
+                f":channel_layouts=stereo[a{n}]"
+            )
+            labels += f"[a{n}]"
+    count = len(segment_paths)
+    filters.append(
+        f"{labels}concat=n={count}:v=1:a={int(with_audio)}[v]"
+        + ("[a]" if with_audio else "")
+    )
+
+    inputs = []
+    for path in segment_paths:
+        inputs += ["-i", str(path)]
+    audio_args = (
+        ["-map", "[a]", "-c:a", "aac", "-b:a", profile.audio_bitrate]
+        if with_audio
+        else ["-an"]
+    )
+    return [
+        FFMPEG_BINARY,
+        "-y",
+        *inputs,
+        "-filter_complex",
+        ";".join(filters),
+        "-map",
+        "[v]",
+        *audio_args,
+        "-c:v",
+        "libx264",
+        "-preset",
+        profile.preset,
+        *profile.video_args(),
+        "-pix_fmt",
+        "yuv420p",
+        "-r",
+        fps,
+        "-movflags",
+        "+faststart",
+        str(output_path),
+    ]
@@ -0,0 +1,335 @@
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Callable
+
+from moviepy import VideoFileClip
+from moviepy.config import FFMPEG_BINARY
+from moviepy.tools import subprocess_call
+
+from lib.output_formats import OutputFormat, get_format, get_formats
+from lib.probe import probe_media
+from lib.render_profiles import RenderProfile, get_profile
+from lib.smart_cut import SEGMENT_AUDIO_CHANNELS, SEGMENT_AUDIO_RATE
+
+# (start, end, output path) of each segment to render
+Segment = tuple[float, float, Path]
+# Called with the seconds of output encoded so far, over all segments
+Progress = Callable[[float], None]
+
+
+class MoviepyBackend:
+    """Renders through moviepy: every frame is decoded into a NumPy array in
+    Python and piped to a separate ffmpeg encoder. Each output format decodes
+    the segment again."""
+
+    name = "moviepy"
+
+    def render_segments(
+        self,
+        video_path: str,
+        segments: list[Segment],
+        profile: RenderProfile | None = None,
+        threads: int | None = None,
+        temp_dir: str | Path = "temp",
+        audio: bool = True,
+        formats: list[str | OutputFormat] | None = None,
+        on_progress: Progress | None = None,
+    ) -> list[str]:
+        """Render each segment from one shared reader, reporting progress as
+        each one finishes."""
+        if not segments:
+            return []
+        profile = get_profile(profile)
+        formats = get_formats(formats)
+        clip = VideoFileClip(str(video_path))
+        # Subclips share the reader, and closing one closes it, so they are
+        # only closed once every segment is written.
+        written = []
+        outputs = []
+        done_seconds = 0.0
+        try:
+            for start_time, end_time, segment_path in segments:
+                for output_format in formats:
+                    output_path = output_format.path(segment_path)
+                    written.append(
+                        write_segment(
+                            clip,
+                            start_time,
+                            end_time,
+                            output_path,
+                            str(Path(temp_dir) / f"{output_path.stem}-audio.m4a"),
+                            threads,
+                            profile,
+                            audio,
+                            output_format,
+                        )
+                    )
+                    outputs.append(str(output_path))
+                done_seconds += end_time - start_time
+                if on_progress is not None:
+                    on_progress(done_seconds)
+        finally:
+            for segment in written:
+                segment.close()
+            clip.close()
+        return outputs
+
+
+class FFmpegBackend:
+    """Renders each segment with one ffmpeg filtergraph (trim/atrim, crop,
+    scale, pad), so decoded frames never leave ffmpeg. Several output formats
+    of a segment share one decode through a split filter."""
+
+    name = "ffmpeg"
+
+    def render_segments(
+        self,
+        video_path: str,
+        segments: list[Segment],
+        profile: RenderProfile | None = None,
+        threads: int | None = None,
+        temp_dir: str | Path = "temp",
+        audio: bool = True,
+        formats: list[str | OutputFormat] | None = None,
+        on_progress: Progress | None = None,
+    ) -> list[str]:
+        """Render each segment, reporting the encoder's progress as it goes."""
+        if not segments:
+            return []
+        profile = get_profile(profile)
+        formats = get_formats(formats)
+        media = probe_media(video_path)
+        filters = [
+            output_format.filters(media.video_size, profile.max_height)
+            for output_format in formats
+        ]
+        with_audio = audio and media.has_audio
+
+        outputs = []
+        done_seconds = 0.0
+        for start_time, end_time, segment_path in segments:
+            segment_outputs = [
+                (output_format.path(segment_path), video_filters)
+                for output_format, video_filters in zip(formats, filters)
+            ]
+            duration = end_time - start_time
+            run_ffmpeg(
+                segment_command(
+                    video_path,
+                    start_time,
+                    end_time,
+                    segment_outputs,
+                    profile,
+                    profile.threads or threads,
+                    with_audio,
+                    media.fps,
+                ),
+                None
+                if on_progress is None
+                else lambda seconds: on_progress(done_seconds + min(seconds, duration)),
+            )
+            outputs += [str(output_path) for output_path, _ in segment_outputs]
+            done_seconds += duration
+            if on_progress is not None:
+                on_progress(done_seconds)
+        return outputs
+
+
+def run_ffmpeg(cmd: list[str], on_progress: Progress | None = None) -> None:
+    """Run an ffmpeg command, passing its output time to on_progress as the
+    encoder reports it."""
+    if on_progress is None:
+        subprocess_call(cmd, logger=None)
+        return
+
+    cmd = [cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]]
+    # stderr goes to a file so a chatty encoder cannot fill the pipe and stall
+    with tempfile.TemporaryFile() as errors:
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=errors,
+            text=True,
+        )
+        for line in proc.stdout:
+            key, _, value = line.strip().partition("=")
+            # out_time_us is "N/A" until the first frame is written
+            if key == "out_time_us" and value.isdigit():
+                on_progress(int(value) / 1_000_000)
+        proc.wait()
+        if proc.returncode:
+            errors.seek(0)
+            raise IOError(errors.read().decode("utf8", errors="replace"))
+
+
+def write_segment(
+    clip,
+    start_time: float,
+    end_time: float,
+    segment_path: Path,
+    temp_audiofile: str,
+    threads: int | None = None,
+    profile: RenderProfile | None = None,
+    audio: bool = True,
+    output_format: str | OutputFormat = "original",
+):
+    profile = get_profile(profile)
+    output_format = get_format(output_format)
+    segment = clip.subclipped(start_time, end_time)
+    if output_format.aspect is not None or profile.max_height is not None:
+        segment = reframe(segment, clip.size, output_format, profile.max_height)
+
+    # Export individual segment with audio
+    segment.write_videofile(
+        str(segment_path),
+        codec="libx264",
+        audio=audio,
+        audio_codec="aac" if audio else None,  # Ensure audio codec is specified
+        audio_fps=SEGMENT_AUDIO_RATE,
+        audio_bitrate=profile.audio_bitrate if audio else None,
+        preset=profile.preset,
+        ffmpeg_params=profile.video_args(),
+        temp_audiofile=temp_audiofile if audio else None,  # Temporary audio file
+        remove_temp=True,  # Clean up temp files
+        threads=profile.threads or threads,
+        logger=None,
+    )
+    return segment
+
+
+def reframe(
+    segment,
+    size: tuple[int, int],
+    output_format: OutputFormat,
+    max_height: int | None = None,
+):
+    """The moviepy counterpart of OutputFormat.filters."""
+    frame_size = output_format.frame_size(size, max_height)
+    if output_format.aspect is None:
+        if frame_size == tuple(size):
+            return segment
+        return segment.resized(new_size=frame_size)
+
+    width, height = size
+    frame_width, frame_height = frame_size
+    if output_format.fit == "crop":
+        crop_width = min(width, height * frame_width / frame_height)
+        crop_height = min(height, width * frame_height / frame_width)
+        return segment.cropped(
+            x_center=width / 2,
+            y_center=height / 2,
+            width=crop_width,
+            height=crop_height,
+        ).resized(new_size=frame_size)
+
+    scale = min(frame_width / width, frame_height / height)
+    return segment.resized(
+        new_size=(round(width * scale / 2) * 2, round(height * scale / 2) * 2)
+    ).with_background_color(size=frame_size, color=(0, 0, 0), pos="center")
+
+
+def segment_command(
+    video_path: str,
+    start_time: float,
+    end_time: float,
+    outputs: list[tuple[str | Path, str | None]],
+    profile: RenderProfile,
+    threads: int | None = None,
+    with_audio: bool = True,
+    fps: float | None = None,
+) -> list[str]:
+    """ffmpeg arguments that cut and encode one segment in one pass.
+
+    outputs holds (path, video filters or None) for every format to write;
+    the trimmed frames are decoded once and split between them. Frames come
+    out of a filtergraph without a rate, so the source's fps is passed on to
+    every output; without it the frame timestamps are kept as they are.
+    """
+    rate_args = ["-r", f"{fps:g}"] if fps else ["-fps_mode", "passthrough"]
+    duration = end_time - start_time
+    count = len(outputs)
+    # Input seeking jumps to the keyframe before start and decodes from there;
+    # trim then keeps exactly `duration` seconds from the requested frame.
+    video_chain = f"[0:v:0]trim=duration={duration:.6f},setpts=PTS-STARTPTS"
+    audio_chain = f"[0:a:0]atrim=duration={duration:.6f},asetpts=PTS-STARTPTS"
+    if count == 1:
+        video_filters = outputs[0][1]
+        if video_filters is None:
+            filters = [f"{video_chain}[v0]"]
+        else:
+            filters = [f"{video_chain},{video_filters}[v0]"]
+        audio_filters = [f"{audio_chain}[a0]"]
+    else:
+        labels = "".join(
+            f"[v{n}]" if video_filters is None else f"[s{n}]"
+            for n, (_, video_filters) in enumerate(outputs)
+        )
+        filters = [f"{video_chain},split={count}{labels}"]
+        filters += [
+            f"[s{n}]{video_filters}[v{n}]"
+            for n, (_, video_filters) in enumerate(outputs)
+            if video_filters is not None
+        ]
+        audio_filters = [
+            f"{audio_chain},asplit={count}" + "".join(f"[a{n}]" for n in range(count))
+        ]
+    if with_audio:
+        filters += audio_filters
+
+    output_args = []
+    for n, (output_path, _) in enumerate(outputs):
+        output_args += ["-map", f"[v{n}]"]
+        if with_audio:
+            output_args += [
+                "-map",
+                f"[a{n}]",
+                "-c:a",
+                "aac",
+                "-ar",
+                str(SEGMENT_AUDIO_RATE),
+                "-ac",
+                str(SEGMENT_AUDIO_CHANNELS),
+                "-b:a",
+                profile.audio_bitrate,
+            ]
+        else:
+            output_args.append("-an")
+        output_args += [
+            "-c:v",
+            "libx264",
+            "-preset",
+            profile.preset,
+            *profile.video_args(),
+            "-pix_fmt",
+            "yuv420p",
+            *rate_args,
+            *(["-threads", str(threads)] if threads else []),
+            "-movflags",
+            "+faststart",
+            str(output_path),
+        ]
+
+    return [
+        FFMPEG_BINARY,
+        "-y",
+        "-ss",
+        f"{start_time:.6f}",
+        "-i",
+        str(video_path),
+        "-filter_complex",
+        ";".join(filters),
+        *output_args,
+    ]
+
+
+RENDER_BACKENDS = {"moviepy": MoviepyBackend(), "ffmpeg": FFmpegBackend()}
+DEFAULT_BACKEND = "ffmpeg"
+
+
+def get_backend(name: str | None = None) -> MoviepyBackend | FFmpegBackend:
+    name = name or DEFAULT_BACKEND
+    if name not in RENDER_BACKENDS:
+        raise ValueError(f"Unknown render backend: {name}")
+    return RENDER_BACKENDS[name]
@@ -0,0 +1,173 @@
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from lib.audio_analysis import AudioEnvelope
+
+# Segments closer together than this are rendered as one; 0 merges only
+# segments that overlap or touch, so no unrequested footage is added.
+MERGE_GAP_SECONDS = 0.0
+
+# Written into a run's work_dir once its segments are known, before cutting
+PLAN_FILENAME = "render_plan.json"
+
+
+def pad_edit(
+    start_time: float, end_time: float, duration: float
+) -> tuple[float, float]:
+    """Widen an edit by 2 seconds on each side, clamped to the video."""
+    # If start time is greater than 2, reduce it to 2 seconds otherwise set to 0
+    if start_time > 2:
+        start_time -= 2
+    else:
+        start_time = 0
+
+    # If end time is within 2 seconds of the video duration, set it to the video duration otherwise increase it by 2 seconds
+    if end_time < duration - 2:
+        end_time += 2
+    else:
+        end_time = duration
+
+    # Ensure times are within bounds
+    return max(start_time, 0), min(end_time, duration)
+
+
+def bound_edit(
+    start_time: float,
+    end_time: float,
+    duration: float,
+    envelope: AudioEnvelope | None = None,
+) -> tuple[float, float]:
+    """Snap an edit's ends to the nearest pauses, or pad them where none is near."""
+    padded_start, padded_end = pad_edit(start_time, end_time, duration)
+    if envelope is None:
+        return padded_start, padded_end
+
+    snapped_start = envelope.snap_start(start_time)
+    snapped_end = envelope.snap_end(end_time)
+    return (
+        padded_start if snapped_start is None else max(snapped_start, 0),
+        padded_end if snapped_end is None else min(snapped_end, duration),
+    )
+
+
+def segment_filename(n: int, start_time: float, end_time: float) -> str:
+    return f"segment_{n:03d}_{start_time:.1f}s-{end_time:.1f}s.mp4"
+
+
+@dataclass
+class PlannedSegment:
+    """One output file, covering one or more of the requested edits."""
+
+    n: int
+    start: float
+    end: float
+    # Positions of the covered edits in the list given to plan_render
+    edits: list[int] = field(default_factory=list)
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    @property
+    def filename(self) -> str:
+        return segment_filename(self.n, self.start, self.end)
+
+
+@dataclass
+class RenderPlan:
+    """Segments to encode, plus what encoding every edit separately would cost."""
+
+    segments: list[PlannedSegment]
+    requested_seconds: float
+
+    @property
+    def render_seconds(self) -> float:
+        return sum(segment.duration for segment in self.segments)
+
+    @property
+    def saved_seconds(self) -> float:
+        return self.requested_seconds - self.render_seconds
+
+    def summary(self) -> str:
+        edits = sum(len(segment.edits) for segment in self.segments)
+        return (
+            f"Render plan: {edits} edits → {len(self.segments)} segments, "
+            f"{self.render_seconds:.1f}s to encode "
+            f"(was {self.requested_seconds:.1f}s before merging)"
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "segments": [
+                {
+                    "n": segment.n,
+                    "file": segment.filename,
+                    "start": segment.start,
+                    "end": segment.end,
+                    "edits": segment.edits,
+                }
+                for segment in self.segments
+            ],
+            "requested_seconds": self.requested_seconds,
+            "render_seconds": self.render_seconds,
+        }
+
+    def write(self, work_dir: str | Path) -> Path:
+        """Write the plan into work_dir, so it can be shown while it renders."""
+        path = Path(work_dir) / PLAN_FILENAME
+        path.write_text(json.dumps(self.to_dict(), indent=2))
+        return path
+
+    @classmethod
+    def from_dict(cls, data: dict, keep: list[int] | None = None) -> "RenderPlan":
+        """Rebuild a plan from to_dict(), optionally keeping only segments
+        numbered in keep; kept segments retain their numbers and file names."""
+        segments = [
+            PlannedSegment(s["n"], s["start"], s["end"], list(s["edits"]))
+            for s in data["segments"]
+            if keep is None or s["n"] in keep
+        ]
+        return cls(
+            segments=segments,
+            requested_seconds=sum(segment.duration for segment in segments),
+        )
+
+
+def plan_render(
+    edits: list[dict],
+    duration: float,
+    envelope: AudioEnvelope | None = None,
+    merge: bool = True,
+    merge_gap: float = MERGE_GAP_SECONDS,
+) -> RenderPlan:
+    """Bound every edit, then union the ones that overlap after bounding.
+
+    Intervals are sorted by start and swept once: an interval starting within
+    merge_gap of the current segment's end extends it, anything later starts
+    a new segment. With merge off every bounded edit is its own segment.
+    """
+    bounded = []
+    for position, edit in enumerate(edits):
+        start_time, end_time = bound_edit(
+            edit["start"], edit["end"], duration, envelope
+        )
+        if start_time < end_time:
+            bounded.append((start_time, end_time, position))
+    bounded.sort()
+
+    segments: list[PlannedSegment] = []
+    for start_time, end_time, position in bounded:
+        last = segments[-1] if segments else None
+        if merge and last is not None and start_time - last.end <= merge_gap:
+            last.end = max(last.end, end_time)
+            last.edits.append(position)
+        else:
+            segments.append(
+                PlannedSegment(len(segments) + 1, start_time, end_time, [position])
+            )
+
+    return RenderPlan(
+        segments=segments,
+        requested_seconds=sum(end - start for start, end, _ in bounded),
+    )
@@ -0,0 +1,47 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class RenderProfile:
+    """Encoder settings shared by every segment of one render."""
+
+    name: str
+    preset: str
+    crf: int
+    # Segments taller than this are scaled down, keeping the aspect ratio
+    max_height: int | None = None
+    # Encoder threads per segment; None leaves it to the worker planner
+    threads: int | None = None
+    audio_bitrate: str = "128k"
+
+    def output_size(self, size: tuple[int, int]) -> tuple[int, int] | None:
+        """Scaled (width, height) for a source of this size, or None if it fits."""
+        width, height = size
+        if self.max_height is None or height <= self.max_height:
+            return None
+        # libx264 with yuv420p needs even dimensions
+        scaled_width = max(2, round(width * self.max_height / height / 2) * 2)
+        return scaled_width, self.max_height
+
+    def video_args(self) -> list[str]:
+        return ["-crf", str(self.crf)]
+
+
+# "preview" renders the LLM's picks quickly for review; "final" re-renders
+# only the clips the user approves at full quality.
+RENDER_PROFILES = {
+    "preview": RenderProfile(
+        "preview", preset="ultrafast", crf=30, max_height=360, audio_bitrate="64k"
+    ),
+    "final": RenderProfile("final", preset="medium", crf=20, audio_bitrate="192k"),
+}
+DEFAULT_PROFILE = "final"
+
+
+def get_profile(profile: str | RenderProfile | None = None) -> RenderProfile:
+    if isinstance(profile, RenderProfile):
+        return profile
+    name = profile or DEFAULT_PROFILE
+    if name not in RENDER_PROFILES:
+        raise ValueError(f"Unknown render profile: {name}")
+    return RENDER_PROFILES[name]
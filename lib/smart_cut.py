@@ -0,0 +1,287 @@
+import bisect
+import re
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from fractions import Fraction
+from pathlib import Path
+
+from moviepy.config import FFMPEG_BINARY
+from moviepy.tools import subprocess_call
+
+from lib.render_profiles import RenderProfile, get_profile
+
+# Source codecs whose re-encoded head/tail can be spliced onto copied GOPs,
+# mapped to the encoder used for the re-encoded edges.
+SMART_CUT_ENCODERS = {"h264": "libx264"}
+
+# moviepy's write_videofile audio format. Smart cuts write the same, so
+# segments from every cut mode can be joined into a reel by stream copy.
+SEGMENT_AUDIO_RATE = 44100
+SEGMENT_AUDIO_CHANNELS = 2
+
+_index_cache: dict[tuple[str, int, int], "KeyframeIndex"] = {}
+
+
+@dataclass(frozen=True)
+class KeyframeIndex:
+    """Video packet timestamps of one source file, relative to its start."""
+
+    codec: str
+    pix_fmt: str
+    time_base: Fraction
+    start_time: float
+    frame_times: list[float]
+    keyframe_times: list[float]
+    keyframe_dts: list[float]
+
+    @property
+    def supported(self) -> bool:
+        return self.codec in SMART_CUT_ENCODERS and bool(self.keyframe_times)
+
+    def snap_to_frame(self, t: float) -> float:
+        """Return the first frame timestamp at or after t."""
+        i = bisect.bisect_left(self.frame_times, t - 1e-6)
+        if i >= len(self.frame_times):
+            return self.frame_times[-1] if self.frame_times else t
+        return self.frame_times[i]
+
+    def copy_range(self, start: float, end: float) -> tuple[int, int] | None:
+        """Return the first and last keyframe bounding whole GOPs in [start, end)."""
+        i = bisect.bisect_left(self.keyframe_times, start - 1e-6)
+        j = bisect.bisect_right(self.keyframe_times, end + 1e-6) - 1
+        if i >= len(self.keyframe_times) or j <= i:
+            return None
+        return i, j
+
+
+def build_keyframe_index(video_path: str) -> KeyframeIndex:
+    """Index video packets and keyframes by demuxing only, never decoding."""
+    path = Path(video_path).resolve()
+    stat = path.stat()
+    cache_key = (str(path), stat.st_size, stat.st_mtime_ns)
+    if cache_key in _index_cache:
+        return _index_cache[cache_key]
+
+    proc = subprocess.run(
+        [
+            FFMPEG_BINARY,
+            "-hide_banner",
+            "-i",
+            str(path),
+            "-map",
+            "0:v:0",
+            "-c",
+            "copy",
+            "-f",
+            "framecrc",
+            "-",
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode:
+        raise IOError(proc.stderr)
+
+    start_match = re.search(r"start: (-?[\d.]+)", proc.stderr)
+    pix_fmt_match = re.search(r"Stream #0:\d.*?Video: [^,]+, (\w+)", proc.stderr)
+    start_time = float(start_match.group(1)) if start_match else 0.0
+
+    codec = ""
+    time_base = Fraction(1, 1)
+    frame_times: list[float] = []
+    keyframes: list[tuple[float, float]] = []
+
+    for line in proc.stdout.splitlines():
+        if line.startswith("#tb 0:"):
+            time_base = Fraction(line.split(":", 1)[1].strip())
+        elif line.startswith("#codec_id 0:"):
+            codec = line.split(":", 1)[1].strip()
+        elif line and not line.startswith("#"):
+            fields = [field.strip() for field in line.split(",")]
+            dts = float(int(fields[1]) * time_base) - start_time
+            pts = float(int(fields[2]) * time_base) - start_time
+            frame_times.append(pts)
+            # framecrc only prints packet flags when they differ from "keyframe"
+            if not any(field.startswith("F=") for field in fields[6:]):
+                keyframes.append((pts, dts))
+
+    keyframes.sort()
+    index = KeyframeIndex(
+        codec=codec,
+        pix_fmt=pix_fmt_match.group(1) if pix_fmt_match else "yuv420p",
+        time_base=time_base,
+        start_time=start_time,
+        frame_times=sorted(frame_times),
+        keyframe_times=[pts for pts, _ in keyframes],
+        keyframe_dts=[dts for _, dts in keyframes],
+    )
+    _index_cache[cache_key] = index
+    return index
+
+
+def smart_cut_segment(
+    video_path: str,
+    start: float,
+    end: float,
+    output_path: str,
+    index: KeyframeIndex | None = None,
+    threads: int | None = None,
+    profile: str | RenderProfile | None = None,
+) -> bool:
+    """Cut [start, end) by stream-copying whole GOPs and re-encoding the edges.
+
+    The edges and the audio are encoded with the render profile's settings.
+    Returns False without writing anything when the source cannot be smart
+    cut, so the caller can fall back to a full re-encode.
+    """
+    profile = get_profile(profile)
+    index = index or build_keyframe_index(video_path)
+    if not index.supported:
+        return False
+
+    start = index.snap_to_frame(start)
+    if end < index.frame_times[-1]:
+        end = index.snap_to_frame(end)
+    gop_range = index.copy_range(start, end)
+    if gop_range is None:
+        return False
+
+    first, last = gop_range
+    copy_start = index.keyframe_times[first]
+    copy_end = index.keyframe_times[last]
+
+    with tempfile.TemporaryDirectory(prefix="smartcut_") as work:
+        work_dir = Path(work)
+        part_paths = []
+
+        if copy_start > start:
+            part_paths.append(work_dir / "head.mp4")
+            _encode_part(
+                video_path, start, copy_start, part_paths[-1], index, threads, profile
+            )
+
+        part_paths.append(work_dir / "body.mp4")
+        _copy_part(video_path, first, last, part_paths[-1], index)
+
+        if end > copy_end:
+            part_paths.append(work_dir / "tail.mp4")
+            _encode_part(
+                video_path, copy_end, end, part_paths[-1], index, threads, profile
+            )
+
+        # The concat demuxer re-inserts each part's SPS/PPS in-band, so the
+        # re-encoded edges and the copied GOPs decode with their own headers.
+        parts_list = work_dir / "parts.txt"
+        parts_list.write_text("".join(f"file '{p.name}'\n" for p in part_paths))
+
+        subprocess_call(
+            [
+                FFMPEG_BINARY,
+                "-y",
+                "-f",
+                "concat",
+                "-safe",
+                "0",
+                "-i",
+                str(parts_list),
+                "-ss",
+                f"{start:.6f}",
+                "-t",
+                f"{end - start:.6f}",
+                "-i",
+                str(video_path),
+                "-map",
+                "0:v:0",
+                "-map",
+                "1:a:0?",
+                "-c:v",
+                "copy",
+                "-c:a",
+                "aac",
+                "-ar",
+                str(SEGMENT_AUDIO_RATE),
+                "-ac",
+                str(SEGMENT_AUDIO_CHANNELS),
+                "-b:a",
+                profile.audio_bitrate,
+                "-video_track_timescale",
+                str(index.time_base.denominator),
+                "-movflags",
+                "+faststart",
+                str(output_path),
+            ],
+            logger=None,
+        )
+    return True
+
+
+def _copy_part(
+    video_path: str, first: int, last: int, part_path: Path, index: KeyframeIndex
+) -> None:
+    # Ending at the closing keyframe's dts keeps every packet of the copied
+    # GOPs, including reordered B-frames, and nothing from the next GOP.
+    copy_list = part_path.with_suffix(".txt")
+    copy_list.write_text(
+        f"file '{Path(video_path).resolve()}'\n"
+        f"inpoint {index.keyframe_times[first] + index.start_time:.6f}\n"
+        f"outpoint {index.keyframe_dts[last] + index.start_time:.6f}\n"
+    )
+    subprocess_call(
+        [
+            FFMPEG_BINARY,
+            "-y",
+            "-f",
+            "concat",
+            "-safe",
+            "0",
+            "-i",
+            str(copy_list),
+            "-map",
+            "0:v:0",
+            "-c",
+            "copy",
+            str(part_path),
+        ],
+        logger=None,
+    )
+
+
+def _encode_part(
+    video_path: str,
+    start: float,
+    end: float,
+    part_path: Path,
+    index: KeyframeIndex,
+    threads: int | None,
+    profile: RenderProfile,
+) -> None:
+    thread_args = ["-threads", str(threads)] if threads else []
+    subprocess_call(
+        [
+            FFMPEG_BINARY,
+            "-y",
+            "-ss",
+            f"{start:.6f}",
+            "-i",
+            str(video_path),
+            "-t",
+            f"{end - start:.6f}",
+            "-map",
+            "0:v:0",
+            "-an",
+            "-c:v",
+            SMART_CUT_ENCODERS[index.codec],
+            "-pix_fmt",
+            index.pix_fmt,
+            "-preset",
+            profile.preset,
+            *profile.video_args(),
+            # No B-frames, so the edge parts never overlap the copied GOPs' dts.
+            "-bf",
+            "0",
+            *thread_args,
+            str(part_path),
+        ],
+        logger=None,
+    )
@@ -1,28 +1,278 @@
+import asyncio
 import json
-from openai import OpenAI
+import re
+import subprocess
+import tempfile
 from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable
 
-client = OpenAI()
+from moviepy.config import FFMPEG_BINARY
+from moviepy.tools import subprocess_call
 
+from lib.openai_client import get_async_client, with_retries
+from lib.probe import probe_media
 
-def transcribe_audio(audio_file_path: str) -> str:
+CHUNK_SECONDS = 600
+CHUNK_OVERLAP = 1.0
+MAX_CONCURRENT_CHUNKS = 4
+
+# Shorter chunks when streaming, so the first one is ready sooner
+STREAM_CHUNK_SECONDS = 120
+# Whisper rejects audio under 0.1s; a sliver at the end carries no speech
+MIN_CHUNK_SECONDS = 0.5
+
+
+async def _request_transcription(audio_file_path: str, openai_client=None) -> dict:
+    client = openai_client or get_async_client()
+
+    async def request():
+        # Reopened on every attempt so a retry uploads the file from the start
+        with open(audio_file_path, "rb") as audio_file:
+            return await client.audio.transcriptions.create(
+                file=audio_file,
+                model="whisper-1",
+                response_format="verbose_json",
+                timestamp_granularities=["word"],
+            )
+
+    transcription = await with_retries(request)
+    return transcription.model_dump()
+
+
+def _save_transcription(audio_file_path: str, transcription: dict) -> Path:
+    # Save the transcription to a file
+    transcription_file_path = Path(audio_file_path).with_suffix(".json")
+
+    with transcription_file_path.open("w", encoding="utf-8") as f:
+        json.dump(transcription, f, ensure_ascii=False, indent=2)
+
+    return transcription_file_path
+
+
+async def transcribe_audio(audio_file_path: str) -> str:
     try:
-        audio_file = open(audio_file_path, "rb")
-        transcription = client.audio.transcriptions.create(
-            file=audio_file,
-            model="whisper-1",
-            response_format="verbose_json",
-            timestamp_granularities=["word"],
-        )
+        transcription = await _request_transcription(audio_file_path)
+        return _save_transcription(audio_file_path, transcription)
+
+    except Exception as e:
+        print(f"Error during transcription: {e}")
+        raise
+
+
+def detect_silences(
+    audio_file_path: str, noise_db: int = -35, min_silence: float = 0.4
+) -> list[tuple[float, float]]:
+    """Return (start, end) of every silent stretch found by ffmpeg silencedetect."""
+    proc = subprocess.run(
+        [
+            FFMPEG_BINARY,
+            "-hide_banner",
+            "-i",
+            str(audio_file_path),
+            "-af",
+            f"silencedetect=noise={noise_db}dB:d={min_silence}",
+            "-f",
+            "null",
+            "-",
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode:
+        raise IOError(proc.stderr)
+
+    starts = [float(t) for t in re.findall(r"silence_start: (-?[\d.]+)", proc.stderr)]
+    ends = [float(t) for t in re.findall(r"silence_end: (-?[\d.]+)", proc.stderr)]
+    return list(zip(starts, ends))
+
+
+def plan_chunks(
+    duration: float,
+    silences: list[tuple[float, float]],
+    chunk_seconds: float = CHUNK_SECONDS,
+    overlap: float = CHUNK_OVERLAP,
+) -> list[tuple[float, float]]:
+    """Split [0, duration) into chunks of at most chunk_seconds.
+
+    Each cut lands in the middle of the latest silence in the last quarter of
+    the chunk; without one, the chunk is cut hard and the next one starts
+    ``overlap`` seconds earlier so a word on the cut is heard in full by one
+    of the two requests.
+    """
+    midpoints = sorted((start + end) / 2 for start, end in silences)
+    chunks = []
+    start = 0.0
+
+    while duration - start > chunk_seconds:
+        target = start + chunk_seconds
+        window_start = target - chunk_seconds / 4
+        candidates = [m for m in midpoints if window_start <= m <= target]
+        if candidates:
+            chunks.append((start, candidates[-1]))
+            start = candidates[-1]
+        else:
+            chunks.append((start, target))
+            start = target - overlap
+
+    chunks.append((start, duration))
+    return chunks
+
 
-        # Save the transcription to a file
-        transcription_file_path = Path(audio_file_path).with_suffix(".json")
+def merge_transcriptions(
+    chunks: list[tuple[float, float]], transcriptions: list[dict]
+) -> dict:
+    """Stitch per-chunk verbose_json results into one, on the source timeline.
 
-        with transcription_file_path.open("w", encoding="utf-8") as f:
-            json.dump(transcription.model_dump(), f, ensure_ascii=False, indent=2)
+    Where two chunks overlap, words are taken from the earlier chunk before the
+    middle of the overlap and from the later chunk after it, so nothing is
+    transcribed twice.
+    """
+    boundaries = [0.0]
+    for (_, end), (next_start, _) in zip(chunks, chunks[1:]):
+        boundaries.append((next_start + max(next_start, end)) / 2)
+    boundaries.append(float("inf"))
 
-        return transcription_file_path
+    words, segments = [], []
+    for n, ((offset, _), transcription) in enumerate(zip(chunks, transcriptions)):
+        lower, upper = boundaries[n], boundaries[n + 1]
+
+        for word in transcription.get("words") or []:
+            start = word["start"] + offset
+            if lower <= start < upper:
+                words.append({**word, "start": start, "end": word["end"] + offset})
+
+        for segment in transcription.get("segments") or []:
+            start = segment["start"] + offset
+            if lower <= start < upper:
+                segments.append(
+                    {
+                        **segment,
+                        "id": len(segments),
+                        "start": start,
+                        "end": segment["end"] + offset,
+                    }
+                )
+
+    if words:
+        text = " ".join(word["word"].strip() for word in words)
+    else:
+        text = " ".join(t.get("text", "").strip() for t in transcriptions)
+
+    return {
+        "task": "transcribe",
+        "language": transcriptions[0].get("language") if transcriptions else None,
+        "duration": chunks[-1][1] if chunks else 0.0,
+        "text": text,
+        "words": words,
+        "segments": segments or None,
+    }
+
+
+async def transcribe_audio_chunked(
+    audio_file_path: str,
+    chunk_seconds: float = CHUNK_SECONDS,
+    max_concurrency: int = MAX_CONCURRENT_CHUNKS,
+    openai_client=None,
+) -> Path:
+    """Transcribe long audio as silence-aligned chunks sent concurrently.
+
+    Audio shorter than one chunk is sent as a single request.
+    """
+    try:
+        duration = probe_media(audio_file_path).duration
+        chunks = [(0.0, duration)]
+        if duration > chunk_seconds:
+            chunks = plan_chunks(
+                duration, detect_silences(audio_file_path), chunk_seconds
+            )
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        with tempfile.TemporaryDirectory(prefix="chunks_") as work:
+
+            async def transcribe_chunk(n: int, start: float, end: float) -> dict:
+                async with semaphore:
+                    chunk_path = str(audio_file_path)
+                    if len(chunks) > 1:
+                        chunk_path = str(Path(work) / f"chunk_{n:03d}.mp3")
+                        await asyncio.to_thread(
+                            _extract_chunk, audio_file_path, start, end, chunk_path
+                        )
+                    return await _request_transcription(chunk_path, openai_client)
+
+            transcriptions = await asyncio.gather(
+                *(transcribe_chunk(n, *chunk) for n, chunk in enumerate(chunks))
+            )
+
+        return _save_transcription(
+            audio_file_path, merge_transcriptions(chunks, list(transcriptions))
+        )
 
     except Exception as e:
         print(f"Error during transcription: {e}")
         raise
+
+
+async def transcribe_audio_stream(
+    chunks: AsyncIterator[tuple[Path, float, float]],
+    on_transcribed: Callable[[dict], Awaitable[None]] | None = None,
+    max_concurrency: int = MAX_CONCURRENT_CHUNKS,
+    openai_client=None,
+) -> dict:
+    """Transcribe (path, start, end) chunks while they are still being produced.
+
+    on_transcribed receives each chunk's transcription, already moved onto the
+    source timeline, in chunk order. The merged transcription is returned.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    pending: asyncio.Queue = asyncio.Queue()
+    spans: list[tuple[float, float]] = []
+    transcriptions: list[dict] = []
+
+    async def transcribe_chunk(chunk_path: Path) -> dict:
+        async with semaphore:
+            return await _request_transcription(str(chunk_path), openai_client)
+
+    async def deliver() -> None:
+        while (item := await pending.get()) is not None:
+            span, task = item
+            transcription = await task
+            spans.append(span)
+            transcriptions.append(transcription)
+            if on_transcribed is not None:
+                await on_transcribed(merge_transcriptions([span], [transcription]))
+
+    consumer = asyncio.create_task(deliver())
+    try:
+        async for chunk_path, start, end in chunks:
+            if end - start >= MIN_CHUNK_SECONDS:
+                task = asyncio.create_task(transcribe_chunk(chunk_path))
+                await pending.put(((start, end), task))
+        await pending.put(None)
+        await consumer
+    except BaseException:
+        consumer.cancel()
+        raise
+
+    return merge_transcriptions(spans, transcriptions)
+
+
+def _extract_chunk(audio_file_path: str, start: float, end: float, output: str):
+    subprocess_call(
+        [
+            FFMPEG_BINARY,
+            "-y",
+            "-ss",
+            f"{start:.3f}",
+            "-t",
+            f"{end - start:.3f}",
+            "-i",
+            str(audio_file_path),
+            "-c:a",
+            "libmp3lame",
+            "-b:a",
+            "48k",
+            output,
+        ],
+        logger=None,
+    )
@@ -0,0 +1,124 @@
+import bisect
+import json
+import re
+from difflib import SequenceMatcher
+from pathlib import Path
+
+SENTENCE_GAP_SECONDS = 1.5
+# How far an edit may grow to reach the start or end of its sentence
+SENTENCE_SNAP_SECONDS = 3.0
+# Share of the snippet's words that must appear, in order, inside the edit
+MIN_SNIPPET_MATCH = 0.6
+
+_index_cache: dict[tuple[str, int, int], "TranscriptIndex"] = {}
+
+
+def normalize_words(text: str) -> list[str]:
+    return re.findall(r"[\w']+", text.lower())
+
+
+class TranscriptIndex:
+    """Word timings of one transcript as sorted arrays for bisect lookups.
+
+    Words must be added in time order; extend() appends the next chunk of a
+    transcript that is still being produced.
+    """
+
+    def __init__(self, words: list[dict] | None = None):
+        self.starts: list[float] = []
+        self.ends: list[float] = []
+        self.words: list[str] = []
+        # Word indices that begin / end a sentence, both ascending
+        self.sentence_starts: list[int] = []
+        self.sentence_ends: list[int] = []
+        self.extend(words or [])
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def extend(self, words: list[dict]) -> None:
+        for word in sorted(words, key=lambda w: w["start"]):
+            n = len(self.words)
+            if n and word["start"] - self.ends[-1] > SENTENCE_GAP_SECONDS:
+                self._close_sentence(n - 1)
+            if not self.sentence_starts or (
+                self.sentence_ends and self.sentence_ends[-1] == n - 1
+            ):
+                self.sentence_starts.append(n)
+
+            self.starts.append(float(word["start"]))
+            self.ends.append(float(word["end"]))
+            self.words.append(word["word"].strip())
+
+            if self.words[-1].endswith((".", "!", "?")):
+                self._close_sentence(n)
+
+    def word_range(self, start: float, end: float) -> tuple[int, int]:
+        """Half-open range of word indices overlapping [start, end)."""
+        # Word ends are not guaranteed sorted when words overlap, so the first
+        # word is found by start time and stepped back over the run of words
+        # before it that still reach into the range.
+        i = bisect.bisect_right(self.starts, start)
+        while i and self.ends[i - 1] > start:
+            i -= 1
+        j = bisect.bisect_left(self.starts, end)
+        return i, max(i, j)
+
+    def text_between(self, start: float, end: float) -> str:
+        i, j = self.word_range(start, end)
+        return " ".join(self.words[i:j])
+
+    def snap(
+        self, start: float, end: float, sentence_snap: float = SENTENCE_SNAP_SECONDS
+    ) -> tuple[float, float]:
+        """Move an edit onto word boundaries, widening it to whole sentences
+        when their boundaries are within sentence_snap seconds."""
+        i, j = self.word_range(start, end)
+        if i >= j:
+            return start, end
+
+        k = bisect.bisect_right(self.sentence_starts, i) - 1
+        if k >= 0:
+            first = self.sentence_starts[k]
+            if self.starts[i] - self.starts[first] <= sentence_snap:
+                i = first
+
+        k = bisect.bisect_left(self.sentence_ends, j - 1)
+        if k < len(self.sentence_ends):
+            last = self.sentence_ends[k]
+            if self.ends[last] - self.ends[j - 1] <= sentence_snap:
+                j = last + 1
+
+        return self.starts[i], self.ends[j - 1]
+
+    def snippet_match(self, snippet: str, start: float, end: float) -> float:
+        """Share of the snippet's words found, in order, between start and end."""
+        expected = normalize_words(snippet)
+        if not expected:
+            return 1.0
+        actual = normalize_words(self.text_between(start, end))
+        matcher = SequenceMatcher(None, expected, actual, autojunk=False)
+        matched = sum(block.size for block in matcher.get_matching_blocks())
+        return matched / len(expected)
+
+    def align(
+        self, start: float, end: float, snippet: str
+    ) -> tuple[float, float, float]:
+        """Snap an edit and score its snippet; returns (start, end, match)."""
+        start, end = self.snap(start, end)
+        return start, end, self.snippet_match(snippet, start, end)
+
+    def _close_sentence(self, n: int) -> None:
+        if not self.sentence_ends or self.sentence_ends[-1] < n:
+            self.sentence_ends.append(n)
+
+
+def load_transcript_index(transcript_path: str) -> TranscriptIndex:
+    """Build the index for a verbose_json transcript file once, then reuse it."""
+    path = Path(transcript_path).resolve()
+    stat = path.stat()
+    cache_key = (str(path), stat.st_size, stat.st_mtime_ns)
+    if cache_key not in _index_cache:
+        with open(path, "r", encoding="utf-8") as f:
+            _index_cache[cache_key] = TranscriptIndex(json.load(f).get("words") or [])
+    return _index_cache[cache_key]
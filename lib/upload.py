@@ -0,0 +1,66 @@
+import hashlib
+import os
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+
+
+@dataclass
+class PersistedUpload:
+    path: Path
+    sha256: str
+    bytes_written: int
+    max_buffered_bytes: int
+    peak_rss_bytes: int | None
+
+
+def peak_rss_bytes() -> int | None:
+    """Return the process's peak resident set size, if the OS reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def persist_upload(
+    uploaded_file, destination: Path, chunk_size: int = UPLOAD_CHUNK_BYTES
+) -> PersistedUpload:
+    """Copy an upload to disk in fixed-size chunks, hashing it on the way.
+
+    At most one chunk is held at a time, and the file only appears under its
+    final name once it is complete.
+    """
+    destination = Path(destination)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    partial = destination.with_name(f".{destination.name}.part")
+
+    digest = hashlib.sha256()
+    written = 0
+    max_buffered = 0
+
+    uploaded_file.seek(0)
+    with open(partial, "wb") as f:
+        while chunk := uploaded_file.read(chunk_size):
+            digest.update(chunk)
+            f.write(chunk)
+            written += len(chunk)
+            max_buffered = max(max_buffered, len(chunk))
+    uploaded_file.seek(0)
+
+    os.replace(partial, destination)
+
+    return PersistedUpload(
+        path=destination,
+        sha256=digest.hexdigest(),
+        bytes_written=written,
+        max_buffered_bytes=max_buffered,
+        peak_rss_bytes=peak_rss_bytes(),
+    )
@@ -0,0 +1,196 @@
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKSPACE_ROOT = "workspaces"
+DEFAULT_MAX_BYTES = 10 * 1024**3
+# Environment variable overriding DEFAULT_MAX_BYTES, in GiB
+MAX_GB_ENV = "WORKSPACE_MAX_GB"
+# Seconds between cleanup passes when nothing asks for one sooner
+CLEANUP_SECONDS = 60.0
+# A workspace used more recently than this is never evicted, so one that is
+# still being filled before its job is queued is left alone.
+MIN_IDLE_SECONDS = 300.0
+# Job parameters that name files or directories the job reads or writes
+PATH_PARAMS = ("video_path", "work_dir", "run_dir")
+
+
+def directory_bytes(path: Path) -> int:
+    total = 0
+    for dir_path, _, file_names in os.walk(path):
+        for file_name in file_names:
+            try:
+                total += os.lstat(os.path.join(dir_path, file_name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+
+def workspace_budget() -> int:
+    """Bytes the workspaces may use: MAX_GB_ENV if set, else DEFAULT_MAX_BYTES."""
+    value = os.environ.get(MAX_GB_ENV, "").strip()
+    if not value:
+        return DEFAULT_MAX_BYTES
+    try:
+        return int(float(value) * 1024**3)
+    except ValueError as e:
+        raise ValueError(f"{MAX_GB_ENV} must be a number of GiB, not {value!r}") from e
+
+
+def job_paths(params: dict) -> list[str]:
+    return [params[key] for key in PATH_PARAMS if params.get(key)]
+
+
+class WorkspaceManager:
+    """One directory per job under root, kept within a disk budget.
+
+    A job keeps every file it writes (upload, audio, transcript, exports and
+    bundle) in its own workspace, so concurrent jobs never share a path. Once
+    the workspaces add up to more than ``max_bytes``, the least recently used
+    ones are deleted until they fit again. Workspaces holding a path returned
+    by ``busy`` (those of queued and running jobs) are never deleted.
+    Directory mtimes record last use, so the order survives restarts.
+
+    Cleanup runs in a background thread once started, every CLEANUP_SECONDS
+    and whenever request_cleanup is called, so no request waits on it.
+    Evictions and failures are logged, and kept in ``evicted`` and ``errors``
+    until notes() hands them on to a job's notes.
+    """
+
+    def __init__(
+        self,
+        root: str | Path = DEFAULT_WORKSPACE_ROOT,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        busy: Callable[[], Iterable[str | Path]] | None = None,
+        min_idle_seconds: float = MIN_IDLE_SECONDS,
+    ):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.busy = busy or (lambda: ())
+        self.min_idle_seconds = min_idle_seconds
+        self.evicted: list[str] = []
+        self.errors: list[str] = []
+        self._lock = threading.Lock()
+        self._notes_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def path(self, name: str) -> Path:
+        return self.root / name
+
+    def owner(self, path: str | Path) -> str | None:
+        """Name of the workspace that path lies in, if any."""
+        try:
+            relative = Path(path).resolve().relative_to(self.root.resolve())
+        except ValueError:
+            return None
+        return relative.parts[0] if relative.parts else None
+
+    def touch(self, *paths: str | Path) -> None:
+        """Mark the workspaces holding paths as just used."""
+        for name in {self.owner(path) for path in paths} - {None}:
+            try:
+                os.utime(self.path(name))
+            except FileNotFoundError:
+                pass
+
+    def usage(self) -> dict[str, int]:
+        """Bytes used by each workspace."""
+        return {
+            entry.name: directory_bytes(Path(entry.path))
+            for entry in os.scandir(self.root)
+            if entry.is_dir()
+        }
+
+    def cleanup(self) -> list[str]:
+        """Evict idle workspaces, least recently used first, until within budget.
+
+        Returns the names of the evicted workspaces.
+        """
+        with self._lock:
+            sizes = self.usage()
+            total = sum(sizes.values())
+            if total <= self.max_bytes:
+                return []
+
+            in_use = {self.owner(path) for path in self.busy()}
+            idle_before = time.time() - self.min_idle_seconds
+            last_used = {}
+            for name in sizes:
+                try:
+                    last_used[name] = self.path(name).stat().st_mtime
+                except FileNotFoundError:
+                    pass
+
+            evicted = []
+            for name in sorted(last_used, key=last_used.get):
+                if total <= self.max_bytes:
+                    break
+                if name in in_use or last_used[name] > idle_before:
+                    continue
+                try:
+                    shutil.rmtree(self.path(name))
+                except OSError as e:
+                    logger.warning("Could not evict workspace %s: %s", name, e)
+                    self._add_error(f"could not evict {name}: {e}")
+                    continue
+                total -= sizes[name]
+                evicted.append(name)
+            if evicted:
+                logger.info("Evicted workspaces: %s", ", ".join(evicted))
+                with self._notes_lock:
+                    self.evicted += evicted
+            return evicted
+
+    def notes(self) -> list[str]:
+        """Run notes on the evictions and failures since the last call."""
+        with self._notes_lock:
+            evicted, self.evicted = self.evicted, []
+            errors, self.errors = self.errors, []
+        notes = []
+        if evicted:
+            notes.append(
+                f"🧹 Evicted {len(evicted)} idle workspaces to stay within the "
+                f"{self.max_bytes / 1024**3:.1f} GiB budget"
+            )
+        notes += [f"⚠️ Workspace cleanup failed: {error}" for error in errors]
+        return notes
+
+    def request_cleanup(self) -> None:
+        self._wakeup.set()
+
+    def start(self) -> "WorkspaceManager":
+        self._thread = threading.Thread(
+            target=self._work, name="workspace-cleanup", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _work(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self.cleanup()
+            except Exception as e:
+                logger.exception("Error cleaning up workspaces")
+                self._add_error(str(e))
+            self._wakeup.wait(CLEANUP_SECONDS)
+            self._wakeup.clear()
+
+    def _add_error(self, error: str) -> None:
+        with self._notes_lock:
+            self.errors.append(error)
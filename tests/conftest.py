@@ -1,6 +1,61 @@
+import subprocess
 import sys
 from pathlib import Path
 
+import pytest
+from moviepy.config import FFMPEG_BINARY
+
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def count_video_packets(path: Path) -> int:
+    out = subprocess.run(
+        [FFMPEG_BINARY, "-i", str(path), "-map", "0:v", "-c", "copy", "-f", "framecrc", "-"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return sum(1 for line in out.splitlines() if line and not line.startswith("#"))
+
+
+def decode_errors(path: Path) -> str:
+    """What ffmpeg complains about while decoding every stream of path."""
+    return subprocess.run(
+        [FFMPEG_BINARY, "-v", "error", "-i", str(path), "-f", "null", "-"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+
+
+def make_source(path: Path, rate: int) -> Path:
+    """12 s of test pattern and tone, with a keyframe every 2 s."""
+    subprocess.run(
+        [
+            FFMPEG_BINARY,
+            "-y",
+            "-f", "lavfi", "-i", f"testsrc=size=160x120:rate={rate}",
+            "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=22050",
+            "-t", "12",
+            "-c:v", "libx264", "-pix_fmt", "yuv420p", "-g", str(rate * 2),
+            "-c:a", "aac",
+            "-shortest",
+            str(path),
+        ],
+        capture_output=True,
+        check=True,
+    )
+    return path
+
+
+@pytest.fixture(scope="session")
+def source_video(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    return make_source(tmp_path_factory.mktemp("media") / "source.mp4", 25)
+
+
+@pytest.fixture(scope="session")
+def source_video_30fps(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    # 25 fps is ffmpeg's fallback rate, so it cannot show a rate being lost
+    return make_source(tmp_path_factory.mktemp("media") / "source_30fps.mp4", 30)
@@ -0,0 +1,70 @@
+import subprocess
+from pathlib import Path
+
+import numpy as np
+import pytest
+from moviepy.config import FFMPEG_BINARY
+
+from lib import audio_analysis
+from lib.audio_analysis import analyze_audio, compute_envelope, find_gaps
+from lib.render_plan import bound_edit
+
+
+def test_compute_envelope_and_find_gaps() -> None:
+    rate = 8000
+    t = np.arange(rate * 3) / rate
+    tone = (0.5 * np.sin(2 * np.pi * 440 * t) * 32767).astype(np.int16)
+    # Silent from 1.0s to 1.5s
+    tone[rate : rate + rate // 2] = 0
+
+    rms_db = compute_envelope(tone, rate, hop_seconds=0.02)
+
+    assert len(rms_db) == 150
+    assert rms_db[0] == pytest.approx(20 * np.log10(0.5 / np.sqrt(2)), abs=0.1)
+    starts, ends = find_gaps(rms_db, hop_seconds=0.02)
+    assert starts == pytest.approx([1.0])
+    assert ends == pytest.approx([1.5])
+
+
+@pytest.fixture(scope="module")
+def paused_video(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    path = tmp_path_factory.mktemp("media") / "paused.mp4"
+    # Tone with a 1s pause every 5s: quiet over [4, 5), [9, 10), [14, 15)
+    subprocess.run(
+        [
+            FFMPEG_BINARY,
+            "-y",
+            "-f", "lavfi", "-i", "color=size=64x48:rate=10",
+            "-f", "lavfi",
+            "-i", "aevalsrc='if(lt(mod(t,5),4),0.5*sin(2*PI*440*t),0)':s=16000",
+            "-t", "15",
+            "-c:v", "libx264", "-c:a", "aac",
+            str(path),
+        ],
+        capture_output=True,
+        check=True,
+    )
+    return path
+
+
+def test_analyze_audio_snaps_to_pauses_and_caches(
+    monkeypatch: pytest.MonkeyPatch, paused_video: Path
+) -> None:
+    envelope = analyze_audio(str(paused_video))
+
+    assert envelope.gap_starts == pytest.approx([4.0, 9.0, 14.0], abs=0.06)
+    # Start snaps back to just before speech resumes, end to just after it stops
+    assert envelope.snap_start(5.8) == pytest.approx(4.9, abs=0.06)
+    assert envelope.snap_end(8.2) == pytest.approx(9.1, abs=0.06)
+    # Nothing quiet nearby: no snap
+    assert envelope.snap_start(2.5) is None
+
+    assert bound_edit(5.8, 8.2, 15.0, envelope) == pytest.approx((4.9, 9.1), abs=0.06)
+    assert bound_edit(2.5, 8.2, 15.0, envelope) == pytest.approx((0.5, 9.1), abs=0.06)
+    assert bound_edit(5.8, 8.2, 15.0) == (3.8, 10.2)
+
+    def no_decode(*_, **__):
+        raise AssertionError("audio should be decoded once per source")
+
+    monkeypatch.setattr(audio_analysis.subprocess, "Popen", no_decode)
+    assert analyze_audio(str(paused_video)) is envelope
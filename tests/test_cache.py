@@ -0,0 +1,56 @@
+from pathlib import Path
+
+from lib.cache import ArtifactCache, hash_file, hash_text, llm_result_key
+
+
+def write(path: Path, size: int) -> Path:
+    path.write_bytes(b"x" * size)
+    return path
+
+
+def test_artifact_cache_hits_and_misses(tmp_path: Path) -> None:
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    audio = write(tmp_path / "audio.mp3", 10)
+
+    assert cache.get("audio", "abc") is None
+    cached = cache.put("audio", "abc", str(audio))
+
+    assert cache.get("audio", "abc") == cached
+    assert cached.read_bytes() == audio.read_bytes()
+    assert cache.stats()["hits"] == {"audio": 1}
+    assert cache.stats()["misses"] == {"audio": 1}
+
+
+def test_artifact_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    cache = ArtifactCache(str(tmp_path / "cache"), max_bytes=25)
+    src = write(tmp_path / "blob.bin", 10)
+
+    cache.put("audio", "first", str(src))
+    cache.put("audio", "second", str(src))
+    cache.get("audio", "first")
+    cache.put("audio", "third", str(src))
+
+    assert cache.get("audio", "second") is None
+    assert cache.get("audio", "first") is not None
+    assert cache.get("audio", "third") is not None
+    assert cache.total_bytes == 20
+
+
+def test_artifact_cache_index_survives_restart(tmp_path: Path) -> None:
+    src = write(tmp_path / "transcript.json", 4)
+    ArtifactCache(str(tmp_path / "cache")).put("transcript", "key", str(src))
+
+    reopened = ArtifactCache(str(tmp_path / "cache"))
+
+    assert reopened.get("transcript", "key") is not None
+
+
+def test_llm_result_key_changes_with_prompt_and_model(tmp_path: Path) -> None:
+    transcript = write(tmp_path / "t.json", 3)
+    transcript_hash = hash_file(str(transcript))
+
+    base = llm_result_key(transcript_hash, hash_text("prompt"), "gpt-5.1")
+
+    assert base == llm_result_key(transcript_hash, hash_text("prompt"), "gpt-5.1")
+    assert base != llm_result_key(transcript_hash, hash_text("prompt!"), "gpt-5.1")
+    assert base != llm_result_key(transcript_hash, hash_text("prompt"), "other")
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import cli
+from lib.probe import MediaInfo
+
+
+def test_find_videos_in_directory_and_manifest(tmp_path: Path) -> None:
+    videos = tmp_path / "videos"
+    videos.mkdir()
+    for name in ("b.mp4", "a.MOV", "notes.txt"):
+        (videos / name).write_bytes(b"")
+
+    assert [path.name for path in cli.find_videos(videos)] == ["a.MOV", "b.mp4"]
+
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("# backlog\nvideos/b.mp4\n\n/abs/c.mp4\n")
+    assert cli.find_videos(manifest) == [
+        (videos / "b.mp4").resolve(),
+        Path("/abs/c.mp4"),
+    ]
+
+
+def fake_stages(monkeypatch: pytest.MonkeyPatch, calls: list, fail_llm: set[str]):
+    """Replace every stage with one that writes a placeholder output."""
+
+    def convert(video_path: str, audio_path: str) -> int:
+        calls.append(("audio_extraction", Path(video_path).name))
+        Path(audio_path).write_bytes(b"audio")
+        return 5
+
+    async def transcribe(audio_path: str) -> Path:
+        calls.append(("transcription", Path(audio_path).parent.name))
+        path = Path(audio_path).with_suffix(".json")
+        path.write_text(json.dumps({"words": []}))
+        return path
+
+    async def pick_edits(transcript_path: str, prompt: str, edits_path: str):
+        name = Path(transcript_path).parent.name
+        calls.append(("llm", name))
+        if not any(name.startswith(stem) for stem in fail_llm):
+            Path(edits_path).write_text("[]")
+
+    async def cut(video_path: str, edits, exports_dir: Path, **_) -> list[str]:
+        calls.append(("cutting", Path(video_path).name))
+        exports_dir.mkdir(parents=True, exist_ok=True)
+        clip = exports_dir / "segment_001.mp4"
+        clip.write_bytes(b"clip")
+        return [str(clip)]
+
+    monkeypatch.setattr(cli, "convert_video_to_audio", convert)
+    monkeypatch.setattr(cli, "transcribe_audio_chunked", transcribe)
+    monkeypatch.setattr(cli, "process_transcription_with_llm", pick_edits)
+    monkeypatch.setattr(cli, "cut_video_segments", cut)
+    monkeypatch.setattr(
+        cli,
+        "probe_media",
+        lambda path, content_hash=None: MediaInfo(str(path), 60.0, None, ()),
+    )
+
+
+def test_batch_resumes_from_recorded_stages(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    videos = tmp_path / "videos"
+    videos.mkdir()
+    for name in ("a.mp4", "b.mp4"):
+        (videos / name).write_bytes(b"")
+    calls: list[tuple[str, str]] = []
+    fake_stages(monkeypatch, calls, fail_llm={"b_"})
+    args = cli.parse_args([str(videos), "--output", str(tmp_path / "out")])
+
+    summary = asyncio.run(cli.run_batch(cli.find_videos(videos), "PROMPT", args))
+
+    assert (summary["processed"], summary["failed"]) == (1, 1)
+    assert summary["audio_minutes"] == 1.0
+    progress = json.loads((tmp_path / "out" / "progress.json").read_text())
+    failed = progress[str((videos / "b.mp4").resolve())]
+    assert failed["error"].startswith("llm:")
+    assert list(failed["stages"]) == ["audio_extraction", "transcription"]
+
+    # The rerun only repeats what b did not finish
+    calls.clear()
+    fake_stages(monkeypatch, calls, fail_llm=set())
+    summary = asyncio.run(cli.run_batch(cli.find_videos(videos), "PROMPT", args))
+
+    assert (summary["processed"], summary["skipped"]) == (1, 1)
+    assert [stage for stage, _ in calls] == ["llm", "cutting"]
+    assert set(summary["stage_seconds"]) == set(cli.STAGES)
+
+
+def test_batch_limits_each_stage(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    videos = [tmp_path / f"v{n}.mp4" for n in range(4)]
+    for video in videos:
+        video.write_bytes(b"")
+    fake_stages(monkeypatch, [], fail_llm=set())
+    running, peak = 0, 0
+
+    async def transcribe(audio_path: str) -> Path:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        path = Path(audio_path).with_suffix(".json")
+        path.write_text(json.dumps({"words": []}))
+        return path
+
+    monkeypatch.setattr(cli, "transcribe_audio_chunked", transcribe)
+    args = cli.parse_args(
+        [str(tmp_path), "--output", str(tmp_path / "out"), "--transcribe-workers", "2"]
+    )
+
+    summary = asyncio.run(cli.run_batch(videos, "PROMPT", args))
+
+    assert summary["processed"] == 4
+    assert peak == 2
+
+
+def test_parse_args_checks_formats_and_snap(
+    capsys: pytest.CaptureFixture[str], tmp_path: Path
+) -> None:
+    videos = str(tmp_path)
+    args = cli.parse_args([videos, "--formats", "original,square", "--no-snap"])
+    assert (args.formats, args.snap) == (["original", "square"], False)
+    assert cli.parse_args([videos]).snap is True
+
+    with pytest.raises(SystemExit):
+        cli.parse_args([videos, "--formats", "original,portrait"])
+    assert "unknown output formats: portrait" in capsys.readouterr().err
+
+    with pytest.raises(SystemExit):
+        cli.parse_args([str(tmp_path / "missing.txt")])
+    assert "missing.txt does not exist" in capsys.readouterr().err
+
+
+def test_batch_reruns_later_stages_when_the_prompt_changes(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    videos = tmp_path / "videos"
+    videos.mkdir()
+    (videos / "a.mp4").write_bytes(b"")
+    calls: list[tuple[str, str]] = []
+    fake_stages(monkeypatch, calls, fail_llm=set())
+    args = cli.parse_args([str(videos), "--output", str(tmp_path / "out")])
+    asyncio.run(cli.run_batch(cli.find_videos(videos), "PROMPT", args))
+    clips = next((tmp_path / "out").glob("a_*")) / "clips"
+    (clips / "stale.mp4").write_bytes(b"old")
+
+    calls.clear()
+    summary = asyncio.run(cli.run_batch(cli.find_videos(videos), "PROMPT", args))
+    assert (summary["skipped"], calls) == (1, [])
+
+    summary = asyncio.run(cli.run_batch(cli.find_videos(videos), "NEW PROMPT", args))
+
+    assert summary["processed"] == 1
+    assert [stage for stage, _ in calls] == ["llm", "cutting"]
+    assert set(summary["stage_seconds"]) == set(cli.STAGES)
+    assert summary["stage_seconds"]["bundling"] > 0
+    assert [path.name for path in clips.iterdir()] == ["segment_001.mp4"]
+
+
+def test_cli_does_not_import_streamlit() -> None:
+    root = Path(__file__).resolve().parents[1]
+    imported = subprocess.run(
+        [sys.executable, "-c", "import sys, cli; print('streamlit' in sys.modules)"],
+        cwd=root,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert imported.stdout.strip() == "False"
@@ -0,0 +1,81 @@
+import asyncio
+import subprocess
+from pathlib import Path
+
+import pytest
+from moviepy.config import FFMPEG_BINARY
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+from lib.convert import (
+    WHISPER_MAX_BYTES,
+    convert_video_to_audio,
+    extract_audio_chunks,
+    pick_speech_bitrate,
+)
+
+
+@pytest.mark.parametrize(
+    "duration, expected_kbps",
+    [(60, 48), (3600, 48), (2 * 3600, 24), (3 * 3600, 16), (10 * 3600, 16)],
+)
+def test_pick_speech_bitrate(duration: float, expected_kbps: int) -> None:
+    assert pick_speech_bitrate(duration) == expected_kbps
+    if duration <= 3 * 3600:
+        assert expected_kbps * 1000 / 8 * duration < WHISPER_MAX_BYTES
+
+
+def test_convert_video_to_audio_writes_speech_mp3(
+    source_video: Path, tmp_path: Path
+) -> None:
+    output = tmp_path / "audio.mp3"
+
+    written = convert_video_to_audio(str(source_video), str(output))
+
+    infos = ffmpeg_parse_infos(str(output))
+    assert written == output.stat().st_size
+    assert not infos["video_found"]
+    assert infos["audio_fps"] == 16000
+    assert infos["duration"] == pytest.approx(12.0, abs=0.25)
+
+
+def test_convert_video_to_audio_rejects_silent_video(tmp_path: Path) -> None:
+    video = tmp_path / "silent.mp4"
+    subprocess.run(
+        [
+            FFMPEG_BINARY,
+            "-y",
+            "-f", "lavfi", "-i", "testsrc=size=64x64:rate=5",
+            "-t", "1",
+            str(video),
+        ],
+        capture_output=True,
+        check=True,
+    )
+
+    with pytest.raises(ValueError):
+        convert_video_to_audio(str(video), str(tmp_path / "audio.mp3"))
+
+
+def test_extract_audio_chunks_yields_chunks_in_order(
+    source_video: Path, tmp_path: Path
+) -> None:
+    async def collect():
+        return [
+            chunk
+            async for chunk in extract_audio_chunks(
+                str(source_video), str(tmp_path / "chunks"), chunk_seconds=5
+            )
+        ]
+
+    chunks = asyncio.run(collect())
+
+    assert len(chunks) >= 3
+    assert chunks[0][1] == 0.0
+    for (_, _, end), (_, next_start, _) in zip(chunks, chunks[1:]):
+        assert next_start == pytest.approx(end)
+    assert chunks[-1][2] == pytest.approx(12.0, abs=0.25)
+    for path, start, end in chunks:
+        assert path.exists()
+        assert ffmpeg_parse_infos(str(path))["duration"] == pytest.approx(
+            end - start, abs=0.1
+        )
@@ -1,10 +1,16 @@
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pytest
 
-from lib import cut_video
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+from conftest import count_video_packets, decode_errors
+from lib import cut_video, render_backend
 from lib.llm import VideoEdit
+from lib.probe import MediaInfo, probe_media
+from lib.reel import concat_segments, reencode_reason
 
 
 class FakeSegment:
@@ -19,6 +25,9 @@ class FakeSegment:
         path_obj.write_bytes(b"segment")
         self.write_calls.append(path)
 
+    def close(self) -> None:
+        pass
+
 
 class FakeClip:
     def __init__(self, duration: float):
@@ -36,14 +45,8 @@ class FakeClip:
         pass
 
 
-class CombinedClip:
-    def __init__(self, clips: list[FakeSegment]):
-        self.clips = clips
-        self.write_calls: list[str] = []
-
-    def write_videofile(self, path: str, **_: object) -> None:
-        Path(path).write_bytes(b"final")
-        self.write_calls.append(path)
+def fake_probe(duration: float):
+    return lambda path, content_hash=None: MediaInfo(str(path), duration, None, ())
 
 
 @pytest.mark.parametrize(
@@ -62,26 +65,26 @@ def test_cut_video_segments_exports_segments(
     expected_range: tuple[float, float],
 ) -> None:
     fake_clip = FakeClip(duration)
-    concat_calls: list[list[tuple[float, float]]] = []
-    combined_holder: dict[str, CombinedClip] = {}
+    concat_calls: list[list[str]] = []
 
     def fake_video_file_clip(_: str) -> FakeClip:
         return fake_clip
 
-    def fake_concatenate(clips: list[FakeSegment]) -> CombinedClip:
-        concat_calls.append([(c.start, c.end) for c in clips])
-        combined = CombinedClip(clips)
-        combined_holder["clip"] = combined
-        return combined
+    def fake_concat(paths: list[str], output_path: Path) -> str:
+        concat_calls.append(paths)
+        return str(output_path)
 
-    monkeypatch.setattr(cut_video, "VideoFileClip", fake_video_file_clip)
-    monkeypatch.setattr(cut_video, "concatenate_videoclips", fake_concatenate)
+    monkeypatch.setattr(cut_video, "probe_media", fake_probe(duration))
+    monkeypatch.setattr(render_backend, "VideoFileClip", fake_video_file_clip)
+    monkeypatch.setattr(cut_video, "concat_segments", fake_concat)
     monkeypatch.chdir(tmp_path)
 
     edits = [VideoEdit(start=start, end=end, targeted_script_snippet="line")]  # type: ignore[arg-type]
 
-    output_path = asyncio.run(
-        cut_video.cut_video_segments(str(tmp_path / "video.mp4"), edits)
+    exported = asyncio.run(
+        cut_video.cut_video_segments(
+            str(tmp_path / "video.mp4"), edits, backend="moviepy"
+        )
     )
 
     assert fake_clip.subclip_calls == [expected_range]
@@ -90,11 +93,11 @@ def test_cut_video_segments_exports_segments(
         f"segment_001_{expected_range[0]:.1f}s-{expected_range[1]:.1f}s.mp4"
     )
     segment_path = tmp_path / "exports" / expected_segment_name
+    assert exported == [str(Path("exports") / expected_segment_name)]
     assert segment_path.exists()
 
-    assert concat_calls == [[expected_range]]
-    assert combined_holder["clip"].write_calls == [output_path]
-    assert Path(output_path).exists()
+    # A single segment already is the reel
+    assert concat_calls == []
 
     with open(segment_path, "rb") as fh:
         assert fh.read() == b"segment"
@@ -112,19 +115,226 @@ def test_cut_video_segments_accepts_result_wrapper(
     def fake_video_file_clip(_: str) -> FakeClip:
         return fake_clip
 
-    def fake_concatenate(clips: list[FakeSegment]) -> CombinedClip:
-        return CombinedClip(clips)
-
-    monkeypatch.setattr(cut_video, "VideoFileClip", fake_video_file_clip)
-    monkeypatch.setattr(cut_video, "concatenate_videoclips", fake_concatenate)
+    monkeypatch.setattr(cut_video, "probe_media", fake_probe(8.0))
+    monkeypatch.setattr(render_backend, "VideoFileClip", fake_video_file_clip)
     monkeypatch.chdir(tmp_path)
 
     edits = [VideoEdit(start=2, end=4, targeted_script_snippet="line")]  # type: ignore[arg-type]
     wrapped = Wrapped(edits)
 
-    asyncio.run(cut_video.cut_video_segments(str(tmp_path / "video.mp4"), wrapped))
+    asyncio.run(
+        cut_video.cut_video_segments(
+            str(tmp_path / "video.mp4"), wrapped, backend="moviepy"
+        )
+    )
 
     assert fake_clip.subclip_calls == [(0, 6)]
 
     expected_segment = tmp_path / "exports" / "segment_001_0.0s-6.0s.mp4"
     assert expected_segment.exists()
+
+
+@pytest.mark.parametrize(
+    "workers, segment_count, cpu_count, expected",
+    [
+        (1, 5, 8, (1, 8)),
+        (4, 20, 8, (4, 2)),
+        (None, 20, 8, (8, 1)),
+        (16, 3, 8, (3, 2)),
+        (4, 0, 8, (1, 8)),
+        (4, None, 8, (4, 2)),
+        (None, None, 8, (8, 1)),
+    ],
+)
+def test_plan_worker_threads(
+    workers: int | None,
+    segment_count: int | None,
+    cpu_count: int,
+    expected: tuple[int, int],
+) -> None:
+    assert cut_video.plan_worker_threads(workers, segment_count, cpu_count) == expected
+
+
+def test_cut_video_segments_parallel_keeps_edit_order(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    clips: list[FakeClip] = []
+
+    def fake_video_file_clip(_: str) -> FakeClip:
+        clips.append(FakeClip(duration=60.0))
+        return clips[-1]
+
+    class InlinePool(ThreadPoolExecutor):
+        def __init__(self, max_workers: int, mp_context: object) -> None:
+            super().__init__(max_workers=max_workers)
+
+    monkeypatch.setattr(cut_video, "probe_media", fake_probe(60.0))
+    monkeypatch.setattr(render_backend, "VideoFileClip", fake_video_file_clip)
+    monkeypatch.setattr(cut_video, "ProcessPoolExecutor", InlinePool)
+    monkeypatch.setattr(
+        cut_video, "concat_segments", lambda paths, output, profile=None: None
+    )
+    monkeypatch.setattr(cut_video.os, "cpu_count", lambda: 4)
+    monkeypatch.chdir(tmp_path)
+
+    edits = [
+        VideoEdit(start=s, end=s + 5, targeted_script_snippet="line")
+        for s in (40, 10, 25)
+    ]
+
+    asyncio.run(
+        cut_video.cut_video_segments(
+            str(tmp_path / "video.mp4"), edits, workers=3, backend="moviepy"
+        )
+    )
+
+    # planning only reads headers; each worker task opens its own reader
+    assert len(clips) == 3
+    assert sorted(p.name for p in (tmp_path / "exports").iterdir()) == [
+        "segment_001_8.0s-17.0s.mp4",
+        "segment_002_23.0s-32.0s.mp4",
+        "segment_003_38.0s-47.0s.mp4",
+    ]
+
+
+def test_cut_video_segments_encodes_overlapping_edits_once(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    fake_clip = FakeClip(duration=60.0)
+    reels: list[tuple[list[str], Path]] = []
+    monkeypatch.setattr(cut_video, "probe_media", fake_probe(60.0))
+    monkeypatch.setattr(render_backend, "VideoFileClip", lambda _: fake_clip)
+    monkeypatch.setattr(
+        cut_video,
+        "concat_segments",
+        lambda paths, output, profile=None: reels.append((paths, output)),
+    )
+    monkeypatch.chdir(tmp_path)
+
+    edits = [
+        VideoEdit(start=s, end=e, targeted_script_snippet="line")
+        for s, e in ((10, 15), (14, 20), (40, 45))
+    ]
+
+    exported = asyncio.run(
+        cut_video.cut_video_segments(
+            str(tmp_path / "video.mp4"), edits, backend="moviepy"
+        )
+    )
+
+    assert fake_clip.subclip_calls == [(8, 22), (38, 47)]
+    assert [Path(p).name for p in exported] == [
+        "segment_001_8.0s-22.0s.mp4",
+        "segment_002_38.0s-47.0s.mp4",
+    ]
+    assert reels == [(exported, Path("exports") / "highlight_reel.mp4")]
+
+
+@pytest.mark.parametrize(
+    "merge, merge_gap, expected_calls",
+    [
+        (False, 0.0, [(8, 17), (12, 22), (38, 47)]),
+        (True, 20.0, [(8, 47)]),
+    ],
+)
+def test_cut_video_segments_passes_merge_options_to_the_plan(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    merge: bool,
+    merge_gap: float,
+    expected_calls: list[tuple[float, float]],
+) -> None:
+    fake_clip = FakeClip(duration=60.0)
+    monkeypatch.setattr(cut_video, "probe_media", fake_probe(60.0))
+    monkeypatch.setattr(render_backend, "VideoFileClip", lambda _: fake_clip)
+    monkeypatch.setattr(
+        cut_video, "concat_segments", lambda paths, output, profile=None: None
+    )
+    monkeypatch.chdir(tmp_path)
+
+    edits = [
+        VideoEdit(start=s, end=e, targeted_script_snippet="line")
+        for s, e in ((10, 15), (14, 20), (40, 45))
+    ]
+
+    asyncio.run(
+        cut_video.cut_video_segments(
+            str(tmp_path / "video.mp4"),
+            edits,
+            backend="moviepy",
+            merge=merge,
+            merge_gap=merge_gap,
+        )
+    )
+
+    assert fake_clip.subclip_calls == expected_calls
+
+
+def test_highlight_reel_joins_segments_from_every_cut_mode(
+    tmp_path: Path, source_video: Path
+) -> None:
+    smart = asyncio.run(
+        cut_video.cut_video_segments(
+            str(source_video),
+            [{"start": 3, "end": 4}],
+            mode="smart",
+            exports_dir=tmp_path / "smart",
+            temp_dir=tmp_path / "temp",
+        )
+    )
+    reencoded = asyncio.run(
+        cut_video.cut_video_segments(
+            str(source_video),
+            [{"start": 8, "end": 9}],
+            mode="reencode",
+            exports_dir=tmp_path / "reencode",
+            temp_dir=tmp_path / "temp",
+        )
+    )
+    segments = smart + reencoded
+    assert reencode_reason(segments) is None
+
+    reel = concat_segments(segments, tmp_path / "reel.mp4")
+
+    assert reel == str(tmp_path / "reel.mp4")
+    assert count_video_packets(Path(reel)) == sum(
+        count_video_packets(Path(p)) for p in segments
+    )
+    infos = ffmpeg_parse_infos(reel)
+    assert infos["duration"] == pytest.approx(10.0, abs=0.2)
+    assert infos["audio_fps"] == 44100
+    assert decode_errors(Path(reel)) == ""
+
+
+def test_highlight_reel_reencodes_segments_that_differ(
+    tmp_path: Path, source_video: Path, source_video_30fps: Path
+) -> None:
+    smart = asyncio.run(
+        cut_video.cut_video_segments(
+            str(source_video_30fps),
+            [{"start": 3, "end": 4}],
+            mode="smart",
+            exports_dir=tmp_path / "smart",
+            temp_dir=tmp_path / "temp",
+        )
+    )
+    reencoded = asyncio.run(
+        cut_video.cut_video_segments(
+            str(source_video),
+            [{"start": 8, "end": 9}],
+            mode="reencode",
+            exports_dir=tmp_path / "reencode",
+            temp_dir=tmp_path / "temp",
+        )
+    )
+    segments = smart + reencoded
+    assert "base_fps" in reencode_reason(segments)
+
+    reel = concat_segments(segments, tmp_path / "reel.mp4", "preview")
+
+    media = probe_media(reel)
+    assert media.base_fps == 30
+    assert media.duration == pytest.approx(
+        sum(probe_media(path).duration for path in segments), abs=0.2
+    )
+    assert decode_errors(Path(reel)) == ""
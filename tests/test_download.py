@@ -0,0 +1,53 @@
+import asyncio
+import io
+import zipfile
+from pathlib import Path
+
+from lib.download import iter_zip_stream, zip_and_download_files
+
+
+def make_runs(exports: Path) -> Path:
+    old_run = exports / "run_old"
+    old_run.mkdir(parents=True)
+    (old_run / "segment_001.mp4").write_bytes(b"old" * 1000)
+
+    run = exports / "run_new"
+    (run / "clips").mkdir(parents=True)
+    (run / "segment_001.mp4").write_bytes(bytes(range(256)) * 400)
+    (run / "clips" / "segment_002.mp4").write_bytes(b"\x01" * 5000)
+    (run / "edits.json").write_text('{"edits": []}' * 100)
+    return run
+
+
+def test_iter_zip_stream_bundles_one_run(tmp_path: Path) -> None:
+    run = make_runs(tmp_path / "exports")
+
+    pieces = list(iter_zip_stream(str(run), chunk_size=4096))
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(pieces)))
+
+    assert archive.namelist() == [
+        "clips/segment_002.mp4",
+        "edits.json",
+        "segment_001.mp4",
+    ]
+    assert archive.testzip() is None
+    assert archive.read("segment_001.mp4") == (run / "segment_001.mp4").read_bytes()
+    assert archive.getinfo("segment_001.mp4").compress_type == zipfile.ZIP_STORED
+    assert archive.getinfo("edits.json").compress_type == zipfile.ZIP_DEFLATED
+
+    # Output is handed over as it is produced rather than held until the end
+    assert len(pieces) > 3
+    assert max(len(piece) for piece in pieces) < 4096 + 1024
+
+
+def test_zip_and_download_files_names_zip_after_run(tmp_path: Path) -> None:
+    run = make_runs(tmp_path / "exports")
+    temp_dir = tmp_path / "temp"
+    temp_dir.mkdir()
+
+    zip_path = asyncio.run(zip_and_download_files(str(run), str(temp_dir)))
+
+    assert Path(zip_path) == temp_dir / "run_new.zip"
+    with zipfile.ZipFile(zip_path) as archive:
+        assert "segment_001.mp4" in archive.namelist()
+        assert not any("old" in name for name in archive.namelist())
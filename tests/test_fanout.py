@@ -0,0 +1,36 @@
+from pathlib import Path
+
+from moviepy import VideoFileClip
+
+from conftest import count_video_packets
+from lib.fanout import fanout_export_segments, group_overlapping
+
+
+def test_group_overlapping_merges_overlapping_and_touching() -> None:
+    a, b, c, d = (Path(name) for name in "abcd")
+    segments = [(8.0, 10.0, c), (0.0, 4.0, a), (3.0, 6.0, b), (10.0, 12.0, d)]
+
+    assert group_overlapping(segments) == [
+        [(0.0, 4.0, a), (3.0, 6.0, b)],
+        [(8.0, 10.0, c), (10.0, 12.0, d)],
+    ]
+
+
+def test_fanout_export_segments_writes_every_segment(
+    source_video: Path, tmp_path: Path
+) -> None:
+    segments = [
+        (1.0, 4.0, tmp_path / "a.mp4"),
+        (2.0, 6.0, tmp_path / "b.mp4"),
+        (9.0, 10.0, tmp_path / "c.mp4"),
+    ]
+
+    clip = VideoFileClip(str(source_video))
+    try:
+        exported = fanout_export_segments(clip, segments, str(tmp_path / "temp"))
+    finally:
+        clip.close()
+
+    assert exported == [str(path) for _, _, path in segments]
+    assert [count_video_packets(path) for _, _, path in segments] == [75, 100, 25]
+    assert not list((tmp_path / "temp").iterdir())
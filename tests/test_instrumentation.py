@@ -0,0 +1,107 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+from moviepy.config import FFMPEG_BINARY
+
+from lib import instrumentation
+from lib.cut_video import cut_video_segments
+from lib.instrumentation import MetricsRegistry, RunRecorder
+from lib.openai_client import metrics as api_metrics
+from lib.render_backend import get_backend, run_ffmpeg
+from lib.render_profiles import RENDER_PROFILES
+
+
+def test_stage_records_cost_and_api_calls(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    registry = MetricsRegistry()
+    monkeypatch.setattr(instrumentation, "registry", registry)
+    api_metrics.reset()
+    recorder = RunRecorder("process")
+
+    with recorder.stage("llm") as stage:
+        sum(n * n for n in range(200_000))
+        (tmp_path / "out.bin").write_bytes(b"x" * 100_000)
+        api_metrics.record("/v1/responses", 200, 0.25)
+        api_metrics.record("/v1/responses", 200, 0.5)
+        api_metrics.record_retry()
+        stage.input_tokens = 1200
+
+    assert stage.wall_seconds > 0
+    assert stage.cpu_seconds > 0
+    assert stage.api_requests == 2
+    assert stage.api_seconds == pytest.approx(0.75)
+    assert stage.api_retries == 1
+    if stage.bytes_written is not None:
+        assert stage.bytes_written >= 100_000
+
+    report = json.loads(recorder.write(tmp_path).read_text())
+    assert report["kind"] == "process"
+    assert [s["name"] for s in report["stages"]] == ["llm"]
+
+    text = registry.render()
+    assert 'video_agent_runs_total{kind="process"} 1' in text
+    assert (
+        'video_agent_stage_input_tokens_total{kind="process",stage="llm"} 1200' in text
+    )
+    assert "# TYPE video_agent_stage_wall_seconds_total counter" in text
+    assert registry.write(tmp_path / "metrics.prom").read_text() == text
+
+
+def test_ffmpeg_backend_reports_encoder_progress(
+    tmp_path: Path, source_video: Path
+) -> None:
+    seen: list[float] = []
+
+    get_backend("ffmpeg").render_segments(
+        str(source_video),
+        [(1.0, 4.0, tmp_path / "a.mp4"), (6.0, 8.0, tmp_path / "b.mp4")],
+        RENDER_PROFILES["preview"],
+        on_progress=seen.append,
+    )
+
+    assert seen == sorted(seen)
+    # Each segment reports at least its encoder's final time
+    assert 3.0 in seen
+    assert seen[-1] == pytest.approx(5.0)
+
+
+def test_run_ffmpeg_parses_encoder_output_time(source_video: Path) -> None:
+    seen: list[float] = []
+
+    run_ffmpeg(
+        [FFMPEG_BINARY, "-stats_period", "0.01", "-i", str(source_video)]
+        + ["-f", "null", "-"],
+        seen.append,
+    )
+
+    assert len(seen) > 1
+    assert seen[-1] == pytest.approx(12.0, abs=0.1)
+    with pytest.raises(IOError):
+        run_ffmpeg([FFMPEG_BINARY, "-i", "missing.mp4", "-f", "null", "-"], seen.append)
+
+
+@pytest.mark.parametrize("mode", ["smart", "reencode"])
+def test_cut_progress_ends_at_the_plan_length(
+    tmp_path: Path, source_video: Path, mode: str
+) -> None:
+    seen: list[tuple[float, float]] = []
+
+    asyncio.run(
+        cut_video_segments(
+            str(source_video),
+            [{"start": 3, "end": 4}, {"start": 9, "end": 10}],
+            mode=mode,
+            exports_dir=tmp_path / "exports",
+            temp_dir=tmp_path / "temp",
+            reel=False,
+            progress=lambda done, total: seen.append((done, total)),
+        )
+    )
+
+    done = [d for d, _ in seen]
+    assert done == sorted(done)
+    # 1-6s and 7-12s after padding
+    assert seen[-1] == pytest.approx((10.0, 10.0))
@@ -0,0 +1,151 @@
+import asyncio
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from lib.jobs import (
+    DONE,
+    FAILED,
+    QUEUED,
+    RUNNING,
+    JobQueue,
+    JobStore,
+    QueueFullError,
+    plan_job_workers,
+)
+
+GIB = 1024**3
+
+
+@pytest.mark.parametrize(
+    "cpu_count, memory_bytes, expected",
+    [
+        (8, 64 * GIB, 4),  # two cores per job
+        (8, 5 * GIB, 2),  # memory bound
+        (1, 1 * GIB, 1),  # always at least one
+    ],
+)
+def test_plan_job_workers(cpu_count: int, memory_bytes: int, expected: int) -> None:
+    assert plan_job_workers(cpu_count, memory_bytes, job_memory=2 * GIB) == expected
+
+
+def exited_process_owner() -> str:
+    """An owner on this host whose process has exited."""
+    child = subprocess.run(
+        [sys.executable, "-c", "import os; print(os.getpid())"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return f"{socket.gethostname()}:{int(child.stdout)}:gone"
+
+
+def test_store_claims_in_submission_order_and_persists(tmp_path: Path) -> None:
+    db_path = str(tmp_path / "jobs.db")
+    # Stands in for a server process that has since exited
+    store = JobStore(db_path, owner=exited_process_owner())
+    first = store.submit("cut", {"n": 1})
+    second = store.submit("cut", {"n": 2})
+
+    assert store.queued_ahead(second) == 1
+
+    claimed = store.claim_next()
+    assert claimed.id == first
+    assert claimed.params == {"n": 1}
+
+    # A second store on the same file sees the same jobs
+    reopened = JobStore(db_path)
+    assert reopened.get(first).status == RUNNING
+    assert reopened.get(second).status == QUEUED
+    assert reopened.counts() == {QUEUED: 1, RUNNING: 1}
+    assert sorted(job.id for job in reopened.active()) == sorted([first, second])
+    reopened.finish(second, {})
+    assert [job.id for job in reopened.active()] == [first]
+
+    # Restarting the server puts interrupted jobs back in line
+    assert reopened.requeue_interrupted() == 1
+    assert reopened.get(first).status == QUEUED
+
+
+def test_store_leaves_jobs_of_live_processes_running(tmp_path: Path) -> None:
+    db_path = str(tmp_path / "jobs.db")
+    running = JobStore(db_path, owner="other-host:123:live")
+    job_id = running.submit("cut", {})
+    running.claim_next()
+    other = JobStore(db_path)
+
+    # Another server sharing the file does not take over a job still beating
+    assert other.requeue_interrupted() == 0
+    assert other.get(job_id).status == RUNNING
+
+    running.heartbeat()
+    time.sleep(0.05)
+    # Once the heartbeat is stale, its owner is taken to be gone
+    assert other.requeue_interrupted(stale_after=0.01) == 1
+    assert other.get(job_id).status == QUEUED
+
+
+def test_store_rejects_submissions_over_capacity(tmp_path: Path) -> None:
+    store = JobStore(str(tmp_path / "jobs.db"))
+    store.submit("cut", {}, max_pending=2)
+    store.submit("cut", {}, max_pending=2)
+
+    with pytest.raises(QueueFullError):
+        store.submit("cut", {}, max_pending=2)
+    assert store.counts() == {QUEUED: 2}
+
+
+def test_queue_runs_jobs_concurrently_and_records_results(tmp_path: Path) -> None:
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    async def slow(job, report):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        report("Working...", 0.5)
+        await asyncio.sleep(0.2)
+        with lock:
+            running -= 1
+        return {"n": job.params["n"]}
+
+    def broken(job, report):
+        raise ValueError("bad input")
+
+    queue = JobQueue(
+        JobStore(str(tmp_path / "jobs.db")),
+        {"slow": slow, "broken": broken},
+        workers=3,
+    )
+    job_ids = [queue.submit("slow", {"n": n}) for n in range(3)]
+    broken_id = queue.submit("broken", {})
+
+    with pytest.raises(ValueError):
+        queue.submit("missing", {})
+
+    queue.start()
+    try:
+        deadline = time.monotonic() + 10
+        while not all(queue.get(j).finished for j in [*job_ids, broken_id]):
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+    finally:
+        queue.stop(timeout=5)
+
+    assert peak > 1
+    for n, job_id in enumerate(job_ids):
+        job = queue.get(job_id)
+        assert job.status == DONE
+        assert job.result == {"n": n}
+        assert job.progress == 1
+
+    failed = queue.get(broken_id)
+    assert failed.status == FAILED
+    assert failed.error.startswith("bad input")
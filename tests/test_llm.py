@@ -0,0 +1,143 @@
+import asyncio
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from lib import llm
+from lib.llm import (
+    TranscriptBlock,
+    VideoEdit,
+    condense_transcript,
+    estimate_tokens,
+    reduce_edits,
+    window_blocks,
+)
+
+
+def words_from(text: str, start: float = 0.0, step: float = 0.5) -> list[dict]:
+    return [
+        {"word": w, "start": start + i * step, "end": start + i * step + 0.4}
+        for i, w in enumerate(text.split())
+    ]
+
+
+def test_condense_transcript_splits_on_sentences_and_pauses() -> None:
+    words = words_from("Hello there. How are") + words_from("you today", start=10.0)
+
+    blocks = condense_transcript(words)
+
+    assert [(b.start, b.text) for b in blocks] == [
+        (0.0, "Hello there."),
+        (1.0, "How are"),
+        (10.0, "you today"),
+    ]
+    assert blocks[0].render() == "[0.0-0.9] Hello there."
+
+
+def test_window_blocks_respects_token_budget_with_overlap() -> None:
+    blocks = [TranscriptBlock(i, i + 1, "word " * 20) for i in range(30)]
+    per_block = estimate_tokens(blocks[0].render()) + 1
+
+    windows = window_blocks(blocks, token_budget=per_block * 10, overlap_blocks=2)
+
+    assert all(len(w) <= 10 for w in windows)
+    assert windows[1][:2] == windows[0][-2:]
+    assert windows[-1][-1] is blocks[-1]
+
+
+def test_reduce_edits_dedupes_and_ranks() -> None:
+    candidates = [
+        VideoEdit(start=100, end=160, targeted_script_snippet="a"),
+        VideoEdit(start=105, end=150, targeted_script_snippet="a again"),
+        VideoEdit(start=0, end=5, targeted_script_snippet="too short"),
+        VideoEdit(start=300, end=360, targeted_script_snippet="b"),
+    ]
+
+    reduced = reduce_edits(candidates, max_edits=2)
+
+    assert [(e.start, e.end) for e in reduced] == [(100, 160), (300, 360)]
+
+
+def test_process_transcription_with_llm_maps_windows_concurrently(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    sent: list[str] = []
+
+    class FakeRunner:
+        @staticmethod
+        async def run(agent, window_input: str):
+            sent.append(window_input)
+            first = window_input.split("\n[")[1]
+            start = int(float(first.split("-")[0]))
+            return SimpleNamespace(
+                final_output=[
+                    VideoEdit(start=start, end=start + 40, targeted_script_snippet="x")
+                ],
+                context_wrapper=SimpleNamespace(
+                    usage=SimpleNamespace(input_tokens=100, output_tokens=10)
+                ),
+            )
+
+    monkeypatch.setattr(llm, "Runner", FakeRunner)
+
+    words = []
+    for n in range(40):
+        words += words_from(f"Sentence number {n} goes here.", start=n * 5.0)
+    transcript_path = tmp_path / "audio.json"
+    transcript_path.write_text(json.dumps({"words": words}))
+    result_path = tmp_path / "processed_result.json"
+
+    metrics = asyncio.run(
+        llm.process_transcription_with_llm(
+            str(transcript_path), "PROMPT", str(result_path), token_budget=100
+        )
+    )
+
+    assert metrics.windows == len(sent) > 1
+    assert all(text.startswith("PROMPT") for text in sent)
+    assert "Sentence number 0 goes here." in sent[0]
+    assert metrics.input_tokens == 100 * metrics.windows
+    assert metrics.estimated_tokens_sent > 0
+    saved = json.loads(result_path.read_text())
+    assert len(saved) == metrics.edits > 0
+    assert [e["start"] for e in saved] == sorted(e["start"] for e in saved)
+
+
+def test_incremental_edit_parser_emits_edits_as_they_close() -> None:
+    text = json.dumps(
+        {
+            "response": [
+                {"start": 1, "end": 40, "targeted_script_snippet": 'say "{hi}" \\ ok'},
+                {"start": 50, "end": 90, "targeted_script_snippet": "[two]"},
+            ]
+        }
+    )
+    parser = llm.IncrementalEditParser()
+
+    emitted = []
+    for n in range(0, len(text), 7):
+        emitted.append(parser.feed(text[n : n + 7]))
+
+    flat = [edit for batch in emitted for edit in batch]
+    assert [(e.start, e.end) for e in flat] == [(1, 40), (50, 90)]
+    assert flat[0].targeted_script_snippet == 'say "{hi}" \\ ok'
+    # The first edit is available before the text of the second has arrived
+    first_batch = next(n for n, batch in enumerate(emitted) if batch)
+    assert first_batch * 7 < text.index('{"start": 50')
+
+
+def test_accept_streamed_edit_drops_duplicates_and_caps() -> None:
+    accepted: list[VideoEdit] = []
+
+    def edit(start: int, end: int) -> VideoEdit:
+        return VideoEdit(start=start, end=end, targeted_script_snippet="x")
+
+    assert llm.accept_streamed_edit(accepted, edit(100, 160), max_edits=2)
+    assert not llm.accept_streamed_edit(accepted, edit(105, 150), max_edits=2)
+    assert not llm.accept_streamed_edit(accepted, edit(10, 10), max_edits=2)
+    assert llm.accept_streamed_edit(accepted, edit(300, 360), max_edits=2)
+    assert not llm.accept_streamed_edit(accepted, edit(500, 560), max_edits=2)
+    assert [(e.start, e.end) for e in accepted] == [(100, 160), (300, 360)]
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import openai
+import pytest
+from moviepy.config import FFMPEG_BINARY
+
+from lib import openai_client
+from lib.transcribe import transcribe_audio
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    def __init__(self, failures: list[int]) -> None:
+        super().__init__(("127.0.0.1", 0), MockHandler)
+        self.failures = list(failures)
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    server: MockOpenAIServer
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers["Content-Length"]))
+        with self.server.lock:
+            self.server.requests += 1
+            status = self.server.failures.pop(0) if self.server.failures else 200
+
+        if status == 200:
+            body = json.dumps(
+                {"text": "hi", "language": "english", "duration": 1.0, "words": []}
+            )
+        else:
+            body = json.dumps({"error": {"message": "slow down", "type": "x"}})
+
+        payload = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        if status == 429:
+            self.send_header("retry-after-ms", "10")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *_: object) -> None:
+        pass
+
+
+@pytest.fixture
+def mock_endpoint(monkeypatch: pytest.MonkeyPatch, request: pytest.FixtureRequest):
+    server = MockOpenAIServer(getattr(request, "param", []))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setattr(openai_client, "BASE_RETRY_DELAY", 0.01)
+    openai_client.reset_clients()
+    openai_client.metrics.reset()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+    openai_client.reset_clients()
+
+
+@pytest.fixture
+def audio_file(tmp_path: Path) -> Path:
+    path = tmp_path / "audio.mp3"
+    subprocess.run(
+        [FFMPEG_BINARY, "-y", "-f", "lavfi", "-i", "sine=d=1:sample_rate=16000", str(path)],
+        capture_output=True,
+        check=True,
+    )
+    return path
+
+
+@pytest.mark.parametrize("mock_endpoint", [[429, 503]], indirect=True)
+def test_transcribe_audio_retries_rate_limits_and_server_errors(
+    mock_endpoint: MockOpenAIServer, audio_file: Path
+) -> None:
+    transcript_path = asyncio.run(transcribe_audio(str(audio_file)))
+
+    assert json.loads(Path(transcript_path).read_text())["text"] == "hi"
+    assert mock_endpoint.requests == 3
+
+    summary = openai_client.metrics.summary()
+    assert summary["requests"] == 3
+    assert summary["retries"] == 2
+    assert summary["statuses"] == {429: 1, 503: 1, 200: 1}
+
+
+@pytest.mark.parametrize("mock_endpoint", [[429] * 10], indirect=True)
+def test_with_retries_gives_up_after_max_retries(
+    mock_endpoint: MockOpenAIServer, audio_file: Path
+) -> None:
+    async def run() -> None:
+        client = openai_client.get_async_client()
+        with audio_file.open("rb") as f:
+            await openai_client.with_retries(
+                lambda: client.audio.transcriptions.create(file=f, model="whisper-1"),
+                max_retries=2,
+            )
+
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(run())
+    assert mock_endpoint.requests == 3
+
+
+def test_get_async_client_is_shared_within_a_loop(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+
+    async def clients() -> tuple[object, object]:
+        return openai_client.get_async_client(), openai_client.get_async_client()
+
+    first, second = asyncio.run(clients())
+    other, _ = asyncio.run(clients())
+
+    assert first is second
+    assert other is not first
+
+
+def test_request_metrics_keep_bounded_latency_samples() -> None:
+    metrics = openai_client.RequestMetrics()
+    for n in range(openai_client.MAX_LATENCY_SAMPLES + 10):
+        metrics.record("/v1/responses", 200, float(n))
+
+    summary = metrics.summary()
+    assert len(metrics.latencies) == openai_client.MAX_LATENCY_SAMPLES
+    assert summary["requests"] == openai_client.MAX_LATENCY_SAMPLES + 10
+    assert summary["statuses"] == {200: openai_client.MAX_LATENCY_SAMPLES + 10}
+    # The oldest samples have dropped out of the percentiles
+    assert summary["p50_seconds"] >= 10
@@ -0,0 +1,69 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+from lib.cut_video import cut_video_segments
+from lib.output_formats import OUTPUT_FORMATS, get_formats
+
+
+def test_frame_size_is_the_largest_even_box_of_the_aspect() -> None:
+    vertical = OUTPUT_FORMATS["vertical"]
+    square = OUTPUT_FORMATS["square"]
+
+    assert vertical.frame_size((1920, 1080)) == (608, 1080)
+    assert vertical.frame_size((1920, 1080), max_height=360) == (202, 360)
+    assert vertical.frame_size((1080, 1920)) == (1080, 1920)
+    assert square.frame_size((1920, 1080)) == (1080, 1080)
+    assert square.frame_size((1080, 1920)) == (1080, 1080)
+    assert OUTPUT_FORMATS["original"].frame_size((1920, 1080), 360) == (640, 360)
+
+
+def test_filters() -> None:
+    assert OUTPUT_FORMATS["original"].filters((640, 360)) is None
+    assert OUTPUT_FORMATS["original"].filters((1920, 1080), 360) == "scale=640:360"
+    assert OUTPUT_FORMATS["square"].filters((1920, 1080)) == (
+        "crop='min(iw,ih*1/1)':'min(ih,iw*1/1)',scale=1080:1080,setsar=1"
+    )
+
+
+def test_get_formats() -> None:
+    assert get_formats() == [OUTPUT_FORMATS["original"]]
+    assert [f.name for f in get_formats(["square", "original", "square"])] == [
+        "square",
+        "original",
+    ]
+    with pytest.raises(ValueError):
+        get_formats(["landscape"])
+    assert OUTPUT_FORMATS["vertical"].path("out/segment_001.mp4") == Path(
+        "out/segment_001_9x16.mp4"
+    )
+
+
+@pytest.mark.parametrize("mode", ["smart", "fanout"])
+def test_reframed_formats_render_in_any_mode_with_a_reel_each(
+    tmp_path: Path, source_video: Path, mode: str
+) -> None:
+    exports_dir = tmp_path / "exports"
+    exported = asyncio.run(
+        cut_video_segments(
+            str(source_video),
+            [{"start": 2, "end": 3}, {"start": 8, "end": 9}],
+            mode=mode,
+            exports_dir=exports_dir,
+            temp_dir=tmp_path / "temp",
+            formats=["original", "vertical"],
+        )
+    )
+
+    assert [Path(path).name for path in exported] == [
+        "segment_001_0.0s-5.0s.mp4",
+        "segment_001_0.0s-5.0s_9x16.mp4",
+        "segment_002_6.0s-11.0s.mp4",
+        "segment_002_6.0s-11.0s_9x16.mp4",
+    ]
+    reel = ffmpeg_parse_infos(str(exports_dir / "highlight_reel_9x16.mp4"))
+    assert reel["video_size"] == [68, 120]
+    assert reel["duration"] == pytest.approx(10.0, abs=0.2)
+    assert (exports_dir / "highlight_reel.mp4").exists()
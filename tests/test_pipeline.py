@@ -0,0 +1,128 @@
+import asyncio
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from openai.types.responses import ResponseTextDeltaEvent
+
+from lib import llm, openai_client, pipeline
+from lib.cache import ArtifactCache
+from lib.render_plan import PLAN_FILENAME
+
+
+class FakeStreamedRun:
+    def __init__(self, text: str):
+        self.text = text
+        self.context_wrapper = SimpleNamespace(
+            usage=SimpleNamespace(input_tokens=100, output_tokens=10)
+        )
+
+    async def stream_events(self):
+        for n in range(0, len(self.text), 5):
+            await asyncio.sleep(0.01)
+            yield SimpleNamespace(
+                type="raw_response_event",
+                data=ResponseTextDeltaEvent.model_construct(
+                    type="response.output_text.delta", delta=self.text[n : n + 5]
+                ),
+            )
+
+
+def run_pipelined(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    source_video: Path,
+    edits: list[dict],
+    words: list[dict],
+    reports: list[str],
+) -> tuple[dict, list[str]]:
+    """Run the pipelined process with a stand-in LLM that streams edits back;
+    return its result and the window inputs sent to the LLM."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.chdir(tmp_path)
+    openai_client.reset_clients()
+    sent: list[str] = []
+
+    class FakeRunner:
+        @staticmethod
+        def run_streamed(agent, window_input: str):
+            sent.append(window_input)
+            return FakeStreamedRun(json.dumps({"response": edits}))
+
+    monkeypatch.setattr(llm, "Runner", FakeRunner)
+
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    transcript = tmp_path / "transcript.json"
+    transcript.write_text(json.dumps({"words": words}))
+    cache.put("transcript", "upload", transcript)
+
+    result = asyncio.run(
+        pipeline.run_process_pipeline(
+            str(source_video),
+            "PROMPT",
+            "upload",
+            str(tmp_path / "work"),
+            cache,
+            cut_mode="smart",
+            export_workers=2,
+            report=lambda message, progress=None: reports.append(message),
+            pipelined=True,
+        )
+    )
+    return result, sent
+
+
+def test_pipelined_process_cuts_edits_as_they_stream(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, source_video: Path
+) -> None:
+    edits = [
+        {"start": 2, "end": 5, "targeted_script_snippet": "word2 word3 word4"},
+        {"start": 3, "end": 5, "targeted_script_snippet": "duplicate"},
+        {"start": 8, "end": 10, "targeted_script_snippet": "word8 word9"},
+    ]
+    words = [
+        {"word": f"word{n}.", "start": float(n), "end": n + 0.5} for n in range(12)
+    ]
+    reports: list[str] = []
+
+    result, sent = run_pipelined(
+        monkeypatch, tmp_path, source_video, edits, words, reports
+    )
+
+    assert len(sent) == 1
+    names = [Path(p).name for p in result["exported_files"]]
+    # Edits end on the last spoken word (4.5s, 9.5s) before the 2s padding
+    assert names == ["segment_001_0.0s-6.5s.mp4", "segment_002_6.0s-11.5s.mp4"]
+    assert all(Path(p).exists() for p in result["exported_files"])
+    assert 0 < result["time_to_first_clip_seconds"] <= result["total_seconds"]
+    assert result["render_fps"] > 0
+    assert any(f"{result['render_fps']:.0f} fps" in note for note in result["notes"])
+    assert any("Cutting clip" in message for message in reports)
+
+    saved = json.loads((tmp_path / "work" / "processed_result.json").read_text())
+    assert [(e["start"], e["end"], e["snippet_match"]) for e in saved] == [
+        (2.0, 4.5, 1.0),
+        (8.0, 9.5, 1.0),
+    ]
+    assert Path(result["zip_file_path"]).exists()
+    # Rewritten as each segment is submitted, so it was there during the cut
+    plan = json.loads((tmp_path / "work" / PLAN_FILENAME).read_text())
+    assert plan == result["render_plan"]
+
+    run_report = json.loads(Path(result["run_report"]).read_text())
+    assert [s["name"] for s in run_report["stages"]] == ["streaming", "bundling"]
+    assert run_report["stages"][0]["input_tokens"] == 100
+
+
+def test_pipelined_process_fails_cleanly_when_no_edit_is_inside_the_video(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, source_video: Path
+) -> None:
+    # The transcript runs past the 12s video, and so does the only edit
+    words = [
+        {"word": f"word{n}.", "start": float(n), "end": n + 0.5} for n in range(30)
+    ]
+    edits = [{"start": 20, "end": 25, "targeted_script_snippet": "word20 word21"}]
+
+    with pytest.raises(ValueError, match="did not return any edits"):
+        run_pipelined(monkeypatch, tmp_path, source_video, edits, words, [])
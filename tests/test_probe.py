@@ -0,0 +1,58 @@
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+from moviepy.config import FFMPEG_BINARY
+
+from lib import probe
+from lib.probe import mp4_sample_counts, probe_media
+
+
+def test_probe_media_reads_headers(source_video: Path) -> None:
+    media = probe_media(source_video)
+
+    assert media.duration == pytest.approx(12, abs=0.1)
+    assert media.video_size == (160, 120)
+    assert media.fps == 25
+    assert media.video_codec == "h264"
+    assert media.audio_codec == "aac"
+    assert media.audio_rate == 22050
+    assert media.has_video and media.has_audio
+    # 300 frames with a keyframe every 50
+    assert (media.frames, media.keyframes) == (300, 6)
+
+
+def test_probe_media_is_cached(
+    source_video: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    first = probe_media(source_video, "sha-source")
+    assert probe_media(source_video) is first
+
+    copy = tmp_path / "copy.mp4"
+    shutil.copy(source_video, copy)
+
+    def no_probe(path: Path):
+        raise AssertionError(f"{path} was probed again")
+
+    monkeypatch.setattr(probe, "_probe", no_probe)
+    media = probe_media(copy, "sha-source")
+
+    assert media.path == str(copy.resolve())
+    assert media.keyframes == first.keyframes
+
+
+def test_mp4_sample_counts_skips_other_containers(
+    source_video: Path, tmp_path: Path
+) -> None:
+    mkv = tmp_path / "source.mkv"
+    subprocess.run(
+        [FFMPEG_BINARY, "-y", "-i", str(source_video), "-c", "copy", str(mkv)],
+        capture_output=True,
+        check=True,
+    )
+
+    assert mp4_sample_counts(mkv) == (None, None)
+    media = probe_media(mkv)
+    assert media.video_codec == "h264"
+    assert media.keyframes is None
@@ -0,0 +1,64 @@
+from pathlib import Path
+
+import pytest
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+from PIL import Image
+
+from lib import proxy
+from lib.cache import ArtifactCache
+from lib.proxy import build_proxy, plan_thumbnails
+
+
+def test_plan_thumbnails_caps_tile_count() -> None:
+    short = plan_thumbnails(12.0, (160, 120))
+    assert (short.interval, short.count, short.columns, short.rows) == (5.0, 3, 3, 1)
+    assert (short.thumb_width, short.thumb_height) == (160, 120)
+
+    long = plan_thumbnails(3 * 3600, (1920, 1080), max_thumbs=100)
+    assert long.count == 100
+    assert long.interval == 108.0
+    assert long.thumb_height == 90
+    assert long.tile_box(11) == (160, 90, 320, 180)
+
+
+def test_build_proxy_renders_once_per_content_hash(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, source_video: Path
+) -> None:
+    cache = ArtifactCache(str(tmp_path / "cache"))
+
+    built = build_proxy(str(source_video), "content-hash", cache)
+
+    preview = ffmpeg_parse_infos(str(built.preview_path))
+    assert preview["video_size"][1] <= proxy.PREVIEW_MAX_HEIGHT
+    assert preview["duration"] == pytest.approx(12.0, abs=0.25)
+    assert preview["audio_found"]
+    with Image.open(built.sprite_path) as sheet:
+        assert sheet.size == (
+            built.grid.columns * built.grid.thumb_width,
+            built.grid.rows * built.grid.thumb_height,
+        )
+
+    def no_ffmpeg(*_, **__):
+        raise AssertionError("ffmpeg should not run on a cache hit")
+
+    monkeypatch.setattr(proxy, "subprocess_call", no_ffmpeg)
+    again = build_proxy(str(source_video), "content-hash", cache)
+    assert again.preview_path == built.preview_path
+    assert again.sprite_path == built.sprite_path
+
+
+def test_build_proxy_without_preview_stands_in_the_source(
+    tmp_path: Path, source_video: Path
+) -> None:
+    cache = ArtifactCache(str(tmp_path / "cache"))
+
+    thumbnails = build_proxy(str(source_video), "content-hash", cache, preview=False)
+
+    assert not thumbnails.preview_ready
+    assert thumbnails.preview_path == source_video
+    assert thumbnails.sprite_path.exists()
+
+    built = build_proxy(str(source_video), "content-hash", cache)
+    again = build_proxy(str(source_video), "content-hash", cache, preview=False)
+    assert again.preview_ready
+    assert again.preview_path == built.preview_path
@@ -0,0 +1,121 @@
+from pathlib import Path
+
+import pytest
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+from conftest import count_video_packets
+from lib.output_formats import OutputFormat
+from lib.probe import probe_media
+from lib.reel import stream_signature
+from lib.render_backend import RENDER_BACKENDS, get_backend, segment_command
+from lib.render_profiles import RENDER_PROFILES
+
+
+def test_segment_command_builds_one_filtergraph() -> None:
+    preview = RENDER_PROFILES["preview"]
+    cmd = segment_command(
+        "in.mp4", 10.0, 12.5, [("out.mp4", "scale=640:360")], preview, 2, True
+    )
+
+    graph = cmd[cmd.index("-filter_complex") + 1]
+    assert graph == (
+        "[0:v:0]trim=duration=2.500000,setpts=PTS-STARTPTS,scale=640:360[v0];"
+        "[0:a:0]atrim=duration=2.500000,asetpts=PTS-STARTPTS[a0]"
+    )
+    assert cmd[cmd.index("-ss") + 1] == "10.000000"
+    assert cmd[cmd.index("-threads") + 1] == "2"
+
+
+def test_segment_command_splits_one_decode_between_formats() -> None:
+    outputs = [("a.mp4", None), ("a_9x16.mp4", "crop=1:1"), ("a_1x1.mp4", "pad=2:2")]
+    cmd = segment_command("in.mp4", 0.0, 1.0, outputs, RENDER_PROFILES["final"])
+
+    graph = cmd[cmd.index("-filter_complex") + 1]
+    assert graph == (
+        "[0:v:0]trim=duration=1.000000,setpts=PTS-STARTPTS,split=3[v0][s1][s2];"
+        "[s1]crop=1:1[v1];"
+        "[s2]pad=2:2[v2];"
+        "[0:a:0]atrim=duration=1.000000,asetpts=PTS-STARTPTS,asplit=3[a0][a1][a2]"
+    )
+    assert cmd.count("-i") == 1
+    assert [cmd[i + 1] for i, arg in enumerate(cmd) if arg == "-map"] == [
+        "[v0]", "[a0]", "[v1]", "[a1]", "[v2]", "[a2]"
+    ]
+    assert cmd[-1] == "a_1x1.mp4"
+
+
+def test_get_backend() -> None:
+    assert get_backend().name == "ffmpeg"
+    with pytest.raises(ValueError):
+        get_backend("gstreamer")
+
+
+def test_backends_render_interchangeable_segments(
+    tmp_path: Path, source_video: Path
+) -> None:
+    outputs = {}
+    for name, backend in RENDER_BACKENDS.items():
+        outputs[name] = backend.render_segments(
+            str(source_video),
+            [(3.0, 7.0, tmp_path / f"{name}.mp4")],
+            RENDER_PROFILES["preview"],
+            temp_dir=tmp_path,
+        )[0]
+
+    for path in outputs.values():
+        infos = ffmpeg_parse_infos(path)
+        assert infos["duration"] == pytest.approx(4.0, abs=0.1)
+        assert infos["audio_fps"] == 44100
+    # Same codecs and audio format, so segments from either can share a reel
+    assert stream_signature(outputs["ffmpeg"]) == stream_signature(outputs["moviepy"])
+
+
+@pytest.mark.parametrize("name", list(RENDER_BACKENDS))
+def test_backends_render_every_format(
+    tmp_path: Path, source_video: Path, name: str
+) -> None:
+    outputs = get_backend(name).render_segments(
+        str(source_video),
+        [(3.0, 5.0, tmp_path / "clip.mp4")],
+        RENDER_PROFILES["preview"],
+        temp_dir=tmp_path,
+        formats=["original", "vertical", OutputFormat("boxed", (1, 1), "pad")],
+    )
+
+    assert [Path(path).name for path in outputs] == [
+        "clip.mp4",
+        "clip_9x16.mp4",
+        "clip_1x1.mp4",
+    ]
+    sizes = [ffmpeg_parse_infos(path)["video_size"] for path in outputs]
+    assert sizes == [[160, 120], [68, 120], [120, 120]]
+
+
+@pytest.mark.parametrize("name", list(RENDER_BACKENDS))
+def test_backends_keep_the_source_frame_rate(
+    tmp_path: Path, source_video_30fps: Path, name: str
+) -> None:
+    outputs = get_backend(name).render_segments(
+        str(source_video_30fps),
+        [(2.0, 8.0, tmp_path / "clip.mp4")],
+        RENDER_PROFILES["preview"],
+        temp_dir=tmp_path,
+        formats=["original", "vertical"],
+    )
+
+    for path in outputs:
+        assert probe_media(path).fps == 30
+        assert count_video_packets(Path(path)) == 180
+
+
+def test_moviepy_backend_renders_several_segments_from_one_reader(
+    tmp_path: Path, source_video: Path
+) -> None:
+    segments = [(1.0, 2.0, tmp_path / "a.mp4"), (6.0, 7.5, tmp_path / "b.mp4")]
+
+    get_backend("moviepy").render_segments(
+        str(source_video), segments, RENDER_PROFILES["preview"], temp_dir=tmp_path
+    )
+
+    durations = [ffmpeg_parse_infos(str(p))["duration"] for _, _, p in segments]
+    assert durations == pytest.approx([1.0, 1.5], abs=0.1)
@@ -0,0 +1,69 @@
+import pytest
+
+from lib.render_plan import RenderPlan, plan_render
+
+
+def edit(start: float, end: float) -> dict:
+    return {"start": start, "end": end, "targeted_script_snippet": "line"}
+
+
+def test_plan_render_merges_overlapping_and_touching_edits() -> None:
+    edits = [edit(30, 34), edit(10, 15), edit(14, 20), edit(24, 26)]
+
+    plan = plan_render(edits, duration=60.0)
+
+    # Padded: (28, 36), (8, 17), (12, 22), (22, 28) -> one run from 8 to 36
+    assert [(s.start, s.end, s.edits) for s in plan.segments] == [
+        (8.0, 36.0, [1, 2, 3, 0])
+    ]
+    assert plan.requested_seconds == pytest.approx(8 + 9 + 10 + 6)
+    assert plan.render_seconds == pytest.approx(28)
+    assert plan.saved_seconds == pytest.approx(5)
+    assert plan.segments[0].filename == "segment_001_8.0s-36.0s.mp4"
+
+
+@pytest.mark.parametrize(
+    "merge, merge_gap, expected",
+    [
+        (True, 0.0, [(3.0, 12.0), (13.0, 22.0)]),
+        (True, 1.0, [(3.0, 22.0)]),
+        (False, 5.0, [(3.0, 12.0), (13.0, 22.0)]),
+    ],
+)
+def test_plan_render_merge_rules(
+    merge: bool, merge_gap: float, expected: list[tuple[float, float]]
+) -> None:
+    plan = plan_render(
+        [edit(15, 20), edit(5, 10)], duration=60.0, merge=merge, merge_gap=merge_gap
+    )
+
+    assert [(s.start, s.end) for s in plan.segments] == expected
+    assert [s.n for s in plan.segments] == list(range(1, len(expected) + 1))
+
+
+def test_plan_render_summary_and_dict() -> None:
+    plan = plan_render([edit(5, 10), edit(6, 11), edit(50, 70)], duration=60.0)
+
+    assert plan.summary() == (
+        "Render plan: 3 edits → 2 segments, 22.0s to encode "
+        "(was 30.0s before merging)"
+    )
+    assert plan.to_dict()["segments"][1] == {
+        "n": 2,
+        "file": "segment_002_48.0s-60.0s.mp4",
+        "start": 48.0,
+        "end": 60.0,
+        "edits": [2],
+    }
+
+
+def test_render_plan_round_trips_approved_segments() -> None:
+    plan = plan_render([edit(5, 10), edit(20, 25), edit(40, 45)], duration=60.0)
+
+    approved = RenderPlan.from_dict(plan.to_dict(), keep=[1, 3])
+
+    assert [s.filename for s in approved.segments] == [
+        "segment_001_3.0s-12.0s.mp4",
+        "segment_003_38.0s-47.0s.mp4",
+    ]
+    assert approved.render_seconds == pytest.approx(18)
@@ -0,0 +1,71 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+from lib import pipeline
+from lib.cut_video import cut_video_segments
+from lib.render_plan import plan_render
+from lib.render_profiles import RENDER_PROFILES, RenderProfile, get_profile
+
+
+def test_output_size_caps_height_with_even_width() -> None:
+    preview = RENDER_PROFILES["preview"]
+
+    assert preview.output_size((1920, 1080)) == (640, 360)
+    assert preview.output_size((1080, 1920)) == (202, 360)
+    assert preview.output_size((640, 360)) is None
+    assert RENDER_PROFILES["final"].output_size((3840, 2160)) is None
+
+
+def test_get_profile() -> None:
+    assert get_profile().name == "final"
+    assert get_profile("preview") is RENDER_PROFILES["preview"]
+    with pytest.raises(ValueError):
+        get_profile("draft")
+
+
+@pytest.mark.parametrize("mode", ["smart", "fanout", "reencode"])
+def test_scaling_profile_renders_every_mode(
+    tmp_path: Path, source_video: Path, mode: str
+) -> None:
+    tiny = RenderProfile("tiny", preset="ultrafast", crf=35, max_height=60)
+
+    exported = asyncio.run(
+        cut_video_segments(
+            str(source_video),
+            [{"start": 3, "end": 5}],
+            mode=mode,
+            exports_dir=tmp_path / "exports",
+            temp_dir=tmp_path / "temp",
+            profile=tiny,
+        )
+    )
+
+    infos = ffmpeg_parse_infos(exported[0])
+    assert infos["video_size"] == [80, 60]
+    assert infos["duration"] == pytest.approx(6.0, abs=0.1)
+
+
+def test_render_approved_rerenders_chosen_segments(
+    tmp_path: Path, source_video: Path
+) -> None:
+    plan = plan_render([{"start": 2, "end": 3}, {"start": 8, "end": 9}], 12.0)
+
+    result = asyncio.run(
+        pipeline.render_approved(
+            str(source_video),
+            plan.to_dict(),
+            [2],
+            str(tmp_path / "run"),
+            str(tmp_path / "work"),
+        )
+    )
+
+    assert [Path(p).name for p in result["exported_files"]] == [
+        "segment_002_6.0s-11.0s.mp4"
+    ]
+    assert Path(result["exported_files"][0]).parent == tmp_path / "run" / "final"
+    assert result["render_fps"] > 0
+    assert Path(result["zip_file_path"]).exists()
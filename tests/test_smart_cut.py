@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import pytest
+
+from conftest import count_video_packets
+from lib import smart_cut
+from lib.smart_cut import build_keyframe_index, smart_cut_segment
+
+
+def test_build_keyframe_index_reads_gops(source_video: Path) -> None:
+    index = build_keyframe_index(str(source_video))
+
+    assert index.supported
+    assert len(index.frame_times) == 300
+    assert index.keyframe_times == pytest.approx([0.0, 2.0, 4.0, 6.0, 8.0, 10.0])
+    assert build_keyframe_index(str(source_video)) is index
+
+
+def test_smart_cut_segment_is_frame_accurate(
+    source_video: Path, tmp_path: Path
+) -> None:
+    output = tmp_path / "cut.mp4"
+
+    assert smart_cut_segment(str(source_video), 3.1, 9.5, str(output))
+
+    # 3.12s (first frame at or after 3.1) up to 9.52s at 25 fps
+    assert count_video_packets(output) == 160
+
+
+def test_smart_cut_segment_declines_without_whole_gop(
+    source_video: Path, tmp_path: Path
+) -> None:
+    output = tmp_path / "cut.mp4"
+
+    assert not smart_cut_segment(str(source_video), 4.5, 5.5, str(output))
+    assert not output.exists()
+
+
+def test_smart_cut_segment_encodes_edges_with_the_profile(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, source_video: Path
+) -> None:
+    commands: list[list[str]] = []
+    monkeypatch.setattr(
+        smart_cut, "subprocess_call", lambda cmd, logger=None: commands.append(cmd)
+    )
+
+    assert smart_cut_segment(
+        str(source_video), 3.1, 9.5, str(tmp_path / "cut.mp4"), profile="preview"
+    )
+
+    edges = [cmd for cmd in commands if "-an" in cmd]
+    assert len(edges) == 2
+    for cmd in edges:
+        assert cmd[cmd.index("-preset") + 1] == "ultrafast"
+        assert cmd[cmd.index("-crf") + 1] == "30"
+    assert commands[-1][commands[-1].index("-b:a") + 1] == "64k"
@@ -1,18 +1,20 @@
-import asyncio
+import io
 from pathlib import Path
 
 import pytest
 
 from app_tabs import split_tab
+from lib import pipeline, render_backend
+from lib.cache import ArtifactCache
+from lib.jobs import DONE, FAILED, JobQueue, JobStore
+from lib.probe import MediaInfo
+from lib.proxy import build_proxy
 
 
-class UploadedFileStub:
+class UploadedFileStub(io.BytesIO):
     def __init__(self, name: str = "demo.mp4", data: bytes = b"video-bytes"):
+        super().__init__(data)
         self.name = name
-        self._data = data
-
-    def getbuffer(self) -> bytes:
-        return self._data
 
 
 class SessionState(dict):
@@ -42,6 +44,7 @@ class StatusStub:
 class StreamlitStub:
     def __init__(self):
         self.session_state = SessionState()
+        self.query_params: dict[str, str] = {}
         self.errors: list[str] = []
         self.warnings: list[str] = []
         self.successes: list[str] = []
@@ -107,28 +110,55 @@ class FakeSegment:
         self.parent.closed_segments.append((self.start, self.end))
 
 
-def setup_cut_env(monkeypatch: pytest.MonkeyPatch, tmp_path: Path, duration: float):
+def setup_cut_env(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    duration: float,
+    max_pending: int | None = None,
+):
     st_stub = StreamlitStub()
     st_stub.session_state["cut_file_path"] = "old.mp4"
 
     fake_clip = FakeClip(duration)
+    queue = JobQueue(
+        JobStore(str(tmp_path / "jobs.db")),
+        pipeline.job_handlers(ArtifactCache(str(tmp_path / "cache"))),
+        workers=1,
+        max_pending=max_pending,
+    )
 
     monkeypatch.setattr(split_tab, "st", st_stub)
-    monkeypatch.setattr(split_tab, "VideoFileClip", lambda _: fake_clip)
+    monkeypatch.setattr(split_tab, "get_job_queue", lambda: queue)
+    monkeypatch.setattr(
+        pipeline,
+        "probe_media",
+        lambda path, content_hash=None: MediaInfo(str(path), duration, None, ()),
+    )
+    monkeypatch.setattr(render_backend, "VideoFileClip", lambda _: fake_clip)
+    monkeypatch.setattr(render_backend, "DEFAULT_BACKEND", "moviepy")
     monkeypatch.chdir(tmp_path)
 
-    return st_stub, fake_clip
+    return st_stub, fake_clip, queue
 
 
-def test_cut_video_range_writes_clip_and_download(
+def test_cut_job_writes_clip_and_download(
     monkeypatch: pytest.MonkeyPatch, tmp_path: Path
 ) -> None:
-    st_stub, fake_clip = setup_cut_env(monkeypatch, tmp_path, duration=10)
+    st_stub, fake_clip, queue = setup_cut_env(monkeypatch, tmp_path, duration=10)
     uploaded_file = UploadedFileStub("demo.mp4", b"file-bytes")
 
-    asyncio.run(split_tab.cut_video_range(uploaded_file, 2, 5))
+    job_id = split_tab.submit_cut_job(uploaded_file, 2, 5)
+
+    assert st_stub.query_params["cut_job"] == job_id
+    assert "old.mp4" not in st_stub.session_state.values()
+    assert queue.get(job_id).status == "queued"
+
+    job = queue.run_next()
+    assert job.id == job_id
+    assert job.status == DONE
 
-    exports_dirs = list((tmp_path / "exports").iterdir())
+    # the clip is written inside the job's own workspace
+    exports_dirs = list((tmp_path / "workspaces" / job_id / "exports").iterdir())
     assert len(exports_dirs) == 1
     run_dir = exports_dirs[0]
     files = list(run_dir.glob("*.mp4"))
@@ -138,24 +168,71 @@ def test_cut_video_range_writes_clip_and_download(
     assert fake_clip.closed_segments == [(2, 5)]
     assert fake_clip.closed is True
 
+    split_tab.render_cut_result(job)
+
     assert st_stub.session_state["cut_file_path"].endswith(".mp4")
     assert st_stub.downloads[-1]["file_name"] == files[0].name
-    assert st_stub.downloads[-1]["data"] == b"segment"
-    assert "old.mp4" not in st_stub.session_state.values()
+    assert st_stub.downloads[-1]["data"]() == b"segment"
 
     assert not st_stub.errors
     assert st_stub.successes
 
 
-def test_cut_video_range_handles_zero_duration(
+def test_cut_job_handles_zero_duration(
     monkeypatch: pytest.MonkeyPatch, tmp_path: Path
 ) -> None:
-    st_stub, fake_clip = setup_cut_env(monkeypatch, tmp_path, duration=0)
+    st_stub, fake_clip, queue = setup_cut_env(monkeypatch, tmp_path, duration=0)
     uploaded_file = UploadedFileStub("demo.mp4", b"file-bytes")
 
-    asyncio.run(split_tab.cut_video_range(uploaded_file, 0, 1))
+    job_id = split_tab.submit_cut_job(uploaded_file, 0, 1)
+    job = queue.run_next()
 
-    assert any("no duration" in err.lower() for err in st_stub.errors)
+    assert job.id == job_id
+    assert job.status == FAILED
+    assert "no duration" in job.error.lower()
     assert "cut_file_path" not in st_stub.session_state
     assert not st_stub.downloads
-    assert fake_clip.closed is True
+    # the probe rejects it before any decoder is opened
+    assert not fake_clip.subclip_calls
+
+
+def test_cut_job_rejected_when_queue_is_full(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    st_stub, _, queue = setup_cut_env(
+        monkeypatch, tmp_path, duration=10, max_pending=0
+    )
+
+    job_id = split_tab.submit_cut_job(UploadedFileStub("demo.mp4"), 2, 5)
+
+    assert job_id is None
+    assert any("busy" in err for err in st_stub.errors)
+    assert "cut_job" not in st_stub.query_params
+    assert not (tmp_path / "workspaces").exists()
+    assert queue.run_next() is None
+
+
+def test_proxy_job_encodes_the_preview_once(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, source_video: Path
+) -> None:
+    _, _, queue = setup_cut_env(monkeypatch, tmp_path, duration=12)
+
+    job_id = split_tab.submit_proxy_job(source_video, "content-hash")
+
+    assert split_tab.submit_proxy_job(source_video, "content-hash") == job_id
+    job = queue.run_next()
+    assert (job.id, job.status) == (job_id, DONE)
+    assert queue.run_next() is None
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    assert build_proxy(
+        str(source_video), "content-hash", cache, preview=False
+    ).preview_ready
+
+
+def test_proxy_job_is_skipped_when_queue_is_full(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, source_video: Path
+) -> None:
+    _, _, queue = setup_cut_env(monkeypatch, tmp_path, duration=12, max_pending=0)
+
+    assert split_tab.submit_proxy_job(source_video, "content-hash") is None
+    assert queue.run_next() is None
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+from moviepy.config import FFMPEG_BINARY
+from openai import AsyncOpenAI
+
+from lib.transcribe import (
+    merge_transcriptions,
+    plan_chunks,
+    transcribe_audio_chunked,
+    transcribe_audio_stream,
+)
+
+
+def word(text: str, start: float, end: float) -> dict:
+    return {"word": text, "start": start, "end": end}
+
+
+def test_plan_chunks_prefers_silence_then_overlaps_hard_cuts() -> None:
+    chunks = plan_chunks(
+        duration=25.0,
+        silences=[(8.6, 9.0), (3.0, 3.2)],
+        chunk_seconds=10.0,
+        overlap=1.0,
+    )
+
+    assert chunks == [(0.0, 8.8), (8.8, 18.8), (17.8, 25.0)]
+
+
+def test_merge_transcriptions_offsets_and_dedupes_overlap() -> None:
+    chunks = [(0.0, 10.0), (9.0, 20.0)]
+    transcriptions = [
+        {"language": "english", "words": [word("a", 1.0, 1.4), word("b", 9.2, 9.8)]},
+        {"language": "english", "words": [word("b", 0.2, 0.8), word("c", 3.0, 3.5)]},
+    ]
+
+    merged = merge_transcriptions(chunks, transcriptions)
+
+    assert [(w["word"], w["start"]) for w in merged["words"]] == [
+        ("a", 1.0),
+        ("b", 9.2),
+        ("c", 12.0),
+    ]
+    assert merged["text"] == "a b c"
+    assert merged["duration"] == 20.0
+
+
+class StandInTranscriptionServer(ThreadingHTTPServer):
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        # When set, each request is held open until this many are in flight
+        self.hold_until_in_flight: int | None = None
+        self.enough_in_flight = threading.Event()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server: StandInTranscriptionServer
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers["Content-Length"]))
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(
+                self.server.max_in_flight, self.server.in_flight
+            )
+            if self.server.in_flight == self.server.hold_until_in_flight:
+                self.server.enough_in_flight.set()
+        if self.server.hold_until_in_flight is not None:
+            self.server.enough_in_flight.wait(timeout=5)
+            # Long enough for a request over the limit to arrive too
+            time.sleep(0.2)
+
+        body = json.dumps(
+            {
+                "task": "transcribe",
+                "language": "english",
+                "duration": 10.0,
+                "text": "hello",
+                "words": [word("hello", 0.5, 0.9)],
+            }
+        ).encode()
+
+        with self.server.lock:
+            self.server.in_flight -= 1
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_: object) -> None:
+        pass
+
+
+@pytest.fixture
+def stand_in_server():
+    server = StandInTranscriptionServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_transcribe_audio_chunked_against_stand_in_server(
+    stand_in_server: StandInTranscriptionServer, tmp_path: Path
+) -> None:
+    stand_in_server.hold_until_in_flight = 2
+    audio = tmp_path / "audio.mp3"
+    # 4s tone then 1s of silence, repeated
+    subprocess.run(
+        [
+            FFMPEG_BINARY,
+            "-y",
+            "-f", "lavfi",
+            "-i", "aevalsrc='if(lt(mod(t,5),4),sin(2*PI*440*t),0)':s=16000:d=25",
+            str(audio),
+        ],
+        capture_output=True,
+        check=True,
+    )
+    client = AsyncOpenAI(
+        base_url=f"http://127.0.0.1:{stand_in_server.server_port}/v1",
+        api_key="test",
+        max_retries=0,
+    )
+
+    transcript_path = asyncio.run(
+        transcribe_audio_chunked(
+            str(audio), chunk_seconds=10, max_concurrency=2, openai_client=client
+        )
+    )
+
+    transcript = json.loads(Path(transcript_path).read_text())
+    starts = [w["start"] for w in transcript["words"]]
+    assert stand_in_server.requests == 3
+    assert stand_in_server.max_in_flight == 2
+    # chunks are cut mid-silence at ~9.5s and ~19.5s
+    assert starts == pytest.approx([0.5, 10.0, 20.0], abs=0.1)
+
+
+def test_transcribe_audio_stream_delivers_chunks_in_order(
+    stand_in_server: StandInTranscriptionServer, tmp_path: Path
+) -> None:
+    audio = tmp_path / "chunk.mp3"
+    subprocess.run(
+        [FFMPEG_BINARY, "-y", "-f", "lavfi", "-i", "sine=d=1", str(audio)],
+        capture_output=True,
+        check=True,
+    )
+    client = AsyncOpenAI(
+        base_url=f"http://127.0.0.1:{stand_in_server.server_port}/v1",
+        api_key="test",
+        max_retries=0,
+    )
+    delivered: list[float] = []
+
+    async def chunks():
+        for start in (0.0, 10.0, 20.0):
+            await asyncio.sleep(0.05)
+            yield audio, start, start + 10.0
+        # A sliver too short to transcribe
+        yield audio, 30.0, 30.05
+
+    async def on_transcribed(transcription: dict) -> None:
+        delivered.append(transcription["words"][0]["start"])
+
+    merged = asyncio.run(
+        transcribe_audio_stream(chunks(), on_transcribed, openai_client=client)
+    )
+
+    assert stand_in_server.requests == 3
+    assert delivered == pytest.approx([0.5, 10.5, 20.5])
+    assert [w["start"] for w in merged["words"]] == pytest.approx(delivered)
+    assert merged["duration"] == 30.0
@@ -0,0 +1,100 @@
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+from lib import transcript_index
+from lib.llm import VideoEdit, align_edit
+from lib.transcript_index import TranscriptIndex, load_transcript_index
+
+
+def make_words(text: str, start: float = 0.0, step: float = 0.4) -> list[dict]:
+    return [
+        {"word": word, "start": start + n * step, "end": start + n * step + 0.3}
+        for n, word in enumerate(text.split())
+    ]
+
+
+SPEECH = make_words("So here is the plan. We cut the video into clips.") + make_words(
+    "Then we upload them.", start=6.0
+)
+
+
+def test_snap_moves_edit_onto_word_and_sentence_boundaries() -> None:
+    index = TranscriptIndex(SPEECH)
+
+    assert index.sentence_starts == [0, 5, 11]
+    assert index.sentence_ends == [4, 10, 14]
+    # Mid-sentence edit grows to the whole second sentence
+    assert index.snap(2.35, 3.5) == pytest.approx((2.0, 4.3))
+    # Sentences further away than the snap distance are left alone
+    assert index.snap(2.35, 3.5, sentence_snap=0.2) == pytest.approx((2.4, 3.5))
+    # Edits over silence are returned unchanged
+    assert index.snap(4.5, 5.9) == (4.5, 5.9)
+
+
+def test_word_range_steps_back_over_every_overlapping_word() -> None:
+    index = TranscriptIndex(
+        [
+            {"word": "so", "start": 0.0, "end": 5.0},
+            {"word": "here", "start": 1.0, "end": 4.0},
+            {"word": "is", "start": 2.0, "end": 3.0},
+            {"word": "it", "start": 6.0, "end": 6.5},
+        ]
+    )
+
+    assert index.word_range(2.5, 5.5) == (0, 3)
+    assert index.word_range(5.5, 7.0) == (3, 4)
+
+
+def test_snippet_match_scores_words_in_range() -> None:
+    index = TranscriptIndex(SPEECH)
+
+    assert index.text_between(2.0, 4.3) == "We cut the video into clips."
+    assert index.snippet_match("we cut the video", 2.0, 4.3) == 1.0
+    assert index.snippet_match("we trim the footage", 2.0, 4.3) == 0.5
+    assert index.snippet_match("then we upload them", 2.0, 4.3) == 0.25
+
+
+def test_align_edit_keeps_sub_second_precision() -> None:
+    edit = VideoEdit(start=2, end=4, targeted_script_snippet="cut the video")
+
+    aligned = align_edit(TranscriptIndex(SPEECH), edit)
+
+    assert (aligned.start, aligned.end) == pytest.approx((2.0, 4.3))
+    assert aligned.snippet_match == 1.0
+    assert align_edit(TranscriptIndex(), edit).model_dump() == (
+        edit.model_dump() | {"snippet_match": 1.0}
+    )
+
+
+def test_extend_matches_building_at_once() -> None:
+    streamed = TranscriptIndex(SPEECH[:7])
+    streamed.extend(SPEECH[7:])
+    whole = TranscriptIndex(SPEECH)
+
+    assert streamed.starts == whole.starts
+    assert streamed.sentence_starts == whole.sentence_starts
+    assert streamed.sentence_ends == whole.sentence_ends
+
+
+def test_large_index_lookups(tmp_path: Path) -> None:
+    text = " ".join(f"w{n}." if n % 12 == 11 else f"w{n}" for n in range(150_000))
+    words = make_words(text)
+    path = tmp_path / "audio.json"
+    path.write_text(json.dumps({"words": words}))
+    transcript_index._index_cache.clear()
+
+    index = load_transcript_index(str(path))
+    assert load_transcript_index(str(path)) is index
+    assert len(index) == 150_000
+
+    started = time.perf_counter()
+    for n in range(0, 150_000, 15):
+        i, j = index.word_range(n * 0.4, n * 0.4 + 4.0)
+        assert index.words[i] == f"w{n}"
+        assert j - i == 10
+        index.snap(n * 0.4, n * 0.4 + 4.0)
+    # 10k lookups; a linear scan per lookup would take minutes
+    assert time.perf_counter() - started < 2.0
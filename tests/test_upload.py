@@ -0,0 +1,37 @@
+import hashlib
+import io
+from pathlib import Path
+
+from lib.upload import persist_upload
+
+
+class ChunkRecordingFile(io.BytesIO):
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.read_sizes: list[int] = []
+
+    def read(self, size: int = -1) -> bytes:
+        self.read_sizes.append(size)
+        return super().read(size)
+
+
+def test_persist_upload_copies_in_chunks_and_hashes(tmp_path: Path) -> None:
+    data = bytes(range(256)) * 40
+    uploaded = ChunkRecordingFile(data)
+    uploaded.seek(123)
+
+    upload = persist_upload(uploaded, tmp_path / "nested" / "video.mp4", chunk_size=1000)
+
+    assert upload.path.read_bytes() == data
+    assert upload.sha256 == hashlib.sha256(data).hexdigest()
+    assert upload.bytes_written == len(data)
+    assert upload.max_buffered_bytes == 1000
+    assert all(size == 1000 for size in uploaded.read_sizes)
+    assert uploaded.tell() == 0
+    assert [p.name for p in upload.path.parent.iterdir()] == ["video.mp4"]
+
+
+def test_persist_upload_reports_peak_memory(tmp_path: Path) -> None:
+    upload = persist_upload(io.BytesIO(b"abc"), tmp_path / "small.mp4")
+
+    assert upload.peak_rss_bytes is None or upload.peak_rss_bytes > 0
@@ -0,0 +1,124 @@
+import os
+import shutil
+import time
+from pathlib import Path
+
+import pytest
+
+from lib.workspace import (
+    DEFAULT_MAX_BYTES,
+    MAX_GB_ENV,
+    WorkspaceManager,
+    job_paths,
+    workspace_budget,
+)
+
+
+def make_workspace(
+    workspaces: WorkspaceManager, name: str, size: int, used_at: float
+) -> Path:
+    path = workspaces.path(name)
+    (path / "exports").mkdir(parents=True)
+    (path / "exports" / "clip.mp4").write_bytes(b"x" * size)
+    os.utime(path, (used_at, used_at))
+    return path
+
+
+def test_cleanup_evicts_least_recently_used(tmp_path: Path) -> None:
+    workspaces = WorkspaceManager(tmp_path / "ws", max_bytes=25, min_idle_seconds=0)
+    now = time.time()
+    make_workspace(workspaces, "oldest", 10, now - 300)
+    make_workspace(workspaces, "older", 10, now - 200)
+    make_workspace(workspaces, "newest", 10, now - 100)
+
+    assert workspaces.cleanup() == ["oldest"]
+    assert sorted(workspaces.usage()) == ["newest", "older"]
+    assert workspaces.cleanup() == []
+
+
+def test_cleanup_keeps_busy_and_recently_used_workspaces(tmp_path: Path) -> None:
+    now = time.time()
+    workspaces = WorkspaceManager(
+        tmp_path / "ws",
+        max_bytes=0,
+        busy=lambda: [tmp_path / "ws" / "queued" / "video_demo.mp4"],
+        min_idle_seconds=60,
+    )
+    make_workspace(workspaces, "queued", 10, now - 300)
+    make_workspace(workspaces, "fresh", 10, now - 10)
+    make_workspace(workspaces, "done", 10, now - 300)
+
+    assert workspaces.cleanup() == ["done"]
+    assert sorted(workspaces.usage()) == ["fresh", "queued"]
+
+
+def test_touch_marks_owning_workspace_used(tmp_path: Path) -> None:
+    workspaces = WorkspaceManager(tmp_path / "ws", max_bytes=10, min_idle_seconds=0)
+    now = time.time()
+    first = make_workspace(workspaces, "first", 10, now - 300)
+    make_workspace(workspaces, "second", 10, now - 200)
+
+    workspaces.touch(first / "exports" / "clip.mp4", tmp_path / "elsewhere")
+
+    assert workspaces.owner(first / "exports") == "first"
+    assert workspaces.owner(tmp_path) is None
+    assert workspaces.cleanup() == ["second"]
+
+
+def test_background_cleanup_runs_on_request(tmp_path: Path) -> None:
+    workspaces = WorkspaceManager(tmp_path / "ws", max_bytes=0, min_idle_seconds=0)
+    workspaces.start()
+    try:
+        make_workspace(workspaces, "done", 10, time.time() - 300)
+        workspaces.request_cleanup()
+        deadline = time.monotonic() + 5
+        while workspaces.path("done").exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        workspaces.stop(timeout=5)
+
+    assert not workspaces.path("done").exists()
+    assert workspaces.evicted == ["done"]
+
+
+def test_job_paths_reads_path_params() -> None:
+    params = {"video_path": "ws/a/video.mp4", "work_dir": "ws/a", "prompt": "p"}
+
+    assert job_paths(params) == ["ws/a/video.mp4", "ws/a"]
+
+
+def test_workspace_budget_reads_the_environment(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.delenv(MAX_GB_ENV, raising=False)
+    assert workspace_budget() == DEFAULT_MAX_BYTES
+
+    monkeypatch.setenv(MAX_GB_ENV, "0.5")
+    assert workspace_budget() == 512 * 1024**2
+
+    monkeypatch.setenv(MAX_GB_ENV, "lots")
+    with pytest.raises(ValueError, match=MAX_GB_ENV):
+        workspace_budget()
+
+
+def test_notes_report_evictions_and_failures_once(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    workspaces = WorkspaceManager(tmp_path / "ws", max_bytes=0, min_idle_seconds=0)
+    make_workspace(workspaces, "done", 10, time.time() - 300)
+    make_workspace(workspaces, "stuck", 10, time.time() - 200)
+    real_rmtree = shutil.rmtree
+
+    def rmtree(path, *args, **kwargs):
+        if Path(path).name == "stuck":
+            raise PermissionError("read-only")
+        real_rmtree(path, *args, **kwargs)
+
+    monkeypatch.setattr(shutil, "rmtree", rmtree)
+
+    assert workspaces.cleanup() == ["done"]
+    notes = workspaces.notes()
+    assert len(notes) == 2
+    assert notes[0].startswith("🧹 Evicted 1 idle workspaces")
+    assert "could not evict stuck: read-only" in notes[1]
+    assert workspaces.notes() == []